@@ -5,12 +5,29 @@ import DastForm from "@/components/DastForm";
 import BrowserPreview from "@/components/BrowserPreview";
 import ReportGenerator from "@/components/ReportGenerator";
 
+type LogRecord = {
+  ts?: string;
+  level?: string;
+  message: string;
+  exc?: string;
+};
+
+// /logs returns JSON records; the log panel shows them as text lines
+const formatLogs = (data: { records: LogRecord[] }) =>
+  data.records
+    .map((record) => {
+      const line = [record.ts, record.level, record.message].filter(Boolean).join(" ");
+      return record.exc ? `${line}\n${record.exc}` : line;
+    })
+    .join("\n");
+
 const Index = () => {
   const [scanStatus, setScanStatus] = useState({
     scanning: false,
     scanComplete: false,
   });
   const [targetUrl, setTargetUrl] = useState("");
+  const [scanId, setScanId] = useState<string | null>(null); // Scan returned by /start_latitude, also the session of its browser
   const [logs, setLogs] = useState<string>(""); // State to store logs as plain text
   const [isScrapingFinished, setIsScrapingFinished] = useState(false); // State to check if scraping is finished
   const [screenshot, setScreenshot] = useState<string | null>(null); // State to store the screenshot
@@ -26,6 +43,7 @@ const Index = () => {
     // Reset previous scan state
     setScanStatus({ scanning: true, scanComplete: false });
     setTargetUrl(data.url);
+    setScanId(null);
 
     // Display notification
     toast({
@@ -52,6 +70,7 @@ const Index = () => {
 
       const resData = await response.json();
       console.log("Backend Response:", resData);
+      setScanId(resData.scan_id);
     } catch (error) {
       console.error("Error al lanzar el escaneo:", error);
       setScanStatus({ scanning: false, scanComplete: false }); // rollback si falla
@@ -59,11 +78,13 @@ const Index = () => {
   };
 
   useEffect(() => {
-    if (scanStatus.scanning) {
+    if (scanStatus.scanning && scanId) {
       const intervalId = setInterval(async () => {
         try {
           if (isLatitudeEnable) {
-            const screenshotResponse = await fetch("http://localhost:8000/screenshot");
+            const screenshotResponse = await fetch(
+              `http://localhost:8000/screenshot?session_id=${encodeURIComponent(scanId)}`
+            );
             if (screenshotResponse.ok) {
               const contentType = screenshotResponse.headers.get("Content-Type");
               if (contentType && contentType.includes("application/json")) {
@@ -72,9 +93,9 @@ const Index = () => {
                   console.log("Scraping finished. Switching to log mode.");
                   setIsLatitudeEnable(false);
   
-                  const logsResponse = await fetch("http://localhost:8000/logs");
+                  const logsResponse = await fetch(`http://localhost:8000/logs?scan_id=${encodeURIComponent(scanId)}`);
                   if (logsResponse.ok) {
-                    const logsText = await logsResponse.text();
+                    const logsText = formatLogs(await logsResponse.json());
                     setLogs(logsText);
                     setIsScrapingFinished(true); 
                   }
@@ -89,9 +110,9 @@ const Index = () => {
             }
           } else {  
             if (!isScrapingFinished) {
-              const logsResponse = await fetch("http://localhost:8000/logs");
+              const logsResponse = await fetch(`http://localhost:8000/logs?scan_id=${encodeURIComponent(scanId)}`);
               if (logsResponse.ok) {
-                const logsText = await logsResponse.text();
+                const logsText = formatLogs(await logsResponse.json());
                 setLogs(logsText);
                 setIsScrapingFinished(true);
               }
@@ -104,7 +125,7 @@ const Index = () => {
   
       return () => clearInterval(intervalId);
     }
-  }, [scanStatus.scanning, isLatitudeEnable, isScrapingFinished]);
+  }, [scanStatus.scanning, scanId, isLatitudeEnable, isScrapingFinished]);
   
 
   const handleScanComplete = () => {
@@ -0,0 +1,108 @@
+"""
+Measures how fast the app starts: the import time of main (python -X
+importtime) with the modules that take the most of it, and the time from
+launching uvicorn until an MCP client gets the answer to tools/list.
+
+Usage (from backend/):
+    python benchmarks/bench_app_startup.py [--repeat N] [--top N] [--port PORT] [--no-server]
+
+Both run with ZAP pointed at a closed port and without Latitude
+credentials, so they show that startup waits for neither.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Nothing listens on the discard port: ZAP is unreachable
+OFFLINE_ENV = {"ZAP_API_URL": "http://127.0.0.1:9", "ZAP_PROXY": "http://127.0.0.1:9", "LATITUDE_API_KEY": "", "LATITUDE_PROJECT_ID": ""}
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+def offline_env():
+    return {**os.environ, **OFFLINE_ENV}
+
+def import_times():
+    """Cumulative microseconds per module for one `import main` in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND, env=offline_env(), capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            times[match.group(4)] = (int(match.group(2)), len(match.group(3)) // 2)
+    return times
+
+async def list_tools(url, server):
+    """Tools listed by the MCP server at `url`, and when they arrived."""
+    from mcp import ClientSession
+    from mcp.client.sse import sse_client
+    logging.getLogger("mcp.client.sse").setLevel(logging.CRITICAL)  # The killed server cuts the stream
+    async with sse_client(url) as streams:
+        async with ClientSession(*streams) as session:
+            await session.initialize()
+            tools = (await session.list_tools()).tools
+            answered = time.perf_counter()
+            # The client only leaves the SSE stream once the server closes it, and a
+            # terminated uvicorn would wait for that stream to close first
+            server.kill()
+    return tools, answered
+
+def server_startup(port):
+    """Seconds from launching uvicorn to the first HTTP answer and to the tools/list answer, and the tool count."""
+    import mcp.client.sse  # Not timed: the client's own import
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND, env=offline_env()
+    )
+    try:
+        while True:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/openapi.json", timeout=1).read()
+                break
+            except OSError:
+                if server.poll() is not None:
+                    raise RuntimeError("uvicorn exited during startup")
+                time.sleep(0.02)
+        ready = time.perf_counter()
+        tools, answered = asyncio.run(list_tools(f"http://127.0.0.1:{port}/mcp", server))
+        return ready - started, answered - started, len(tools)
+    finally:
+        server.kill()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--no-server", action="store_true", help="Only measure imports")
+    args = parser.parse_args()
+
+    runs = [import_times() for _ in range(args.repeat)]
+    totals = [run["main"][0] / 1000 for run in runs]
+    print(f"import main: median {statistics.median(totals):.1f} ms   min {min(totals):.1f} ms   max {max(totals):.1f} ms")
+    # Top-level packages and the app's own modules, from the fastest run
+    fastest = min(runs, key=lambda run: run["main"][0])
+    own = ("services.", "routes.", "config.", "models.", "utils.")
+    rows = [(micros, name) for name, (micros, depth) in fastest.items()
+            if name != "main" and ("." not in name or name.startswith(own))]
+    print(f"\nslowest imports (cumulative, fastest run):")
+    for micros, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"  {micros / 1000:8.1f} ms  {name}")
+
+    if not args.no_server:
+        ready, answered, count = server_startup(args.port)
+        print(f"\nuvicorn: HTTP ready after {ready * 1000:.0f} ms, tools/list ({count} tools) answered after {answered * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Measures Chrome cold start per launch profile: time to a usable WebDriver
+session, time to load a small page, and time to quit.
+
+Usage (from backend/):
+    python benchmarks/bench_browser_startup.py [--profiles visual,headless,fast] [--repeat N] [--proxy URL] [--url URL]
+
+Without --proxy the browsers connect directly (ZAP does not need to run).
+SELENIUM_USER_DATA_TEMPLATE and SELENIUM_CACHE_DIR apply as in the app, so
+running it with and without them shows what the template and cache save.
+The first launch of each profile is reported apart: it pays for the
+template creation and for cold OS caches.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from selenium import webdriver
+from services.chrome_profiles import build_options, launch_dirs, LAUNCH_PROFILES
+
+PAGE = "data:text/html,<html><body><h1>bench</h1><img src='data:image/gif;base64,R0lGODlhAQABAAAAACw='></body></html>"
+
+def launch(profile, proxy_url, user_data_dir=None, cache_dir=None):
+    options = build_options(profile, user_data_dir, cache_dir)
+    if proxy_url:
+        options.add_argument(f"--proxy-server={proxy_url}")
+    return webdriver.Chrome(options=options)
+
+def run_once(profile, proxy_url, url):
+    started = time.perf_counter()
+    user_data_dir, cache_dir, slot = launch_dirs.allocate(lambda user_data_dir: launch(profile, proxy_url, user_data_dir))
+    driver = launch(profile, proxy_url, user_data_dir, cache_dir)
+    ready = time.perf_counter()
+    driver.get(url)
+    loaded = time.perf_counter()
+    driver.quit()
+    launch_dirs.release(user_data_dir, slot)
+    done = time.perf_counter()
+    return ready - started, loaded - ready, done - loaded
+
+def summary(values):
+    values = [v * 1000 for v in values]
+    return f"median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms   max {max(values):8.1f} ms"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", default=",".join(LAUNCH_PROFILES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--proxy", default=None)
+    parser.add_argument("--url", default=PAGE)
+    args = parser.parse_args()
+
+    print(f"template: {launch_dirs.template or '-'}   cache: {launch_dirs.cache_root or '-'}")
+    for profile in args.profiles.split(","):
+        first = run_once(profile, args.proxy, args.url)
+        runs = [run_once(profile, args.proxy, args.url) for _ in range(args.repeat)]
+        print(f"\n[{profile}] first launch {first[0] * 1000:.1f} ms")
+        print(f"  start  {summary([r[0] for r in runs])}")
+        print(f"  load   {summary([r[1] for r in runs])}")
+        print(f"  quit   {summary([r[2] for r in runs])}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Compares page-structure extraction: BeautifulSoup get_html (the former
+extraction, kept here as the reference) vs the single-pass
+extract_page_structure (lxml, or the stdlib fallback).
+
+Usage (from backend/):
+    python benchmarks/bench_page_extraction.py [pages_dir] [--repeat N] [--browser]
+
+pages_dir holds saved .html pages (default benchmarks/pages). No pages are
+shipped with the repository: save captured pages of the scanned applications
+there to measure real content. Without any, only a generated synthetic page
+is measured. Outputs are checked to be identical.
+
+The comparison above runs on the saved source only. PAGE_EXTRACTION_MODE=js
+(extract_page_structure_js) needs a browser: with --browser each page is also
+opened in a pool-style Chrome (create_driver) and the two modes are timed as
+browser_actions runs them, page_source plus the parser vs one execute_script.
+Both read the browser's DOM, so their "same" column compares them with each
+other, not with get_html.
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+from urllib.parse import urljoin
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from utils import utils
+from utils.utils import extract_page_structure, extract_page_structure_js
+
+BASE_URL = "https://example.com/app/"
+
+def get_html(soup, base_url):
+    links = []
+    inputs = []
+    buttons = []
+    forms = []
+
+    for el in soup.find_all(["a", "input", "button", "form"]):
+        if el.name == "a":
+            href = el.get("href")
+            text = el.get_text().strip()
+            # Ensure the href is absolute
+            if href:
+                href = urljoin(base_url, href)  # Convert to absolute URL
+            # Guardamos solo si tiene href y texto
+            if href or text:
+                links.append({
+                    "href": href,
+                    "text": text
+                })
+
+        elif el.name == "input":
+            input_type = el.get("type")
+            input_name = el.get("name")
+            input_id = el.get("id")
+            input_value = el.get("value")
+            # Guardamos solo si tiene ID o NAME
+            if input_id or input_name:
+                inputs.append({
+                    "type": input_type,
+                    "name": input_name,
+                    "id": input_id,
+                    "value": input_value
+                })
+
+        elif el.name == "button":
+            button_type = el.get("type")
+            button_name = el.get("name")
+            button_text = el.get_text().strip()
+            # Guardamos solo si tiene texto o nombre
+            if button_text or button_name:
+                buttons.append({
+                    "type": button_type,
+                    "name": button_name,
+                    "text": button_text
+                })
+
+        elif el.name == "form":
+            form_action = el.get("action")
+            form_method = el.get("method")
+            form_fields = [input_el.get("name") for input_el in el.find_all("input") if input_el.get("name")]
+            # Ensure the action is absolute
+            if form_action:
+                form_action = urljoin(base_url, form_action)  # Convert to absolute URL
+            # Guardamos aunque no haya fields (algunos forms no tienen inputs directos)
+            forms.append({
+                "action": form_action,
+                "method": form_method,
+                "fields": form_fields
+            })
+
+    summary = {
+        "links": links,
+        "inputs": inputs,
+        "buttons": buttons,
+        "forms": forms
+    }
+    return summary
+
+def synthetic_page(sections=400):
+    parts = ["<html><head><title>bench</title></head><body>"]
+    for i in range(sections):
+        parts.append(
+            f'<div class="card"><a href="item/{i}">Item <b>{i}</b></a> <a href="#">#</a>'
+            f'<form action="/save/{i}" method="post"><input type="text" name="field{i}" id="f{i}">'
+            f'<input type="hidden" value="x"><button type="submit" name="save{i}">Save</button></form>'
+            f'<p>{"lorem ipsum " * 20}</p></div>'
+        )
+    parts.append("</body></html>")
+    return "".join(parts)
+
+def load_pages(directory):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        with open(path, encoding="utf-8", errors="replace") as file:
+            pages.append((os.path.basename(path), file.read()))
+    return pages or [("synthetic", synthetic_page())]
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pages_dir", nargs="?", default=os.path.join(os.path.dirname(__file__), "pages"))
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--browser", action="store_true", help="Also time PAGE_EXTRACTION_MODE=js against parser mode in Chrome")
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages_dir)
+    lxml_html = utils.lxml_html
+    print(f"{'page':<30}{'size KiB':>10}{'bs4 ms':>10}{'lxml ms':>10}{'stdlib ms':>11}  same")
+    for name, source in pages:
+        bs4_ms, expected = timed(lambda: get_html(BeautifulSoup(source, "html.parser"), BASE_URL), args.repeat)
+        results = []
+        if lxml_html is not None:
+            results.append(timed(lambda: extract_page_structure(source, BASE_URL), args.repeat))
+        else:
+            results.append((float("nan"), expected))
+        utils.lxml_html = None
+        try:
+            results.append(timed(lambda: extract_page_structure(source, BASE_URL), args.repeat))
+        finally:
+            utils.lxml_html = lxml_html
+        same = all(result == expected for _, result in results)
+        print(f"{name[:29]:<30}{len(source) / 1024:>10.1f}{bs4_ms:>10.2f}{results[0][0]:>10.2f}{results[1][0]:>11.2f}  {same}")
+
+    if args.browser:
+        browser_modes(pages, args.repeat)
+
+def browser_modes(pages, repeat):
+    """Times both PAGE_EXTRACTION_MODE values on pages loaded in Chrome."""
+    from services.selenium_service import create_driver, quit_driver
+    driver = create_driver()
+    try:
+        print(f"\n{'page (in Chrome)':<30}{'parser ms':>10}{'js ms':>10}  same")
+        with tempfile.TemporaryDirectory() as directory:
+            for name, source in pages:
+                path = os.path.join(directory, "page.html")
+                with open(path, "w", encoding="utf-8") as file:
+                    file.write(source)
+                driver.get("file://" + path)
+                parser_ms, expected = timed(lambda: extract_page_structure(driver.page_source, BASE_URL), repeat)
+                js_ms, result = timed(lambda: extract_page_structure_js(driver, BASE_URL), repeat)
+                print(f"{name[:29]:<30}{parser_ms:>10.2f}{js_ms:>10.2f}  {result == expected}")
+    finally:
+        quit_driver(driver)
+
+if __name__ == "__main__":
+    main()
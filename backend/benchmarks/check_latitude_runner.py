@@ -0,0 +1,133 @@
+"""
+Checks LatitudeRunner's retries, timeout and the ScrapingAgent cache against
+a local fake Latitude gateway, with the real SDK client (create_sdk).
+
+Usage (from backend/):
+    python benchmarks/check_latitude_runner.py
+
+Only runs that never started are retried: a 429/503 answer or a refused
+connection is tried 1 + RETRIES times, while a 500 or a stream
+broken after it started is tried once (an agent may already have acted).
+The SDK's own retries are off, so the counts are exact. Exits with status 1
+if any count differs from the expected one.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from latitude_sdk import GatewayOptions
+from services import latitude_service
+from services.latitude_service import LatitudeRunner, create_sdk, start_latitude_scraping
+
+RETRIES = 2
+TIMEOUT = 1.0
+USAGE = {"promptTokens": 10, "completionTokens": 5, "totalTokens": 15}
+
+def sse(event):
+    return f"event: latitude-event\ndata: {json.dumps(event)}\n\n".encode()
+
+STARTED = sse({"type": "chain-started", "messages": [], "uuid": "run-1"})
+COMPLETED = sse({
+    "type": "provider-completed", "messages": [], "uuid": "run-1", "providerLogUuid": "log-1",
+    "tokenUsage": USAGE, "finishReason": "stop",
+    "response": {"streamType": "text", "text": "done", "toolCalls": [], "usage": USAGE},
+})
+
+class FakeGateway(BaseHTTPRequestHandler):
+    """Answers every run the way `server.mode` says and counts the requests."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.requests += 1
+        mode = self.server.mode
+        if mode in ("429", "500", "503"):
+            body = json.dumps({"name": "Error", "errorCode": "fake_error", "message": f"fake {mode}", "details": {}}).encode()
+            self.send_response(int(mode))
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        self.wfile.write(STARTED)
+        self.wfile.flush()
+        if mode == "hang":
+            time.sleep(TIMEOUT * 3)
+        elif mode == "ok":
+            self.wfile.write(COMPLETED)
+        # "broken": the connection closes after the run started
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def runner_for(port):
+    gateway = GatewayOptions(host="127.0.0.1", port=port, ssl=False, api_version="v3")
+    return LatitudeRunner(lambda: create_sdk("fake-key", 1, gateway), retries=RETRIES, backoff=0.01, timeout=TIMEOUT)
+
+async def check_runs(server):
+    # (label, mode, expected requests, expected outcome)
+    cases = [
+        ("429 rate limited", "429", 1 + RETRIES, None),
+        ("503 unavailable", "503", 1 + RETRIES, None),
+        ("500 server error", "500", 1, None),
+        ("stream broken after start", "broken", 1, None),
+        ("run past the timeout", "hang", 1, None),
+        ("successful run", "ok", 1, "done"),
+    ]
+    failed = False
+    for label, mode, expected, outcome in cases:
+        server.mode, server.requests = mode, 0
+        runner = runner_for(server.server_address[1])
+        result = await runner.run("LoginAgent", {"url": "http://app.test"})
+        text = result.response.text if result is not None else None
+        ok = server.requests == expected and text == outcome
+        failed |= not ok
+        print(f"{label:<30}{server.requests:>3} request(s), expected {expected}  {'ok' if ok else 'FAIL'}")
+
+    runner = runner_for(closed_port())
+    await runner.run("LoginAgent", {"url": "http://app.test"})
+    attempts = 1 + runner.prompt_metrics("LoginAgent").retries
+    ok = attempts == 1 + RETRIES
+    failed |= not ok
+    print(f"{'connection refused':<30}{attempts:>3} attempt(s), expected {1 + RETRIES}  {'ok' if ok else 'FAIL'}")
+    return failed
+
+async def check_cache(server):
+    server.mode, server.requests = "ok", 0
+    latitude_service.runner = runner_for(server.server_address[1])
+    for username in ("alice", "alice", "bob"):
+        await start_latitude_scraping("http://app.test", username, "no-scan")
+    ok = server.requests == 2
+    print(f"{'scrape cache (alice x2, bob)':<30}{server.requests:>3} request(s), expected 2  {'ok' if ok else 'FAIL'}")
+    return not ok
+
+async def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGateway)
+    server.mode, server.requests = "ok", 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        failed = await check_runs(server)
+        failed |= await check_cache(server)
+    finally:
+        server.shutdown()
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)  # The runner logs every failed attempt
+    sys.exit(asyncio.run(main()))
@@ -1,29 +1,75 @@
+from logging.handlers import RotatingFileHandler
+import contextvars
+import json
 import logging
+import threading
+from datetime import datetime, timezone
+from config.settings import settings
 import os
 
-# Basic logger setup
-def setup_logger():
-    # Create the .logs directory if it doesn't exist
-    log_dir = ".logs"
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
+LOG_FILE_PATH = settings.get("LOG_FILE_PATH") or os.path.join(".logs", "zap_scan.log")
+LOG_MAX_BYTES = int(settings.get("LOG_MAX_BYTES", str(50 * 1024 * 1024)))  # Size at which the log file is rotated
+LOG_BACKUP_COUNT = int(settings.get("LOG_BACKUP_COUNT", "5"))  # Rotated files kept (zap_scan.log.1, .2, ...)
+LOG_LEVEL = settings.get("LOG_LEVEL", "INFO")
 
-    # Create the log file inside the .logs directory
-    log_file = os.path.join(log_dir, 'zap_scan.log')
+# Scan the current code runs for. Set by the orchestrator for its task (and
+# inherited by the tasks and executor calls it starts) and by browser calls
+# made with a scan's session.
+scan_id_var = contextvars.ContextVar("scan_id", default=None)
 
-    # Create the logger
-    logger = logging.getLogger("zap_logger")
-    logger.setLevel(logging.INFO)
+_setup_lock = threading.Lock()
+_file_handler = None
+
+class ScanIdFilter(logging.Filter):
+    """Tags every record with the scan ID of the context that logged it."""
 
-    # Create a file handler that writes the logs to the file
-    file_handler = logging.FileHandler(log_file)
-    file_handler.setLevel(logging.INFO)
+    def filter(self, record):
+        record.scan_id = scan_id_var.get()
+        return True
 
-    # Create a format for the logs
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    file_handler.setFormatter(formatter)
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, scan_id, message and exc if any."""
 
-    # Add the handler to the logger
-    logger.addHandler(file_handler)
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "scan_id": getattr(record, "scan_id", None),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
 
+def setup_logging():
+    """
+    Sends every logger's records to LOG_FILE_PATH as JSON lines, rotated at
+    LOG_MAX_BYTES. Safe to call any number of times: the file handler is
+    added to the root logger once.
+    """
+    global _file_handler
+    with _setup_lock:
+        if _file_handler is not None:
+            return _file_handler
+        log_dir = os.path.dirname(LOG_FILE_PATH)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+        handler = RotatingFileHandler(LOG_FILE_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+        handler.setLevel(LOG_LEVEL)
+        handler.addFilter(ScanIdFilter())
+        handler.setFormatter(JsonFormatter())
+        root = logging.getLogger()
+        root.addHandler(handler)
+        if root.level > logging.getLevelName(LOG_LEVEL):
+            root.setLevel(LOG_LEVEL)
+        _file_handler = handler
+        return handler
+
+# Basic logger setup
+def setup_logger():
+    setup_logging()
+    # Records propagate to the root logger's file handler
+    logger = logging.getLogger("zap_logger")
+    logger.setLevel(logging.INFO)
     return logger
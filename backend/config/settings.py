@@ -0,0 +1,30 @@
+from dotenv import load_dotenv
+import os
+
+# .env is read once, by the first module importing the settings; variables
+# already set in the environment win over it
+load_dotenv()
+
+class MissingSettingError(RuntimeError):
+    """Raised when a setting a service needs is not configured."""
+
+class Settings:
+    """
+    The app's configuration: the environment variables, with .env loaded.
+
+    Values are read when asked for. Modules keep their defaults next to the
+    code using them (module constants); settings only one service needs,
+    such as the Latitude credentials, are required when that service is
+    first used, so the app starts without them.
+    """
+
+    def get(self, name, default=None):
+        return os.getenv(name, default)
+
+    def require(self, name):
+        value = os.getenv(name)
+        if not value:
+            raise MissingSettingError(f"{name} is not set (see the .env section of the README)")
+        return value
+
+settings = Settings()
@@ -1,23 +1,39 @@
 from fastapi import FastAPI
 from fastapi_mcp import FastApiMCP
 from fastapi.middleware.cors import CORSMiddleware
-from routes.routes import router
+from routes.routes import router, STREAM_TAG
 from services.selenium_service import selenium_startup, selenium_shutdown
+from services.executor_service import run_blocking, browser_executor, shutdown_executors
+from services.zap_service import zap_registry
+from services.job_service import job_manager
+from services.latitude_service import runner as latitude_runner
+from config.logs_config import setup_logging
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 
 logging.basicConfig(level=logging.INFO)
+setup_logging()  # JSON-lines log file read by /logs
 
 # Startup and shutdown logic for the WebDriver
 @asynccontextmanager
 async def app_lifespan(app: FastAPI):  # Aceptar el argumento 'app'
     # Startup
+    latitude_warmup = None
     try:
-        #selenium_startup()
+        await run_blocking(selenium_startup, executor=browser_executor)  # Pre-warm SELENIUM_POOL_WARM browsers
+        await job_manager.start()
+        # Built in the background: the server answers (e.g. MCP tools/list) without waiting for Latitude
+        latitude_warmup = asyncio.create_task(latitude_runner.warm())
         yield
     finally:
         # Shutdown
+        if latitude_warmup is not None:
+            latitude_warmup.cancel()
+        await job_manager.stop()
         selenium_shutdown()
+        shutdown_executors()
+        await zap_registry.aclose()
 
 app = FastAPI(
     title="DAST Security Scanner API",
@@ -56,7 +72,8 @@ mcp = FastApiMCP(
     
     Built with OWASP ZAP, Selenium WebDriver, and Latitude AI services.
     Perfect for security testing, penetration testing, and automated vulnerability assessment.
-    """
+    """,
+    exclude_tags=[STREAM_TAG]  # Streaming endpoints are for dashboards, not MCP tools
 )
 mcp.mount()
 
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, HttpUrl
-from typing import Annotated
+from typing import Annotated, List, Literal, Optional
 
 class NavigateRequest(BaseModel):
     """Request model for navigating to a web page and extracting its structure."""
@@ -10,6 +10,17 @@ class NavigateRequest(BaseModel):
         min_length=1
     )]
 
+    session_id: Annotated[Optional[str], Field(
+        default=None,
+        description="Browser session to use. Scans pass their scan ID so each one drives its own pooled browser. Omit to use the shared default session.",
+        examples=["default", "3f2b8c0e9a6d4c1f8e7b5a4d3c2b1a09"]
+    )]
+
+    incremental: Annotated[bool, Field(
+        default=False,
+        description="If the page was visited before in this session, return only what changed since that visit ('unchanged' or the added/removed elements). Only set it if you made that visit yourself: sessions, including the shared default one, may be driven by other clients."
+    )]
+
     class Config:
         json_schema_extra = {
             "example": {
@@ -31,6 +42,12 @@ class InputRequest(BaseModel):
         examples=["john@example.com", "mypassword123", "John Doe", "+1234567890"]
     )]
 
+    session_id: Annotated[Optional[str], Field(
+        default=None,
+        description="Browser session to use. Scans pass their scan ID so each one drives its own pooled browser. Omit to use the shared default session.",
+        examples=["default", "3f2b8c0e9a6d4c1f8e7b5a4d3c2b1a09"]
+    )]
+
     class Config:
         json_schema_extra = {
             "example": {
@@ -53,6 +70,12 @@ class ClickRequest(BaseModel):
         description="Whether this element is a login button. If True, the system will monitor authentication state changes (cookies, URL changes) to determine if login was successful."
     )]
 
+    session_id: Annotated[Optional[str], Field(
+        default=None,
+        description="Browser session to use. Scans pass their scan ID so each one drives its own pooled browser. Omit to use the shared default session.",
+        examples=["default", "3f2b8c0e9a6d4c1f8e7b5a4d3c2b1a09"]
+    )]
+
     class Config:
         json_schema_extra = {
             "example": {
@@ -61,6 +84,84 @@ class ClickRequest(BaseModel):
             }
         }
 
+class BatchStep(BaseModel):
+    """One browser action of a batch."""
+    
+    action: Annotated[Literal["navigate", "input", "click", "wait", "extract"], Field(
+        description="Action to run: 'navigate' to a URL, 'input' text into a field, 'click' an element, 'wait' for an element to be visible (or a fixed time without selector), or 'extract' the structure of the current page.",
+        examples=["navigate", "input", "click", "wait", "extract"]
+    )]
+    
+    url: Annotated[Optional[str], Field(
+        default=None,
+        description="URL for 'navigate'. Must be a valid HTTP or HTTPS URL.",
+        examples=["https://testapp.com/login"]
+    )]
+    
+    selector: Annotated[Optional[str], Field(
+        default=None,
+        description="CSS selector or XPath for 'input', 'click' and 'wait'.",
+        examples=["#username", "//button[@type='submit']"]
+    )]
+    
+    content: Annotated[Optional[str], Field(
+        default=None,
+        description="Text to type for 'input'.",
+        examples=["john@example.com"]
+    )]
+    
+    isLogInButton: Annotated[bool, Field(
+        default=False,
+        description="For 'click': whether the element is a login button (see click_element)."
+    )]
+    
+    incremental: Annotated[bool, Field(
+        default=False,
+        description="For 'navigate': return only the changes since the last visit (see navigate)."
+    )]
+    
+    timeout: Annotated[float, Field(
+        default=5,
+        gt=0,
+        le=60,
+        description="Seconds to wait for the element ('input', 'click', 'wait'), or to sleep for 'wait' without selector."
+    )]
+
+class BatchRequest(BaseModel):
+    """Request model for running several browser actions in one call."""
+    
+    steps: Annotated[List[BatchStep], Field(
+        description="Actions to run in order on the same browser session.",
+        min_length=1,
+        max_length=50
+    )]
+    
+    stop_on_error: Annotated[bool, Field(
+        default=True,
+        description="Stop at the first failed step. If False every step runs and each one reports its own result."
+    )]
+
+    session_id: Annotated[Optional[str], Field(
+        default=None,
+        description="Browser session to use. Scans pass their scan ID so each one drives its own pooled browser. Omit to use the shared default session.",
+        examples=["default", "3f2b8c0e9a6d4c1f8e7b5a4d3c2b1a09"]
+    )]
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "steps": [
+                    {"action": "navigate", "url": "https://testapp.com/login"},
+                    {"action": "input", "selector": "#username", "content": "testuser"},
+                    {"action": "input", "selector": "#password", "content": "testpass123"},
+                    {"action": "click", "selector": "//button[@type='submit']", "isLogInButton": True},
+                    {"action": "extract"}
+                ]
+            }
+        }
+
+FileType = Literal["image", "font", "media", "stylesheet"]
+
 class LatitudeRequest(BaseModel):
     """Request model for starting a comprehensive security scan with AI-powered automation."""
     
@@ -81,6 +182,24 @@ class LatitudeRequest(BaseModel):
         examples=["password123", "admin123", "secretpass"],
         min_length=1
     )]
+    
+    priority: Annotated[int, Field(
+        default=0,
+        description="Queue priority. Scans with a higher priority start first; equal priorities run in submission order.",
+        examples=[0, 5, 10]
+    )]
+
+    block_resources: Annotated[Optional[List[FileType]], Field(
+        default=None,
+        description="File types the scan's browser does not download, matched by URL extension (a resource without one still loads). Omit to use BROWSER_BLOCK_FILE_TYPES (none by default); an empty list downloads everything.",
+        examples=[["image", "font", "media"], []]
+    )]
+    
+    block_hosts: Annotated[Optional[List[str]], Field(
+        default=None,
+        description="Third-party hosts (and their subdomains) the scan's browser never requests, on top of BROWSER_BLOCK_HOSTS and, with BROWSER_BLOCK_TRACKERS=1, the tracker blocklist. The target host is never blocked.",
+        examples=[["cdnjs.cloudflare.com", "widget.intercom.io"]]
+    )]
 
     class Config:
         json_schema_extra = {
@@ -89,4 +208,91 @@ class LatitudeRequest(BaseModel):
                 "username": "testuser",
                 "password": "testpass123"
             }
-        }
\ No newline at end of file
+        }
+
+class ScanTarget(BaseModel):
+    """One application of a batch scan."""
+    
+    url: Annotated[str, Field(
+        description="The target web application URL to scan. Must be a valid HTTP or HTTPS URL.",
+        examples=["https://testapp.com"],
+        min_length=1
+    )]
+    
+    username: Annotated[str, Field(
+        description="Username for authentication during the scan.",
+        examples=["testuser"],
+        min_length=1
+    )]
+    
+    password: Annotated[str, Field(
+        description="Password for authentication during the scan.",
+        examples=["testpass123"],
+        min_length=1
+    )]
+
+    block_resources: Annotated[Optional[List[FileType]], Field(
+        default=None,
+        description="File types the scan's browser does not download, matched by URL extension (a resource without one still loads). Omit to use BROWSER_BLOCK_FILE_TYPES (none by default); an empty list downloads everything.",
+        examples=[["image", "font", "media"], []]
+    )]
+    
+    block_hosts: Annotated[Optional[List[str]], Field(
+        default=None,
+        description="Third-party hosts (and their subdomains) the scan's browser never requests, on top of BROWSER_BLOCK_HOSTS and, with BROWSER_BLOCK_TRACKERS=1, the tracker blocklist. The target host is never blocked.",
+        examples=[["cdnjs.cloudflare.com", "widget.intercom.io"]]
+    )]
+
+class BatchScanRequest(BaseModel):
+    """Request model for queueing security scans of several applications at once."""
+    
+    targets: Annotated[List[ScanTarget], Field(
+        description="Applications to scan. Scans are spread across the configured ZAP instances.",
+        min_length=1,
+        max_length=1000
+    )]
+    
+    priority: Annotated[int, Field(
+        default=0,
+        description="Queue priority of every scan of the batch.",
+        examples=[0, 5, 10]
+    )]
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "targets": [
+                    {"url": "https://app-one.example.com", "username": "testuser", "password": "testpass123"},
+                    {"url": "https://app-two.example.com", "username": "admin", "password": "admin123"}
+                ]
+            }
+        }
+
+class ReportImportRequest(BaseModel):
+    """Request model for loading a ZAP XML report into the indexed report store."""
+    
+    report_id: Annotated[Optional[str], Field(
+        default=None,
+        description="ID to store the report under. Defaults to scan_id, or a new ID without one. Importing again with the same ID replaces the report.",
+        examples=["3f2b8c0e9a6d4c1f8e7b5a4d3c2b1a09"]
+    )]
+
+    scan_id: Annotated[Optional[str], Field(
+        default=None,
+        description="Scan whose ZAP instance the current report is downloaded from, when no path is given. Without it the default instance is used.",
+        examples=["3f2b8c0e9a6d4c1f8e7b5a4d3c2b1a09"]
+    )]
+    
+    path: Annotated[Optional[str], Field(
+        default=None,
+        description="Path of an OWASPZAPReport XML file relative to the server's reports directory (REPORT_IMPORT_DIR); paths leading outside it are rejected. If omitted, the current XML report is downloaded from ZAP.",
+        examples=["zap_report.xml", "nightly/app-one.xml"]
+    )]
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "report_id": "nightly-2025-04-30",
+                "path": "zap_report.xml"
+            }
+        }
@@ -1,28 +1,40 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse, RedirectResponse, PlainTextResponse, HTMLResponse
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse, RedirectResponse, FileResponse
 from selenium.common.exceptions import TimeoutException
-from models.requests import NavigateRequest, InputRequest, ClickRequest, LatitudeRequest
-from services.selenium_service import get_driver
-from services.orchestrator_service import orchestrate_scan
-from services.zap_service import create_zap_report
-from utils.utils import cookies_changed, get_html, close_all_popups
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-import asyncio
+from models.requests import NavigateRequest, InputRequest, ClickRequest, BatchRequest, LatitudeRequest, BatchScanRequest, ReportImportRequest
+from services.selenium_service import pool, PoolExhaustedError, DEFAULT_SESSION
+from services.executor_service import run_in_browser, run_blocking
+from services.job_service import job_manager, QUEUED, RUNNING
+from services.progress_service import broker, stream_events
+from services.alert_service import alert_collector, RISK_LEVELS
+from services.zap_service import download_zap_report, zap_registry
+from services.report_service import build_report, report_fingerprint, REPORT_FORMATS
+from services.report_cache import report_cache
+from services.report_store import report_store, resolve_import_path
+from services.snapshot_service import snapshot_cache
+from services.frontier_service import frontiers
+from services.screencast_service import screencasts, FORMATS as SCREENSHOT_FORMATS
+from services.request_filter import request_filters
+from services.log_service import read_log, follow_log
+from config.logs_config import LOG_FILE_PATH
+from services.auth_session_service import auth_sessions, target_of
+from services.login_macro_service import login_macros
+from services.latitude_service import runner as latitude_runner
+from services import browser_actions
+from services.browser_actions import LoginFailedError
+from urllib.parse import urlparse
+from typing import Optional
 import io
-from dotenv import load_dotenv
+import tempfile
+import uuid
 import os
 import re
 
-# Load environment variables
-load_dotenv()
-LOG_FILE_PATH = os.getenv("LOG_FILE_PATH")
-
 router = APIRouter()
 
+# Routes with this tag stream their response and are not exposed as MCP tools
+STREAM_TAG = "stream"
+
 def validate_selector(selector: str, context: str = "selector") -> None:
     """
     Validate that a selector is not a URL and appears to be a valid CSS selector or XPath.
@@ -78,13 +90,22 @@ async def navigate(request: NavigateRequest):
     links, input fields, buttons, and forms. It automatically closes any
     popups that might appear and waits for the page to fully load.
     
+    With incremental=true, pages already visited in the same session are
+    compared with the previous visit: if nothing changed the page is not
+    extracted again (nor reloaded, if it is still open and untouched) and
+    only the differences are returned. Use it only when you made that
+    previous visit yourself; by default every element is returned.
+    
     Args:
         request: NavigateRequest containing the URL to navigate to
         
     Returns:
-        dict: Contains success status and extracted elements:
+        dict: Contains success status and the page state:
             - success (bool): Whether navigation was successful
-            - elements (dict): Structured data with links, inputs, buttons, forms
+            - status (str): "new", "changed" or "unchanged" compared to the last visit
+            - elements (dict): Links, inputs, buttons and forms (status "new")
+            - diff (dict): Added and removed entries per section (status "changed")
+            - popups_closed (list): Popup buttons clicked after loading, if any
             
     Raises:
         HTTPException: 400 for invalid URL format, 500 for navigation errors
@@ -98,18 +119,19 @@ async def navigate(request: NavigateRequest):
         if not parsed_url.scheme in ["http", "https"] or not parsed_url.netloc:
             raise HTTPException(status_code=400, detail="Invalid URL format.")
         
-        # Navigate to the URL
-        driver = get_driver()
-        driver.get(request.url)
-        WebDriverWait(driver, 5).until(
-            lambda d: d.execute_script("return document.readyState") == "complete"
-        )
-        summary = get_html(BeautifulSoup(driver.page_source, 'html.parser'), request.url)
-        
-        close_all_popups(driver, timeout=5)
-        return {"success": True, "elements": summary}
+        # Navigate to the URL (runs on the browser executor)
+        session_id = request.session_id or DEFAULT_SESSION
+        frontier = frontiers.get(session_id)
+        if frontier is not None:
+            await frontier.throttle(request.url)
+        result = await run_in_browser(session_id, browser_actions.navigate, request.url, session_id, request.incremental)
+        frontiers.observe_navigation(session_id, request.url, result)
+        login_macros.record(session_id, {"action": "navigate", "url": request.url})
+        return {"success": True, **result}
     except HTTPException as http_exc:
         raise http_exc
+    except PoolExhaustedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -142,22 +164,31 @@ async def input_text(request: InputRequest):
         Input "john@example.com" into selector "#email-field"
     """
     try:
-        driver = get_driver()
-        
         # Validate selector
         validate_selector(request.selector, "input selector")
         
-        element = WebDriverWait(driver, 5).until(
-            EC.visibility_of_element_located((By.CSS_SELECTOR, request.selector))
-        )
-        element.clear()
-        element.send_keys(request.content)
+        try:
+            await run_in_browser(request.session_id, browser_actions.input_text, request.selector, request.content)
+        finally:
+            snapshot_cache.mark_dirty(request.session_id or DEFAULT_SESSION)
+        login_macros.record(request.session_id or DEFAULT_SESSION, {
+            "action": "input", "selector": request.selector, "content": request.content, "timeout": 5
+        })
         return {"success": True}
+    except HTTPException as http_exc:
+        raise http_exc
     except TimeoutException:
         raise HTTPException(status_code=404, detail=f"Element not found with selector: {request.selector}")
+    except PoolExhaustedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _logged_in(session_id):
+    # A login click succeeded: keep what later scans need to log in without the LoginAgent
+    await login_macros.on_login(session_id)
+    await auth_sessions.on_login(session_id)
+
 @router.post("/click_element", 
              operation_id="click_element")
 async def click_element(request: ClickRequest):
@@ -192,43 +223,102 @@ async def click_element(request: ClickRequest):
         Click login button: selector="//button[@type='submit']", isLogInButton=true
     """
     try:
-        driver = get_driver()
-        
         # Validate selector
         validate_selector(request.selector, "click selector")
         
-        # Determinar si el selector es CSS o XPath
-        by = By.XPATH if request.selector.strip().startswith("//") else By.CSS_SELECTOR
-
-        print(f"Waiting for element with selector: {request.selector} (By: {by})")
         try:
-            element = WebDriverWait(driver, 5).until(
-                EC.element_to_be_clickable((by, request.selector))
+            is_logged = await run_in_browser(
+                request.session_id, browser_actions.click_element, request.selector, request.isLogInButton
             )
         except TimeoutException:
             raise HTTPException(status_code=404, detail=f"Element not found or not clickable: {request.selector}")
-
-        is_logged = None
+        except LoginFailedError as e:
+            raise HTTPException(status_code=401, detail=str(e))
+        finally:
+            snapshot_cache.mark_dirty(request.session_id or DEFAULT_SESSION)
+        login_macros.record(request.session_id or DEFAULT_SESSION, {
+            "action": "click", "selector": request.selector, "isLogInButton": request.isLogInButton, "timeout": 5
+        })
         if request.isLogInButton:
-            cookies_before = driver.get_cookies()
-            current_url = driver.current_url
-            element.click()
-            try:
-                WebDriverWait(driver, 5).until(EC.url_changes(current_url))
-                cookies_after = driver.get_cookies()
-                is_logged = cookies_changed(cookies_before, cookies_after)
-            except TimeoutException:
-                raise HTTPException(status_code=401, detail="Login failed: credentials likely invalid")
-        else:
-            element.click()
+            await _logged_in(request.session_id or DEFAULT_SESSION)
 
         return {"success": True, "isLogged": is_logged}
 
     except HTTPException as http_exc:
         raise http_exc
+    except PoolExhaustedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unhandled server error: {str(e)}")
 
+@router.post("/actions/batch",
+             operation_id="run_browser_actions")
+async def run_browser_actions(request: BatchRequest):
+    """
+    Run several browser actions in order with a single call.
+    
+    Use this instead of separate navigate/input_text/click_element calls for
+    known sequences such as a login form. All steps run on the same browser
+    session without other calls interleaving.
+    
+    Args:
+        request: BatchRequest containing:
+            - steps (list): Actions to run, each with an `action` of
+                            "navigate" (url), "input" (selector, content),
+                            "click" (selector, isLogInButton), "wait"
+                            (selector, or only timeout) or "extract"
+            - stop_on_error (bool): Stop at the first failed step (default True)
+            
+    Returns:
+        dict: Contains overall status and per-step results:
+            - success (bool): Whether every step succeeded
+            - results (list): For each step run: index, action, success,
+                              elapsed_ms, error if it failed, and the step's
+                              output (navigate: status/elements/diff,
+                              click: isLogged, extract: elements)
+            
+    Raises:
+        HTTPException: 400 for an invalid step, 503 if no browser is free
+        
+    Example:
+        Log in: navigate to the login page, input username and password,
+        click the submit button with isLogInButton=true
+    """
+    for index, step in enumerate(request.steps):
+        if step.action == "navigate":
+            parsed_url = urlparse(step.url or "")
+            if not parsed_url.scheme in ["http", "https"] or not parsed_url.netloc:
+                raise HTTPException(status_code=400, detail=f"Step {index}: invalid URL format.")
+        elif step.action in ("input", "click") and not step.selector:
+            raise HTTPException(status_code=400, detail=f"Step {index}: '{step.action}' requires a selector.")
+        elif step.action == "input" and step.content is None:
+            raise HTTPException(status_code=400, detail=f"Step {index}: 'input' requires content.")
+        if step.selector:
+            validate_selector(step.selector, f"selector in step {index}")
+
+    session_id = request.session_id or DEFAULT_SESSION
+    steps = [step.model_dump() for step in request.steps]
+    try:
+        results = await run_in_browser(session_id, browser_actions.run_batch, steps, session_id, request.stop_on_error)
+    except PoolExhaustedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        snapshot_cache.mark_dirty(session_id)
+    for step, result in zip(steps, results):
+        if not result["success"]:
+            continue
+        login_macros.record(session_id, step)
+        if step["action"] == "navigate":
+            frontiers.observe_navigation(session_id, step["url"], result)
+        elif step["action"] == "click" and step["isLogInButton"]:
+            await _logged_in(session_id)
+    return {
+        "success": len(results) == len(steps) and all(result["success"] for result in results),
+        "results": results,
+    }
+
 
 @router.post("/start_latitude",
              operation_id="start_latitude")
@@ -238,8 +328,9 @@ async def execute_scan(request: LatitudeRequest):
     
     This tool initiates a complete DAST (Dynamic Application Security Testing) 
     scan that includes AI-powered login automation, intelligent web scraping,
-    and vulnerability assessment using OWASP ZAP. The scan runs in the background
-    and combines multiple security testing approaches.
+    and vulnerability assessment using OWASP ZAP. The scan is queued and runs in
+    the background once a slot is free: only SCAN_MAX_CONCURRENT scans run at
+    once, and only SCAN_MAX_PER_TARGET against the same host.
     
     The scan process includes:
     1. AI-powered login using Latitude service
@@ -252,42 +343,206 @@ async def execute_scan(request: LatitudeRequest):
             - url (str): Target web application URL to scan
             - username (str): Username for authentication
             - password (str): Password for authentication
+            - priority (int): Queue priority, higher starts first
+            - block_resources (list): File types (by URL extension) the scan's browser skips
+            - block_hosts (list): Extra third-party hosts the browser never requests
             
     Returns:
         dict: Immediate response indicating scan initiation:
-            - success (bool): Whether the scan was successfully started
+            - success (bool): Whether the scan was successfully queued
+            - scan_id (str): ID of the scan, also the session_id of its browser
+            - status (str): Current status of the scan (queued or running)
             - message (str): Status message about background execution
             
     Raises:
         HTTPException: 500 if scan initialization fails
         
     Note:
-        This is an asynchronous operation. Use /screenshot and /logs endpoints
-        to monitor progress, and /report to get final results.
+        This is an asynchronous operation. Use /scans/{scan_id} for the status,
+        /scans/{scan_id}/progress or the /scans/{scan_id}/events stream to
+        monitor progress, and /report to get final results.
         
     Example:
         Start scan of "https://testapp.com" with credentials
     """
     try:
-        asyncio.create_task(orchestrate_scan(request.url, request.username, request.password))
-        return {"success": True, "message": "Scan started in background"}
+        scan_id = await job_manager.submit(
+            request.url, request.username, request.password, request.priority,
+            block_resources=request.block_resources, block_hosts=request.block_hosts
+        )
+        scan = await job_manager.get(scan_id)
+        return {"success": True, "scan_id": scan_id, "status": scan["status"], "message": "Scan queued for background execution"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/scans/batch",
+             operation_id="start_scan_batch")
+async def start_scan_batch(request: BatchScanRequest):
+    """
+    Queue security scans of several web applications at once.
     
+    Every target gets its own scan, exactly as with /start_latitude. Scans are
+    spread across the configured ZAP instances (ZAP_INSTANCES) by their
+    current load, so many applications are scanned in parallel.
+    
+    Args:
+        request: BatchScanRequest containing:
+            - targets (list): url, username and password of each application,
+              plus optional block_resources and block_hosts
+            - priority (int): Queue priority of the scans
+            
+    Returns:
+        dict: batch_id and the scan_id of each target, in the same order
+        
+    Raises:
+        HTTPException: 400 for an invalid URL, 500 if queueing fails
+        
+    Note:
+        Use /scans/batch/{batch_id} to follow the batch and collect the
+        results per target.
+    """
+    for target in request.targets:
+        parsed_url = urlparse(target.url)
+        if not parsed_url.scheme in ["http", "https"] or not parsed_url.netloc:
+            raise HTTPException(status_code=400, detail=f"Invalid URL format: {target.url}")
+    try:
+        batch_id, scan_ids = await job_manager.submit_batch(
+            [(target.url, target.username, target.password, target.block_resources, target.block_hosts) for target in request.targets],
+            request.priority
+        )
+        return {
+            "success": True,
+            "batch_id": batch_id,
+            "scans": [{"url": target.url, "scan_id": scan_id} for target, scan_id in zip(request.targets, scan_ids)],
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/scans/batch/{batch_id}",
+            operation_id="scan_batch_status")
+async def get_scan_batch(batch_id: str):
+    """
+    Get the status and results of every scan of a batch.
+    
+    Args:
+        batch_id: ID returned by /scans/batch
+        
+    Returns:
+        dict: Totals (total, finished, count per status) and the scan record
+              of each target with its status, ZAP instance and result
+              
+    Raises:
+        HTTPException: 404 if the batch does not exist
+    """
+    batch = await job_manager.batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail=f"Batch not found: {batch_id}")
+    return batch
+
+@router.get("/zap/instances",
+            operation_id="zap_instances")
+async def get_zap_instances():
+    """
+    Get the ZAP instances scans are spread across.
+    
+    Returns:
+        dict: Total capacity and, per instance, its API and proxy URLs,
+              running scans, load and health
+    """
+    return zap_registry.stats()
+
+@router.get("/scans",
+            operation_id="list_scans")
+async def list_scans(status: Optional[str] = None, limit: int = Query(50, ge=1, le=500), offset: int = Query(0, ge=0)):
+    """
+    List security scans, newest first.
+    
+    Args:
+        status: Only return scans in this status (queued, running, completed,
+                failed, cancelled, interrupted)
+        limit: Maximum number of scans to return
+        offset: Number of scans to skip
+        
+    Returns:
+        dict: Scheduler state (queued/running counts and limits) and the scans
+    """
+    return {"scheduler": job_manager.stats(), "scans": await job_manager.list(status, limit, offset)}
+
+@router.get("/scans/{scan_id}",
+            operation_id="scan_status")
+async def get_scan(scan_id: str):
+    """
+    Get the status and stored result of a security scan.
+    
+    Args:
+        scan_id: ID returned by /start_latitude
+        
+    Returns:
+        dict: Scan record with status, timestamps, queue_position (while
+              queued), result and error
+              
+    Raises:
+        HTTPException: 404 if the scan does not exist
+    """
+    scan = await job_manager.get(scan_id)
+    if scan is None:
+        raise HTTPException(status_code=404, detail=f"Scan not found: {scan_id}")
+    return scan
+
+@router.delete("/scans/{scan_id}",
+               operation_id="cancel_scan")
+async def cancel_scan(scan_id: str):
+    """
+    Cancel a queued or running security scan.
+    
+    Args:
+        scan_id: ID returned by /start_latitude
+        
+    Returns:
+        dict: success (bool) and scan_id
+        
+    Raises:
+        HTTPException: 404 if the scan does not exist, 409 if it already ended
+    """
+    if await job_manager.cancel(scan_id):
+        return {"success": True, "scan_id": scan_id}
+    if await job_manager.get(scan_id) is None:
+        raise HTTPException(status_code=404, detail=f"Scan not found: {scan_id}")
+    raise HTTPException(status_code=409, detail=f"Scan already finished: {scan_id}")
+    
+async def _scan_starting(session_id):
+    """Whether `session_id` is a scan that has not leased its browser yet (queued, or running without events)."""
+    if session_id == DEFAULT_SESSION:
+        return False
+    scan = await job_manager.get(session_id)
+    if scan is None:
+        return False
+    return scan["status"] == QUEUED or (scan["status"] == RUNNING and not broker.snapshot(session_id))
+
 @router.get("/screenshot",
             operation_id="screenshot")
-async def get_screenshot():
+async def get_screenshot(
+    session_id: str = DEFAULT_SESSION,
+    format: str = Query("png", enum=list(SCREENSHOT_FORMATS), description="Image format"),
+    width: Optional[int] = Query(None, ge=64, le=4096, description="Downscale to this width in pixels (default: full size)"),
+):
     """
     Get a real-time screenshot of the current browser state during scanning.
     
     This tool captures the current state of the web browser that is performing
     the security scan. It provides visual feedback about what the scanner is
-    currently doing. When scanning is complete, it returns a JSON message
-    instead of an image.
+    currently doing. When scanning is complete, or while the scan is still
+    waiting for its browser, it returns a JSON message instead of an image. While the session is streamed (/screenshot/stream)
+    the stream's latest frame is returned instead of a new capture.
     
+    Args:
+        session_id: Browser session to capture (the scan_id for scans)
+        format: "png" (default), "jpeg" or "webp"; JPEG/WebP are much smaller
+        width: Downscale to this width (e.g. 800), keeping the aspect ratio
+        
     Returns:
         Response: Either:
-            - StreamingResponse with PNG image of current browser state
+            - Image of current browser state in the requested format
             - JSON message indicating scanning has finished
             
     Raises:
@@ -301,32 +556,281 @@ async def get_screenshot():
         Monitor scanning progress by checking screenshot every few seconds
     """
     try:
-        driver = get_driver()
-        if driver is None:
+        frame = await screencasts.frame(session_id, format, width)
+        if frame is None:
+            if await _scan_starting(session_id):
+                return {"message": "Scan starting: its browser is not open yet"}
             #Scraping finished
             return {"message": "Scraping finished. Now starting the ZAP scan..."}
-        else:
-            png = driver.get_screenshot_as_png()
-            return StreamingResponse(io.BytesIO(png), media_type="image/png")
+        return StreamingResponse(io.BytesIO(frame.data), media_type=frame.media_type)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/logs", response_class=PlainTextResponse)
-async def get_logs():
+async def _mjpeg(frames):
+    async for frame in frames:
+        yield (
+            b"--frame\r\nContent-Type: " + frame.media_type.encode()
+            + b"\r\nContent-Length: " + str(len(frame.data)).encode() + b"\r\n\r\n" + frame.data + b"\r\n"
+        )
+
+@router.get("/screenshot/stream", tags=[STREAM_TAG])
+async def stream_screenshots(
+    session_id: str = DEFAULT_SESSION,
+    format: str = Query("jpeg", enum=list(SCREENSHOT_FORMATS), description="Image format of the frames"),
+    width: Optional[int] = Query(1024, ge=64, le=4096, description="Downscale frames to this width in pixels"),
+):
+    """
+    Live MJPEG (multipart/x-mixed-replace) stream of a browser session, usable as an <img> source.
+    
+    The session is captured once per SCREENCAST_INTERVAL for every viewer, and a frame is only
+    sent when the page changed. The stream ends when the session's browser is released.
+    """
+    if pool.get(session_id) is None:
+        raise HTTPException(status_code=404, detail=f"No browser for session: {session_id}")
+    return StreamingResponse(
+        _mjpeg(screencasts.stream(session_id, format, width)),
+        media_type="multipart/x-mixed-replace; boundary=frame",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/scans/{scan_id}/progress",
+            operation_id="scan_progress")
+async def get_scan_progress(scan_id: str):
+    """
+    Get the latest progress of a security scan.
+    
+    Returns the most recent event of every scan phase (login, crawl, spider,
+    AJAX spider, active scan) with its percentage, URLs found and alerts raised.
+    
+    Args:
+        scan_id: ID returned by /start_latitude
+        
+    Returns:
+        dict: scan_id and the list of latest events, oldest first
+        
+    Raises:
+        HTTPException: 404 if no progress is known for the scan
+    """
+    events = broker.snapshot(scan_id)
+    if not events:
+        raise HTTPException(status_code=404, detail=f"No progress found for scan: {scan_id}")
+    return {"scan_id": scan_id, "events": events}
+
+@router.get("/scans/{scan_id}/frontier",
+            operation_id="scan_frontier")
+async def get_scan_frontier(scan_id: str, take: int = Query(0, ge=0, le=100)):
+    """
+    Get the crawl frontier of a running scan.
+    
+    The frontier holds every in-scope URL discovered by ZAP's spiders and by
+    pages opened with navigate in the scan's browser session, deduplicated
+    by their canonical form; taken URLs are returned as they were found.
+    While scraping a scan, use `take` to get URLs that no
+    crawler has visited yet instead of guessing where to go next.
+    
+    Args:
+        scan_id: ID returned by /start_latitude
+        take: Number of unvisited URLs to hand out (they are not handed out again)
+        
+    Returns:
+        dict: Frontier counters (seen, visited, pending, duplicates,
+              out_of_scope, URLs per source) and the `urls` taken
+        
+    Raises:
+        HTTPException: 404 if the scan is not crawling
+    """
+    frontier = frontiers.get(scan_id)
+    if frontier is None:
+        raise HTTPException(status_code=404, detail=f"No crawl frontier for scan: {scan_id}")
+    urls = frontier.take(take) if take else []
+    return {"scan_id": scan_id, **frontier.stats(), "urls": urls}
+
+@router.get("/scans/{scan_id}/alerts",
+            operation_id="scan_alerts")
+async def get_scan_alerts(
+    scan_id: str,
+    min_risk: str = Query("Informational", enum=list(RISK_LEVELS)),
+    start: int = Query(0, ge=0),
+    count: int = Query(100, ge=1, le=1000)
+):
+    """
+    Get the alerts found so far by a running or recently finished scan.
+    
+    Alerts are collected from ZAP while the spider and active scan run and
+    deduplicated by (plugin, URL, parameter), so triage can start before the
+    scan ends. New alerts are also pushed as `alert` events on
+    /scans/{scan_id}/events.
+    
+    Args:
+        scan_id: ID returned by /start_latitude
+        min_risk: Lowest risk to include (Informational, Low, Medium, High)
+        start: Index of the first alert to return
+        count: Maximum number of alerts to return
+        
+    Returns:
+        dict: total matching alerts, whether collection finished, and the alerts
+        
+    Raises:
+        HTTPException: 404 if no alerts are being collected for the scan
+    """
+    index = alert_collector.get(scan_id)
+    if index is None:
+        raise HTTPException(status_code=404, detail=f"No alerts collected for scan: {scan_id}")
+    alerts, total = index.list(RISK_LEVELS[min_risk], start, count)
+    return {"scan_id": scan_id, "finished": index.finished, "total": total, "alerts": alerts}
+
+@router.get("/scans/{scan_id}/events", tags=[STREAM_TAG])
+async def scan_events(scan_id: str):
+    """
+    Server-Sent Events stream of a scan's progress.
+    
+    Emits `phase`, `progress` (percent, urls_found, alerts), `alert` (each new
+    deduplicated alert), `finished`, `failed` and `cancelled` events as they happen, so dashboards do not need to poll
+    /screenshot or /logs. The stream closes after the scan finishes or fails;
+    for a recently finished scan it replays the latest events and closes.
+
+    Raises:
+        HTTPException: 404 if the scan does not exist, or ended too long ago
+                       for its events to be kept (see /scans/{scan_id})
+    """
+    if not broker.known(scan_id):
+        scan = await job_manager.get(scan_id)
+        if scan is None:
+            raise HTTPException(status_code=404, detail=f"Scan not found: {scan_id}")
+        if scan["status"] not in (QUEUED, RUNNING):
+            raise HTTPException(status_code=404, detail=f"Scan {scan_id} is {scan['status']}: its events are no longer kept")
+    return StreamingResponse(
+        stream_events(scan_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/selenium/pool",
+            operation_id="selenium_pool_stats")
+async def get_pool_stats():
+    """
+    Get the state and metrics of the browser pool.
+    
+    Returns:
+        dict: Pool size, alive/idle/leased browsers, leased session IDs,
+              acquisition count, wait-time metrics, recycle counters,
+              page snapshot cache metrics, live screencasts and the
+              request blocklists in use
+    """
+    return {
+        **pool.stats(),
+        "snapshots": snapshot_cache.stats(),
+        "screencasts": screencasts.stats(),
+        "blocking": request_filters.stats(),
+    }
+
+@router.get("/metrics/latitude",
+            operation_id="latitude_metrics")
+async def get_latitude_metrics():
+    """
+    Get latency, token and outcome metrics of the Latitude prompt runs.
+    
+    Returns:
+        dict: Concurrency limit, runs running and waiting for a slot, and per
+              prompt: calls, errors, timeouts, retries, cache hits and
+              latency (seconds) and token histograms (count, sum, buckets
+              by upper bound), plus the estimated cost if
+              LATITUDE_COST_PER_1K_TOKENS is set
+    """
+    return latitude_runner.stats()
+
+@router.get("/auth/sessions",
+            operation_id="list_auth_sessions")
+async def list_auth_sessions():
+    """
+    List the logins stored for reuse by later scans.
+    
+    Returns:
+        dict: Reuse settings and counters (reused, stale, captured) and the
+              stored sessions (target, username, captured_at), without
+              their cookies or tokens
+    """
+    sessions = await run_blocking(auth_sessions.store.list)
+    return {**auth_sessions.stats(), "sessions": sessions}
+
+@router.delete("/auth/sessions",
+               operation_id="delete_auth_sessions")
+async def delete_auth_sessions(url: str, username: Optional[str] = None):
+    """
+    Forget the stored logins of a target, so the next scan logs in with the LoginAgent.
+    
+    Args:
+        url: Any URL of the target; its origin identifies the sessions
+        username: Only forget this user's session (default: every user)
+        
+    Returns:
+        dict: Target origin and number of sessions deleted
+    """
+    target = target_of(url)
+    deleted = await run_blocking(auth_sessions.store.delete, target, username)
+    return {"target": target, "deleted": deleted}
+
+@router.get("/auth/macros",
+            operation_id="list_login_macros")
+async def list_login_macros():
+    """
+    List the recorded login macros replayed instead of the LoginAgent.
+    
+    Returns:
+        dict: Replay settings and counters (recorded, replayed, failed) and
+              the macros (target, steps with {username}/{password}
+              placeholders, recorded_at, replays)
+    """
+    macros = await run_blocking(login_macros.store.list)
+    return {**login_macros.stats(), "macros": macros}
+
+@router.delete("/auth/macros",
+               operation_id="delete_login_macro")
+async def delete_login_macro(url: str):
+    """
+    Forget the login macro of a target, so the next scan logs in with the LoginAgent and records a new one.
+    
+    Args:
+        url: Any URL of the target; its origin identifies the macro
+        
+    Returns:
+        dict: Target origin and number of macros deleted
+    """
+    target = target_of(url)
+    deleted = await run_blocking(login_macros.store.delete, target)
+    return {"target": target, "deleted": deleted}
+
+@router.get("/logs")
+async def get_logs(
+    since: Optional[int] = Query(None, ge=0, description="Byte offset to read from: the next_offset of the previous call"),
+    scan_id: Optional[str] = Query(None, description="Only return the records of this scan"),
+    file_id: Optional[int] = Query(None, description="file_id of the previous call, to detect a rotated log"),
+):
     """
     Retrieve detailed logs from the current or most recent security scan.
     
     This tool provides access to comprehensive logging information from the
     DAST scanning process, including details about navigation, authentication
     attempts, crawling progress, and any errors encountered during the scan.
+    Only the bytes written after `since` are read, so polling stays cheap
+    however large the log grows.
     
+    Args:
+        since: Offset returned as next_offset by the previous call. Omit it to
+               get the end of the log.
+        scan_id: Only return records logged while running this scan
+        file_id: file_id returned by the previous call, with `since`
+            
     Returns:
-        str: Plain text log content containing:
-            - Timestamp entries for all scan activities
-            - Authentication status and attempts
-            - Crawling and spidering progress
-            - Error messages and debugging information
-            - Vulnerability detection progress
+        dict: Log records and offsets:
+            - records (list): JSON records with ts, level, logger, scan_id
+                              and message (and exc for errors)
+            - offset (int): Byte offset the records start at
+            - next_offset (int): Pass it as `since` to get what comes next
+            - size (int): Current size of the log file
+            - file_id (int): Identifies the log file; pass it back as `file_id`
+            - rotated (bool): The log was rotated since `since`; reading
+                              restarted at the top of the new file
             
     Raises:
         HTTPException:
@@ -334,59 +838,223 @@ async def get_logs():
             - 500 if unable to read log file
             
     Note:
-        Logs are continuously updated during scanning. Check periodically
-        for the latest information about scan progress and any issues.
+        Logs are continuously updated during scanning. Poll with the last
+        next_offset for the latest information about scan progress and any issues.
         
     Example:
-        Monitor scan progress and troubleshoot issues using log output
+        Monitor a scan: call with scan_id, then again with since=next_offset and file_id
     """
+    if not os.path.exists(LOG_FILE_PATH):
+        raise HTTPException(status_code=404, detail="Log file not found")
     try:
-        if not os.path.exists(LOG_FILE_PATH):
-            raise HTTPException(status_code=404, detail="Log file not found")
-
-        with open(LOG_FILE_PATH, "r", encoding='utf-8') as file:
-            logs = file.read()
-            # Log the contents to see what's inside
-            print("File content:", repr(logs))
-
-        return logs  # Return logs as plain text
-
+        return await run_blocking(read_log, LOG_FILE_PATH, since, scan_id, file_id=file_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error reading log file: {str(e)}")
 
+@router.get("/logs/follow", tags=[STREAM_TAG])
+async def follow_logs(
+    since: Optional[int] = Query(None, ge=0, description="Byte offset to start from (default: the end of the log)"),
+    scan_id: Optional[str] = Query(None, description="Only stream the records of this scan"),
+):
+    """
+    Stream log records as newline-delimited JSON as they are written (like `tail -F`).
+    
+    Follows the log across rotations. Idle streams get a blank line every 15 seconds.
+    """
+    if not os.path.exists(LOG_FILE_PATH):
+        raise HTTPException(status_code=404, detail="Log file not found")
+    return StreamingResponse(
+        follow_log(LOG_FILE_PATH, since, scan_id),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _scan_zap_client(scan_id):
+    """ZAP client of the instance that ran `scan_id` (the default instance without scan)."""
+    if scan_id is None:
+        return zap_registry.default.client
+    instance = zap_registry.assigned(scan_id)
+    if instance is None:
+        scan = await job_manager.get(scan_id)
+        instance = zap_registry.get(((scan or {}).get("result") or {}).get("zap_instance"))
+    return (instance or zap_registry.default).client
 
-@router.get("/report", response_class=HTMLResponse)
-async def get_report():
+@router.get("/report")
+async def get_report(
+    format: str = Query("html", enum=list(REPORT_FORMATS), description="Report format"),
+    min_risk: str = Query("Informational", enum=list(RISK_LEVELS), description="Lowest risk to include"),
+    site: Optional[str] = Query(None, description="Only alerts under this base URL, e.g. http://localhost:3000"),
+    plugin: Optional[str] = Query(None, description="Only alerts raised by this ZAP plugin ID"),
+    cursor: Optional[str] = Query(None, description="next_cursor returned by the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Alerts per page (default 100 when paginating)"),
+    scan_id: Optional[str] = Query(None, description="Scan the report belongs to; selects its ZAP instance and namespaces the report cache"),
+    refresh: bool = Query(False, description="Ignore the cached copy and render the report again")
+):
     """
-    Generate and retrieve the final security assessment report.
+    Generate and retrieve the security assessment report.
     
-    This tool creates a comprehensive HTML report of all vulnerabilities and
-    security issues discovered during the DAST scan. The report includes
-    detailed findings from OWASP ZAP's analysis, risk ratings, and remediation
-    recommendations.
+    Without filters this streams ZAP's full HTML (or XML) report with all
+    vulnerabilities, risk ratings and remediation recommendations. With
+    filters, a cursor or a limit, or in the json and sarif formats, it returns
+    one page of matching alerts, so agents can pull just the high-risk
+    findings instead of megabytes of report.
     
+    Args:
+        format: html, json, sarif or xml
+        min_risk: Informational, Low, Medium or High; lower risks are left out
+        site: Base URL to restrict the alerts to
+        plugin: ZAP plugin ID to restrict the alerts to
+        cursor: Cursor of the page to fetch
+        limit: Maximum number of alerts in the page
+        scan_id: Scan the report belongs to; the report is read from the ZAP
+                 instance that ran it
+        refresh: Bypass the report cache
+            
     Returns:
-        str: HTML-formatted security report containing:
-            - Executive summary of findings
-            - Detailed vulnerability descriptions
-            - Risk severity ratings (High, Medium, Low)
-            - Affected URLs and parameters
-            - Remediation recommendations
-            - Technical details for each finding
+        Chunked response in the requested format. Paginated responses carry
+        the next page's cursor in the X-Next-Cursor header and in the body
+        (next_cursor), which is null/absent on the last page.
+        Rendered reports are cached until ZAP's alert count or message count
+        changes; the X-Cache header tells whether the copy was cached (HIT) or
+        rendered now (MISS).
             
     Raises:
-        HTTPException: 500 if report generation fails
+        HTTPException: 400 for an invalid cursor, 500 if report generation fails
         
     Note:
         This should only be called after a scan has completed.
         The report includes findings from all scanning phases.
         
     Example:
-        Retrieve final security assessment report after scan completion
+        format=json&min_risk=High to fetch only the high-risk findings
     """
     try:
-        html_response = create_zap_report()
-        return html_response  # Return the xml
+        client = await _scan_zap_client(scan_id)
+        fingerprint = await report_fingerprint(site, client)
+        key = report_cache.make_key(
+            scan_id or "zap", fingerprint,
+            format=format, min_risk=min_risk, site=site, plugin=plugin, cursor=cursor, limit=limit
+        )
+        entry = None if refresh else report_cache.get(key)
+        if entry is not None:
+            return FileResponse(entry.path, media_type=entry.media_type, headers={**entry.headers, "X-Cache": "HIT"})
 
+        media_type, headers, body = await build_report(format, site, RISK_LEVELS[min_risk], plugin, cursor, limit, client)
+        return StreamingResponse(
+            report_cache.tee(key, media_type, headers, body),
+            media_type=media_type,
+            headers={**headers, "X-Cache": "MISS"}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error reading log file: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error generating report: {str(e)}")
+
+
+@router.post("/reports/import",
+             operation_id="import_report")
+async def import_report(request: ReportImportRequest):
+    """
+    Load a ZAP XML report into the indexed report store.
+    
+    The report is parsed as a stream (site -> alertitem -> instances), so
+    reports of hundreds of MB are ingested with constant memory. Once
+    imported, query it with /reports/{report_id}/alerts instead of moving the
+    whole report around.
+    
+    Args:
+        request: ReportImportRequest containing:
+            - report_id (str, optional): ID to store the report under
+              (default: scan_id)
+            - path (str, optional): XML report file, relative to the server's
+              reports directory (REPORT_IMPORT_DIR); the current ZAP report is
+              downloaded if omitted
+            - scan_id (str, optional): Scan whose ZAP instance the current
+              report is downloaded from
+            
+    Returns:
+        dict: report_id and number of alerts and instances stored
+        
+    Raises:
+        HTTPException: 400 for a path outside the reports directory, 404 if
+            the file or the scan does not exist, 500 if parsing fails
+    """
+    report_id = request.report_id or request.scan_id or uuid.uuid4().hex
+    try:
+        if request.path:
+            try:
+                path = resolve_import_path(request.path)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            if not os.path.isfile(path):
+                raise HTTPException(status_code=404, detail=f"Report file not found: {request.path}")
+            return await run_blocking(report_store.ingest, report_id, path, request.path)
+
+        if request.scan_id and zap_registry.assigned(request.scan_id) is None and await job_manager.get(request.scan_id) is None:
+            raise HTTPException(status_code=404, detail=f"Scan not found: {request.scan_id}")
+        client = await _scan_zap_client(request.scan_id)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = await download_zap_report(os.path.join(tmp_dir, "report.xml"), client=client)
+            return await run_blocking(report_store.ingest, report_id, path, "zap")
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error importing report: {str(e)}")
+
+@router.get("/reports",
+            operation_id="list_reports")
+async def list_reports(limit: int = Query(50, ge=1, le=500), offset: int = Query(0, ge=0)):
+    """
+    List the reports stored in the indexed report store, newest first.
+    
+    Returns:
+        dict: reports with their ID, source, import time and alert/instance counts
+    """
+    return {"reports": await run_blocking(report_store.list_reports, limit, offset)}
+
+@router.get("/reports/{report_id}",
+            operation_id="report_summary")
+async def get_report_summary(report_id: str):
+    """
+    Get the summary of a stored report: alert and instance counts and alerts per risk code
+    (0 Informational, 1 Low, 2 Medium, 3 High).
+    
+    Raises:
+        HTTPException: 404 if the report does not exist
+    """
+    report = await run_blocking(report_store.get_report, report_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail=f"Report not found: {report_id}")
+    return report
+
+@router.get("/reports/{report_id}/alerts",
+            operation_id="query_report_alerts")
+async def query_report_alerts(
+    report_id: str,
+    min_risk: int = Query(0, ge=0, le=3, description="Lowest risk code: 0 Informational, 1 Low, 2 Medium, 3 High"),
+    min_confidence: int = Query(0, ge=0, le=4, description="Lowest confidence: 0 False positive, 1 Low, 2 Medium, 3 High, 4 Confirmed"),
+    plugin: Optional[int] = Query(None, description="ZAP plugin ID"),
+    host: Optional[str] = Query(None, description="Host name, e.g. localhost"),
+    uri_prefix: Optional[str] = Query(None, description="Only instances whose URI starts with this prefix"),
+    details: bool = Query(False, description="Include description, solution and references"),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0)
+):
+    """
+    Query the alert instances of a stored report, highest risk first.
+    
+    Returns one row per affected URI with the alert it belongs to. Use
+    next_offset to fetch the following page.
+    
+    Returns:
+        dict: report_id, the matching rows and next_offset (null on the last page)
+        
+    Raises:
+        HTTPException: 404 if the report does not exist
+    """
+    if await run_blocking(report_store.get_report, report_id) is None:
+        raise HTTPException(status_code=404, detail=f"Report not found: {report_id}")
+    rows, next_offset = await run_blocking(
+        report_store.query, report_id, min_risk, min_confidence, plugin, host, uri_prefix, limit, offset, details
+    )
+    return {"report_id": report_id, "alerts": rows, "next_offset": next_offset}
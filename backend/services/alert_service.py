@@ -0,0 +1,125 @@
+from collections import OrderedDict
+from services.progress_service import broker
+from services.zap_service import zap
+import asyncio
+import logging
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# ZAP risk names to numeric levels (same scale as riskcode in ZAP reports)
+RISK_LEVELS = {"Informational": 0, "Low": 1, "Medium": 2, "High": 3}
+
+# Alert fields kept in the index and sent to clients
+ALERT_FIELDS = ("id", "pluginId", "alertRef", "alert", "risk", "confidence", "url", "method",
+                "param", "attack", "evidence", "cweid", "wascid", "messageId")
+
+# How many finished scans keep their alert index in memory
+MAX_FINISHED_INDEXES = 20
+
+def alert_key(alert):
+    return (alert.get("pluginId"), alert.get("url"), alert.get("param"))
+
+class AlertIndex:
+    """Alerts of one scan, deduplicated by (pluginid, uri, param) in arrival order."""
+
+    def __init__(self):
+        self._alerts = OrderedDict()
+        self.offset = 0  # Number of raw ZAP alerts already consumed
+        self.finished = False
+
+    def __len__(self):
+        return len(self._alerts)
+
+    def add(self, alert):
+        """Indexes a raw ZAP alert. Returns the compact alert if it is new, None if it is a duplicate."""
+        key = alert_key(alert)
+        if key in self._alerts:
+            return None
+        compact = {field: alert.get(field) for field in ALERT_FIELDS}
+        compact["riskcode"] = RISK_LEVELS.get(alert.get("risk"), 0)
+        self._alerts[key] = compact
+        return compact
+
+    def list(self, min_risk=0, start=0, count=100):
+        matches = [a for a in self._alerts.values() if a["riskcode"] >= min_risk]
+        return matches[start:start + count], len(matches)
+
+class AlertCollector:
+    """
+    Pages through a scan's ZAP alerts with start/count offsets while the scan
+    runs, indexing and publishing each new alert as an `alert` event.
+    """
+
+    def __init__(self, zap, page_size=200, interval=3.0):
+        self.zap = zap
+        self.page_size = page_size
+        self.interval = interval
+        self._indexes = OrderedDict()
+        self._tasks = {}
+        self._stops = {}
+
+    def start(self, scan_id, baseurl, zap=None):
+        """Starts collecting the alerts under `baseurl`, from `zap` (the collector's client by default)."""
+        index = AlertIndex()
+        self._indexes[scan_id] = index
+        self._stops[scan_id] = asyncio.Event()
+        self._tasks[scan_id] = asyncio.create_task(self._collect(scan_id, baseurl, index, self._stops[scan_id], zap or self.zap))
+        return index
+
+    async def stop(self, scan_id):
+        """Stops collecting after one last drain of the alerts ZAP raised so far."""
+        stop = self._stops.pop(scan_id, None)
+        task = self._tasks.pop(scan_id, None)
+        if stop is None:
+            return
+        stop.set()
+        try:
+            await task
+        except Exception as e:
+            logger.warning(f"[alerts] Collector for scan {scan_id} failed: {e}")
+        self._trim()
+
+    def get(self, scan_id):
+        return self._indexes.get(scan_id)
+
+    async def drain(self, scan_id, baseurl, index, zap=None):
+        """Reads every alert past the index offset. Returns how many new alerts were indexed."""
+        zap = zap or self.zap
+        new = 0
+        while True:
+            page = await zap.core_alerts(baseurl=baseurl, start=index.offset, count=self.page_size)
+            index.offset += len(page)
+            for alert in page:
+                compact = index.add(alert)
+                if compact is not None:
+                    new += 1
+                    broker.publish(scan_id, "alert", **compact)
+            if len(page) < self.page_size:
+                return new
+
+    async def _collect(self, scan_id, baseurl, index, stop, zap):
+        while not stop.is_set():
+            try:
+                await self.drain(scan_id, baseurl, index, zap)
+            except Exception as e:
+                logger.warning(f"[alerts] Error reading alerts for scan {scan_id}: {e}")
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+        try:
+            await self.drain(scan_id, baseurl, index, zap)
+        finally:
+            index.finished = True
+
+    def _trim(self):
+        finished = [scan_id for scan_id, index in self._indexes.items() if index.finished]
+        for scan_id in finished[:max(0, len(finished) - MAX_FINISHED_INDEXES)]:
+            del self._indexes[scan_id]
+
+alert_collector = AlertCollector(
+    zap,
+    page_size=int(settings.get("ALERT_PAGE_SIZE", "200")),
+    interval=float(settings.get("ALERT_POLL_INTERVAL", "3")),
+)
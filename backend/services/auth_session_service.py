@@ -0,0 +1,244 @@
+from services.executor_service import run_blocking, run_in_browser
+from services import browser_actions
+from urllib.parse import urlsplit
+import json
+import logging
+import re
+import sqlite3
+import time
+from config.settings import settings
+import os
+
+logger = logging.getLogger(__name__)
+
+AUTH_SESSION_REUSE = settings.get("AUTH_SESSION_REUSE", "1") == "1"  # 0: the LoginAgent logs in on every scan
+AUTH_SESSION_DB_PATH = settings.get("AUTH_SESSION_DB_PATH", os.path.join(".data", "auth_sessions.db"))
+AUTH_SESSION_TTL = float(settings.get("AUTH_SESSION_TTL", "3600"))  # Seconds a captured login is tried before logging in again
+
+# Request headers that carry a login (token-based apps) and are replayed through ZAP
+AUTH_HEADERS = ("authorization", "x-auth-token", "x-access-token", "x-api-key")
+# Latest proxied requests searched for those headers after a login
+HEADER_SCAN_MESSAGES = 50
+
+def target_of(url):
+    """Origin a login belongs to, e.g. "https://app.example.com"."""
+    parts = urlsplit(url)
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}"
+
+def parse_auth_headers(messages):
+    """Latest value of each AUTH_HEADERS header in ZAP history messages, by lowercase header name."""
+    headers = {}
+    for message in messages:
+        for line in message.get("requestHeader", "").splitlines()[1:]:
+            name, separator, value = line.partition(":")
+            name = name.strip().lower()
+            if separator and name in AUTH_HEADERS:
+                headers[name] = value.strip()
+    return headers
+
+class AuthSessionStore:
+    """
+    SQLite store of captured logins (URL, cookies, localStorage, headers)
+    by target origin and username. Passwords are never stored. Methods are
+    blocking; call them through run_blocking.
+    """
+
+    def __init__(self, db_path=AUTH_SESSION_DB_PATH):
+        self.db_path = db_path
+        self._initialized = False
+
+    def _connect(self):
+        if not self._initialized:
+            self._init()
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS auth_sessions (
+                    target TEXT NOT NULL,
+                    username TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    captured_at REAL NOT NULL,
+                    PRIMARY KEY (target, username)
+                )
+            """)
+        self._initialized = True
+
+    def get(self, target, username):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT state, captured_at FROM auth_sessions WHERE target = ? AND username = ?", (target, username)
+            ).fetchone()
+        if row is None:
+            return None
+        return {**json.loads(row[0]), "captured_at": row[1]}
+
+    def save(self, target, username, state):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO auth_sessions (target, username, state, captured_at) VALUES (?, ?, ?, ?)",
+                (target, username, json.dumps(state), time.time())
+            )
+
+    def delete(self, target, username=None):
+        query = "DELETE FROM auth_sessions WHERE target = ?"
+        params = [target]
+        if username is not None:
+            query += " AND username = ?"
+            params.append(username)
+        with self._connect() as conn:
+            return conn.execute(query, params).rowcount
+
+    def list(self):
+        """Stored logins without their secrets."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT target, username, captured_at FROM auth_sessions ORDER BY captured_at DESC"
+            ).fetchall()
+        return [{"target": target, "username": username, "captured_at": captured_at} for target, username, captured_at in rows]
+
+class AuthSessionManager:
+    """
+    Reuses logins across scans of the same target and username.
+
+    Before the LoginAgent runs, `restore` injects the stored session into
+    the scan's browser (cookies, localStorage) and into ZAP (session tokens
+    of the scan's HTTP session, headers through replacer rules scoped to the
+    target) and checks that the landing page is still authenticated. Stale
+    sessions are deleted and the agent logs in as before; its first
+    successful login click is then captured (`expect_login` / `on_login`).
+    All state is touched from the event loop only.
+    """
+
+    def __init__(self, store=None, reuse=AUTH_SESSION_REUSE, ttl=AUTH_SESSION_TTL):
+        self.store = store or AuthSessionStore()
+        self.reuse = reuse
+        self.ttl = ttl
+        self._expected = {}  # Scan ID -> (target, username, scan context) waiting for a login
+        self._rules = {}  # Scan ID -> (ZAP client, replacer rule descriptions)
+        # Metrics
+        self.reused = 0
+        self.stale = 0
+        self.captured = 0
+
+    async def restore(self, scan_id, url, username, context):
+        """
+        Logs the scan's browser in with the stored session of `url` and
+        `username`. Returns a login result if the session is still valid,
+        None if the agent has to log in.
+        """
+        if not self.reuse or not username:
+            return None
+        target = target_of(url)
+        state = await run_blocking(self.store.get, target, username)
+        if state is None:
+            return None
+
+        valid = time.time() - state["captured_at"] <= self.ttl
+        if valid:
+            try:
+                # Headers first, so the check request already carries them
+                await self._apply_headers(scan_id, context, target, state.get("headers", {}))
+                valid = await run_in_browser(scan_id, browser_actions.restore_auth_state, state)
+            except Exception as e:
+                logger.warning(f"[auth] Could not restore session of {username} on {target}: {e}")
+                valid = False
+        if not valid:
+            self.stale += 1
+            logger.info(f"[auth] Stored session of {username} on {target} is stale, logging in again")
+            await run_blocking(self.store.delete, target, username)
+            await self._remove_headers(scan_id)
+            try:
+                await run_in_browser(scan_id, browser_actions.clear_auth_state)
+            except Exception as e:
+                logger.warning(f"[auth] Could not clear restored session of scan {scan_id}: {e}")
+            return None
+
+        await self._set_zap_tokens(context, state["cookies"])
+        self.reused += 1
+        return {"session_reused": True, "url": state["url"], "captured_at": state["captured_at"]}
+
+    def expect_login(self, scan_id, url, username, context):
+        """Captures the session after the next successful login click of the scan's browser."""
+        if self.reuse and username:
+            self._expected[scan_id] = (target_of(url), username, context)
+
+    async def on_login(self, session_id):
+        """Called after a login click succeeded in `session_id`'s browser. Returns True if the session was stored."""
+        expected = self._expected.pop(session_id, None)
+        if expected is None:
+            return False
+        target, username, context = expected
+        try:
+            state = await run_in_browser(session_id, browser_actions.capture_auth_state)
+            state["headers"] = await self._login_headers(context.instance.client, target)
+            await run_blocking(self.store.save, target, username, state)
+            # ZAP's own requests (spider, active scan) get the headers for the rest of this scan
+            await self._apply_headers(session_id, context, target, state["headers"])
+        except Exception as e:
+            logger.warning(f"[auth] Could not capture session of {username} on {target}: {e}")
+            return False
+        self.captured += 1
+        return True
+
+    async def release(self, scan_id):
+        """Removes what the scan added to ZAP. Called when the scan ends."""
+        self._expected.pop(scan_id, None)
+        await self._remove_headers(scan_id)
+
+    async def _login_headers(self, zap, target):
+        total = await zap.core_number_of_messages(baseurl=target)
+        messages = await zap.core_messages(baseurl=target, start=max(0, total - HEADER_SCAN_MESSAGES), count=HEADER_SCAN_MESSAGES)
+        return parse_auth_headers(messages)
+
+    async def _apply_headers(self, scan_id, context, target, headers):
+        if not headers:
+            return
+        zap = context.instance.client
+        _, descriptions = self._rules.setdefault(scan_id, (zap, []))
+        for name, value in headers.items():
+            description = f"scan-{scan_id}-{name}"
+            if description in descriptions:
+                await zap.replacer_remove_rule(description)
+                descriptions.remove(description)
+            await zap.replacer_add_rule(description, "REQ_HEADER", name, value, url=re.escape(target) + "/.*")
+            descriptions.append(description)
+
+    async def _remove_headers(self, scan_id):
+        zap, descriptions = self._rules.pop(scan_id, (None, []))
+        for description in descriptions:
+            try:
+                await zap.replacer_remove_rule(description)
+            except Exception as e:
+                logger.warning(f"[auth] Could not remove replacer rule {description}: {e}")
+
+    async def _set_zap_tokens(self, context, cookies):
+        if not context.session:
+            return
+        zap = context.instance.client
+        host = context.site.rsplit(":", 1)[0]
+        now = time.time()
+        for cookie in cookies:
+            domain = cookie.get("domain", "").lstrip(".")
+            if (cookie.get("expiry") and cookie["expiry"] < now) or (host != domain and not host.endswith("." + domain)):
+                continue
+            try:
+                await zap.http_sessions_add_session_token(context.site, cookie["name"])
+                await zap.http_sessions_set_session_token_value(context.site, context.session, cookie["name"], cookie["value"])
+            except Exception as e:
+                logger.warning(f"[auth] Could not set ZAP session token {cookie['name']}: {e}")
+
+    def stats(self):
+        return {
+            "enabled": self.reuse,
+            "ttl": self.ttl,
+            "reused": self.reused,
+            "stale": self.stale,
+            "captured": self.captured,
+        }
+
+auth_sessions = AuthSessionManager()
@@ -0,0 +1,242 @@
+from selenium.common.exceptions import TimeoutException
+from utils.utils import cookies_changed, extract_page_structure, extract_page_structure_js, close_all_popups
+from services.snapshot_service import snapshot_cache, page_hash, diff_summaries, PageSnapshot
+from urllib.parse import urlsplit
+from config.settings import settings
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# "parser" parses page_source in Python; "js" extracts the structure inside the browser
+PAGE_EXTRACTION_MODE = settings.get("PAGE_EXTRACTION_MODE", "parser")
+POPUP_TIME_BUDGET = float(settings.get("POPUP_TIME_BUDGET", "2"))  # Seconds spent dismissing popups after a page load
+
+# Blocking browser actions. They receive the session's driver and are meant to run on the
+# browser executor (see services.executor_service.run_in_browser), never on the event loop.
+# selenium.webdriver is imported inside them: importing it takes a noticeable part of the
+# app's startup, and by the time an action runs the pool has loaded it anyway.
+
+class LoginFailedError(Exception):
+    """Raised when a login click does not lead to a new page."""
+
+def _extract(driver, url):
+    if PAGE_EXTRACTION_MODE == "js":
+        return extract_page_structure_js(driver, url)
+    return extract_page_structure(driver.page_source, url)
+
+def navigate(driver, url, session_id=None, incremental=False):
+    """
+    Loads `url`, waits for the document to be ready and returns the page structure.
+
+    Returns a dict with a `status`: "new" with the full `elements`, or, when
+    `incremental` is set and the page was visited before in this session,
+    "unchanged" (no elements) or "changed" with only the `diff`. A page that
+    is still loaded and whose DOM hash did not change is not reloaded.
+    Dismissed popups are listed in `popups_closed`.
+    """
+    from selenium.webdriver.support.ui import WebDriverWait
+    snapshot = snapshot_cache.get(session_id, url) if incremental else None
+    if snapshot is not None and driver.current_url == snapshot.final_url and page_hash(driver) == snapshot.settled_hash:
+        snapshot_cache.record("hits")
+        return {"status": "unchanged"}
+
+    driver.get(url)
+    WebDriverWait(driver, 5).until(
+        lambda d: d.execute_script("return document.readyState") == "complete"
+    )
+    load_hash = page_hash(driver)
+    if snapshot is not None and load_hash == snapshot.load_hash:
+        snapshot_cache.record("unchanged")
+        summary = snapshot.summary
+    else:
+        snapshot_cache.record("misses")
+        summary = _extract(driver, url)
+
+    closed = close_all_popups(driver, timeout=POPUP_TIME_BUDGET)
+    snapshot_cache.put(session_id, PageSnapshot(url, driver.current_url, load_hash, page_hash(driver), summary))
+
+    if snapshot is None:
+        result = {"status": "new", "elements": summary}
+    elif summary is snapshot.summary:
+        result = {"status": "unchanged"}
+    else:
+        diff = diff_summaries(snapshot.summary, summary)
+        result = {"status": "changed", "diff": diff} if diff else {"status": "unchanged"}
+    if closed:
+        result["popups_closed"] = closed
+    return result
+
+def _by(selector):
+    from selenium.webdriver.common.by import By
+    # Determinar si el selector es CSS o XPath
+    return By.XPATH if selector.strip().startswith("//") else By.CSS_SELECTOR
+
+def extract(driver):
+    """Returns the structure of the page currently loaded, without reloading it."""
+    return _extract(driver, driver.current_url)
+
+def wait_for(driver, selector=None, timeout=5):
+    """Waits until the element matching `selector` (CSS or XPath) is visible, or just sleeps `timeout` seconds."""
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    if not selector:
+        time.sleep(timeout)
+        return None
+    WebDriverWait(driver, timeout).until(
+        EC.visibility_of_element_located((_by(selector), selector))
+    )
+    return None
+
+def input_text(driver, selector, content, timeout=5):
+    """Clears the visible field matching the CSS `selector` and types `content`."""
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.common.by import By
+    element = WebDriverWait(driver, timeout).until(
+        EC.visibility_of_element_located((By.CSS_SELECTOR, selector))
+    )
+    element.clear()
+    element.send_keys(content)
+
+def click_element(driver, selector, is_login_button=False, timeout=5):
+    """
+    Clicks the element matching `selector` (CSS or XPath).
+
+    Raises TimeoutException if the element is not clickable. For login
+    buttons returns whether the cookies changed after the page moved, and
+    raises LoginFailedError if the URL never changes.
+    """
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    by = _by(selector)
+
+    logger.debug(f"[browser] Waiting for element with selector: {selector} (By: {by})")
+    element = WebDriverWait(driver, timeout).until(
+        EC.element_to_be_clickable((by, selector))
+    )
+
+    if not is_login_button:
+        element.click()
+        return None
+
+    cookies_before = driver.get_cookies()
+    current_url = driver.current_url
+    element.click()
+    try:
+        WebDriverWait(driver, timeout).until(EC.url_changes(current_url))
+    except TimeoutException:
+        raise LoginFailedError("Login failed: credentials likely invalid")
+    cookies_after = driver.get_cookies()
+    return cookies_changed(cookies_before, cookies_after)
+
+# True if the page shows a password field, i.e. it is (still) a login form
+VISIBLE_PASSWORD_SCRIPT = """
+return Array.from(document.querySelectorAll('input[type=password]')).some(e => e.offsetParent !== null);
+"""
+
+def capture_auth_state(driver):
+    """Returns the URL, cookies and localStorage of the page currently loaded, right after a login."""
+    return {
+        "url": driver.current_url,
+        "cookies": driver.get_cookies(),
+        "local_storage": driver.execute_script("return Object.assign({}, window.localStorage);") or {},
+    }
+
+def _cookie_params(cookie, scheme):
+    # Selenium cookie -> CDP Network.setCookie parameters
+    params = {key: cookie[key] for key in ("name", "value", "path", "secure", "httpOnly") if key in cookie}
+    domain = cookie.get("domain", "")
+    if domain.startswith("."):
+        params["domain"] = domain
+    else:
+        # Host-only cookie: passing `domain` would widen it to the subdomains
+        params["url"] = f"{scheme}://{domain}{cookie.get('path', '/')}"
+    if "expiry" in cookie:
+        params["expires"] = cookie["expiry"]
+    if cookie.get("sameSite") in ("Strict", "Lax", "None"):
+        params["sameSite"] = cookie["sameSite"]
+    return params
+
+def restore_auth_state(driver, state, timeout=5):
+    """
+    Loads a captured login into the browser and opens the page it landed on.
+
+    Cookies are set through CDP (any domain, httpOnly included), expired
+    ones skipped; localStorage needs the page's origin, so the page is
+    loaded once to write it and once more to use it. Returns True if the
+    session still works: the page did not redirect to another path and
+    shows no password field.
+    """
+    from selenium.webdriver.support.ui import WebDriverWait
+    scheme = urlsplit(state["url"]).scheme
+    now = time.time()
+    for cookie in state["cookies"]:
+        if cookie.get("expiry") and cookie["expiry"] < now:
+            continue
+        driver.execute_cdp_cmd("Network.setCookie", _cookie_params(cookie, scheme))
+
+    driver.get(state["url"])
+    if state.get("local_storage"):
+        driver.execute_script(
+            "for (const [k, v] of Object.entries(arguments[0])) { window.localStorage.setItem(k, v); }",
+            state["local_storage"]
+        )
+        driver.get(state["url"])
+    WebDriverWait(driver, timeout).until(
+        lambda d: d.execute_script("return document.readyState") == "complete"
+    )
+    if urlsplit(driver.current_url).path != urlsplit(state["url"]).path:
+        return False
+    return is_logged_in(driver)
+
+def is_logged_in(driver):
+    """Login check after a restore or a replayed login: the page no longer shows a password field."""
+    return not driver.execute_script(VISIBLE_PASSWORD_SCRIPT)
+
+def clear_auth_state(driver):
+    """Removes the cookies and the current origin's localStorage after a failed restore."""
+    driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+    driver.execute_script("window.localStorage.clear();")
+
+def _run_step(driver, step, session_id):
+    action = step["action"]
+    if action == "navigate":
+        return navigate(driver, step["url"], session_id, step.get("incremental", False))
+    if action == "input":
+        input_text(driver, step["selector"], step["content"], step["timeout"])
+        return {}
+    if action == "click":
+        return {"isLogged": click_element(driver, step["selector"], step.get("isLogInButton", False), step["timeout"])}
+    if action == "wait":
+        wait_for(driver, step.get("selector"), step["timeout"])
+        return {}
+    if action == "extract":
+        return {"elements": extract(driver)}
+    raise ValueError(f"Unknown action: {action}")
+
+def run_batch(driver, steps, session_id=None, stop_on_error=True):
+    """
+    Runs `steps` (dicts with an `action` and its arguments) in order on one
+    browser. Returns one result per step that ran; with `stop_on_error` the
+    batch ends at the first failed step.
+    """
+    results = []
+    for index, step in enumerate(steps):
+        started = time.perf_counter()
+        result = {"index": index, "action": step["action"], "success": True}
+        try:
+            result.update(_run_step(driver, step, session_id))
+        except TimeoutException:
+            if step["action"] == "navigate":
+                error = f"Timed out loading {step['url']}"
+            else:
+                error = f"Element not found or not interactable: {step.get('selector')}"
+            result.update(success=False, error=error)
+        except Exception as e:
+            result.update(success=False, error=str(e))
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        results.append(result)
+        if not result["success"] and stop_on_error:
+            break
+    return results
@@ -0,0 +1,144 @@
+import logging
+import shutil
+import tempfile
+import threading
+from config.settings import settings
+import os
+
+logger = logging.getLogger(__name__)
+
+SELENIUM_PROFILE = settings.get("SELENIUM_PROFILE", "headless")  # visual | headless | fast
+SELENIUM_WINDOW_SIZE = settings.get("SELENIUM_WINDOW_SIZE", "1280,800")
+SELENIUM_EXTRA_ARGS = settings.get("SELENIUM_EXTRA_ARGS", "")  # Comma-separated extra Chrome flags
+SELENIUM_USER_DATA_TEMPLATE = settings.get("SELENIUM_USER_DATA_TEMPLATE", "")  # Initialized profile copied for each browser
+SELENIUM_CACHE_DIR = settings.get("SELENIUM_CACHE_DIR", "")  # Disk cache kept across browser restarts
+
+# Chrome services that phone home or do background work a scan never needs.
+# Their requests also went through ZAP and ended up in reports
+# (e.g. passwordsleakcheck-pa.googleapis.com).
+QUIET_ARGS = [
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-extensions",
+    "--disable-sync",
+    "--disable-domain-reliability",
+    "--disable-client-side-phishing-detection",
+    "--disable-features=Translate,OptimizationHints,MediaRouter,AutofillServerCommunication",
+    "--metrics-recording-only",
+    "--mute-audio",
+    "--password-store=basic",
+]
+QUIET_PREFS = {
+    "credentials_enable_service": False,
+    "profile.password_manager_enabled": False,
+    "profile.password_manager_leak_detection": False,
+    "safebrowsing.enabled": False,
+}
+
+LAUNCH_PROFILES = {
+    # Chrome with a window, as before
+    "visual": {"headless": False, "args": [], "prefs": {}},
+    "headless": {"headless": True, "args": QUIET_ARGS, "prefs": QUIET_PREFS},
+    # Also skips images and web fonts: faster loads, less traffic through ZAP, blander screenshots
+    "fast": {
+        "headless": True,
+        "args": QUIET_ARGS + ["--disable-remote-fonts", "--blink-settings=imagesEnabled=false"],
+        "prefs": {**QUIET_PREFS, "profile.managed_default_content_settings.images": 2},
+    },
+}
+
+def build_options(profile=SELENIUM_PROFILE, user_data_dir=None, cache_dir=None):
+    """Chrome options of a launch profile (see LAUNCH_PROFILES), without the proxy."""
+    from selenium.webdriver.chrome.options import Options
+    if profile not in LAUNCH_PROFILES:
+        raise ValueError(f"Unknown SELENIUM_PROFILE {profile!r}, expected one of {', '.join(LAUNCH_PROFILES)}")
+    profile_opts = LAUNCH_PROFILES[profile]
+    options = Options()
+    if profile_opts["headless"]:
+        options.add_argument("--headless=new")
+    options.add_argument(f"--window-size={SELENIUM_WINDOW_SIZE}")
+    for argument in profile_opts["args"] + [arg.strip() for arg in SELENIUM_EXTRA_ARGS.split(",") if arg.strip()]:
+        options.add_argument(argument)
+    if profile_opts["prefs"]:
+        options.add_experimental_option("prefs", profile_opts["prefs"])
+    if user_data_dir:
+        options.add_argument(f"--user-data-dir={user_data_dir}")
+    if cache_dir:
+        options.add_argument(f"--disk-cache-dir={cache_dir}")
+    return options
+
+class LaunchDirs:
+    """
+    Directories given to each browser at launch.
+
+    With a user-data template, every browser starts from a private copy of
+    an already initialized profile instead of creating one (first run,
+    default files) while starting; the template is created on first use.
+    With a cache directory, each concurrently running browser gets its own
+    slot in it, and slots are reused by later browsers, so a recycled
+    browser starts with a warm cache while two live browsers never share
+    one. Thread-safe: browsers are created from the browser executor.
+    """
+
+    def __init__(self, template=SELENIUM_USER_DATA_TEMPLATE, cache_root=SELENIUM_CACHE_DIR):
+        self.template = template
+        self.cache_root = cache_root
+        self._lock = threading.Lock()
+        self._free_slots = []
+        self._next_slot = 0
+        self._owned = {}  # WebDriver session ID -> (user-data copy, cache slot)
+
+    def _ensure_template(self, launch):
+        with self._lock:
+            if os.path.isdir(self.template):
+                return
+            os.makedirs(self.template)
+            try:
+                # A browser started on the template initializes it
+                launch(user_data_dir=self.template).quit()
+            except Exception:
+                shutil.rmtree(self.template, ignore_errors=True)
+                raise
+            logger.info(f"[pool] Created browser profile template at {self.template}")
+
+    def allocate(self, launch):
+        """Returns (user_data_dir, cache_dir) for a new browser; None where not configured."""
+        user_data_dir = None
+        if self.template:
+            self._ensure_template(launch)
+            user_data_dir = tempfile.mkdtemp(prefix="chrome-profile-")
+            shutil.copytree(self.template, user_data_dir, dirs_exist_ok=True,
+                            ignore=shutil.ignore_patterns("Singleton*", "*.lock"))
+        slot = None
+        if self.cache_root:
+            with self._lock:
+                if self._free_slots:
+                    slot = self._free_slots.pop()
+                else:
+                    slot = self._next_slot
+                    self._next_slot += 1
+        cache_dir = os.path.join(self.cache_root, str(slot)) if slot is not None else None
+        return user_data_dir, cache_dir, slot
+
+    def adopt(self, driver, user_data_dir, slot):
+        with self._lock:
+            self._owned[driver.session_id] = (user_data_dir, slot)
+
+    def release(self, user_data_dir, slot):
+        if user_data_dir:
+            shutil.rmtree(user_data_dir, ignore_errors=True)
+        if slot is not None:
+            with self._lock:
+                self._free_slots.append(slot)
+
+    def release_driver(self, driver):
+        """Frees what a quit browser was launched with."""
+        with self._lock:
+            owned = self._owned.pop(driver.session_id, None)
+        if owned is not None:
+            self.release(*owned)
+
+launch_dirs = LaunchDirs()
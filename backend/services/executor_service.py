@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+from services.selenium_service import get_driver, pool, POOL_SIZE, DEFAULT_SESSION
+from config.logs_config import scan_id_var
+import asyncio
+import contextvars
+import functools
+import threading
+import weakref
+from config.settings import settings
+
+# Executor sizes. Browser workers may block waiting for a pooled browser, so keep some headroom over the pool size.
+BROWSER_WORKERS = int(settings.get("BROWSER_EXECUTOR_WORKERS", str(POOL_SIZE * 2)))
+IO_WORKERS = int(settings.get("IO_EXECUTOR_WORKERS", "16"))
+
+# Selenium calls run here so they never block the event loop
+browser_executor = ThreadPoolExecutor(max_workers=BROWSER_WORKERS, thread_name_prefix="browser")
+# Other blocking I/O (files, databases) runs here
+io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+
+# One lock per browser session: WebDriver sessions are not safe to drive from two threads at once
+_session_locks = weakref.WeakValueDictionary()
+_session_locks_guard = threading.Lock()
+
+def _session_lock(session_id):
+    with _session_locks_guard:
+        lock = _session_locks.get(session_id)
+        if lock is None:
+            lock = threading.Lock()
+            _session_locks[session_id] = lock
+        return lock
+
+async def run_blocking(func, *args, executor=None, **kwargs):
+    """
+    Runs a blocking call in a worker thread (the I/O executor by default) and
+    awaits its result. The call sees the caller's context variables (e.g. the
+    scan ID logs are tagged with).
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(executor or io_executor, functools.partial(context.run, func, *args, **kwargs))
+
+def _run_with_driver(session_id, func, args, kwargs):
+    if session_id != DEFAULT_SESSION and scan_id_var.get() is None:
+        scan_id_var.set(session_id)  # Scans drive the browser session named after them
+    lock = _session_lock(session_id)
+    with lock:
+        driver = get_driver(session_id)
+        return func(driver, *args, **kwargs)
+
+async def run_in_browser(session_id, func, *args, **kwargs):
+    """
+    Runs `func(driver, *args, **kwargs)` on the browser executor with the
+    browser leased to `session_id`. Calls for the same session are serialized,
+    calls for different sessions run in parallel.
+    """
+    session_id = session_id or DEFAULT_SESSION
+    return await run_blocking(_run_with_driver, session_id, func, args, kwargs, executor=browser_executor)
+
+# Returned by run_in_current_browser when the session is busy and `wait` is False
+SESSION_BUSY = object()
+
+def _run_with_current_driver(session_id, func, args, kwargs, wait):
+    lock = _session_lock(session_id)
+    if not lock.acquire(blocking=wait):
+        return SESSION_BUSY
+    try:
+        driver = pool.get(session_id)
+        return func(driver, *args, **kwargs) if driver is not None else None
+    finally:
+        lock.release()
+
+async def run_in_current_browser(session_id, func, *args, wait=True, **kwargs):
+    """
+    Like run_in_browser, but only on the browser the session already holds:
+    returns None instead of leasing one. With `wait=False` it returns
+    SESSION_BUSY at once if another call is driving the session.
+    """
+    session_id = session_id or DEFAULT_SESSION
+    return await run_blocking(_run_with_current_driver, session_id, func, args, kwargs, wait, executor=browser_executor)
+
+def shutdown_executors():
+    browser_executor.shutdown(wait=False, cancel_futures=True)
+    io_executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,220 @@
+from collections import deque
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, urljoin
+import asyncio
+import hashlib
+import posixpath
+import re
+import time
+from config.settings import settings
+
+FRONTIER_INCLUDE = settings.get("FRONTIER_INCLUDE", "")  # Comma-separated regexes; default: the target's host
+FRONTIER_EXCLUDE = settings.get("FRONTIER_EXCLUDE", r"(?i)logout|signout|log-out|sign-out")
+FRONTIER_HOST_RATE = float(settings.get("FRONTIER_HOST_RATE", "5"))  # Requests per second per host
+FRONTIER_MAX_URLS = int(settings.get("FRONTIER_MAX_URLS", "10000"))  # URLs tracked per scan
+
+# Query and path parameters that only carry a session and never change the page
+SESSION_PARAMS = {"jsessionid", "phpsessid", "aspsessionid", "sid", "sessionid", "session_id", "cfid", "cftoken"}
+TRACKING_PARAM_PREFIXES = ("utm_",)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def _split_patterns(value):
+    return [pattern.strip() for pattern in value.split(",") if pattern.strip()]
+
+def _keep_param(name):
+    name = name.lower()
+    return name not in SESSION_PARAMS and not name.startswith(TRACKING_PARAM_PREFIXES)
+
+def _strip_session(segment):
+    # /app;jsessionid=ABC -> /app
+    name, separator, params = segment.partition(";")
+    if separator and params.split("=")[0].lower() in SESSION_PARAMS:
+        return name
+    return segment
+
+def canonicalize(url, base=None):
+    """
+    Normalizes `url` so that equivalent URLs compare equal: lowercase scheme
+    and host, no default port, no fragment, resolved dot segments, sorted
+    query without session or tracking parameters and no ;jsessionid path
+    parameters. Returns None for non-HTTP URLs.
+    """
+    if base:
+        url = urljoin(base, url)
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return None
+    host = parts.hostname.lower()
+    try:
+        port = parts.port
+    except ValueError:
+        return None
+    netloc = host if port in (None, DEFAULT_PORTS[scheme]) else f"{host}:{port}"
+
+    path = re.sub(r"/{2,}", "/", "/".join(_strip_session(segment) for segment in parts.path.split("/"))) or "/"
+    normalized = posixpath.normpath(path)
+    # normpath drops the trailing slash, which can change the resource
+    if path.endswith("/") and normalized != "/":
+        normalized += "/"
+
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if _keep_param(k)))
+    return urlunsplit((scheme, netloc, normalized, query, ""))
+
+def request_url(url, base=None):
+    """`url` made absolute and without its fragment, otherwise as found: what crawlers request."""
+    if base:
+        url = urljoin(base, url)
+    return url.strip().split("#", 1)[0]
+
+def url_digest(url):
+    """8-byte digest stored in the visited set instead of the full URL."""
+    return hashlib.blake2b(url.encode(), digest_size=8).digest()
+
+class HostRateLimiter:
+    """Spaces requests to the same host at least 1/rate seconds apart."""
+
+    def __init__(self, rate=FRONTIER_HOST_RATE):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = {}
+
+    async def wait(self, host):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next.get(host, now))
+        self._next[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+class CrawlFrontier:
+    """
+    URLs of one scan shared by every crawler: ZAP's spiders, the AI scraper
+    (through /navigate) and the final feed into ZAP.
+
+    URLs are canonicalized and checked against the scope rules before being
+    accepted. `seen` holds the digest of every accepted canonical URL,
+    `visited` the ones some crawler already requested, and `pending` the
+    accepted URLs nobody requested yet, in discovery order. The canonical form
+    is only a dedup key: pending URLs keep the form they were found in, which
+    is what gets requested, so session parameters and parameter order reach
+    the application unchanged. All state is touched from the event loop only.
+    """
+
+    def __init__(self, target, include=None, exclude=None, rate=FRONTIER_HOST_RATE, max_urls=FRONTIER_MAX_URLS):
+        self.target = canonicalize(target) or target
+        host = urlsplit(self.target).hostname or ""
+        include = include if include is not None else _split_patterns(FRONTIER_INCLUDE)
+        exclude = exclude if exclude is not None else _split_patterns(FRONTIER_EXCLUDE)
+        # Default scope: the target host and its subdomains
+        self.include = [re.compile(p) for p in include] or [re.compile(rf"^https?://([^/]*\.)?{re.escape(host)}(:\d+)?(/|$)")]
+        self.exclude = [re.compile(p) for p in exclude]
+        self.max_urls = max_urls
+        self.limiter = HostRateLimiter(rate)
+        self._seen = set()
+        self._visited = set()
+        self._pending = deque()  # (digest, URL as found)
+        self.sources = {}
+        self.browsed = []  # URLs the scan's browser loaded, in order
+        self.duplicates = 0
+        self.out_of_scope = 0
+        self.add(target, "seed")
+
+    def in_scope(self, url):
+        return any(p.search(url) for p in self.include) and not any(p.search(url) for p in self.exclude)
+
+    def add(self, url, source, base=None):
+        """Adds a discovered URL. Returns its canonical form if it is new and in scope, None otherwise."""
+        canonical = canonicalize(url, base)
+        if canonical is None or not self.in_scope(canonical):
+            self.out_of_scope += 1
+            return None
+        digest = url_digest(canonical)
+        if digest in self._seen:
+            self.duplicates += 1
+            return None
+        if len(self._seen) >= self.max_urls:
+            return None
+        self._seen.add(digest)
+        self._pending.append((digest, request_url(url, base)))
+        self.sources[source] = self.sources.get(source, 0) + 1
+        return canonical
+
+    def add_many(self, urls, source, base=None):
+        return sum(1 for url in urls if self.add(url, source, base))
+
+    def mark_visited(self, url, source=None):
+        """Records that a crawler requested `url`. Returns False if it was already visited."""
+        url = canonicalize(url)
+        if url is None:
+            return False
+        if source and self.in_scope(url):
+            self.add(url, source)
+        digest = url_digest(url)
+        if digest in self._visited:
+            return False
+        self._visited.add(digest)
+        return True
+
+    def is_visited(self, url):
+        url = canonicalize(url)
+        return url is not None and url_digest(url) in self._visited
+
+    def take(self, count=10):
+        """Pops up to `count` pending URLs that no crawler visited yet, as they were found."""
+        urls = []
+        while self._pending and len(urls) < count:
+            digest, url = self._pending.popleft()
+            if digest not in self._visited:
+                urls.append(url)
+        return urls
+
+    def pending(self):
+        return sum(1 for digest, _ in self._pending if digest not in self._visited)
+
+    async def throttle(self, url):
+        """Waits for the per-host rate limit before requesting `url`."""
+        await self.limiter.wait(urlsplit(url).hostname or "")
+
+    def stats(self):
+        return {
+            "target": self.target,
+            "seen": len(self._seen),
+            "visited": len(self._visited),
+            "pending": self.pending(),
+            "duplicates": self.duplicates,
+            "out_of_scope": self.out_of_scope,
+            "sources": dict(self.sources),
+        }
+
+class FrontierRegistry:
+    """The crawl frontier of each running scan, by scan ID (the scan's browser session)."""
+
+    def __init__(self):
+        self._frontiers = {}
+
+    def create(self, scan_id, target, **options):
+        frontier = CrawlFrontier(target, **options)
+        self._frontiers[scan_id] = frontier
+        return frontier
+
+    def get(self, scan_id):
+        return self._frontiers.get(scan_id)
+
+    def drop(self, scan_id):
+        return self._frontiers.pop(scan_id, None)
+
+    def observe_navigation(self, session_id, url, result):
+        """Feeds a /navigate result of a scan's browser session into its frontier."""
+        frontier = self._frontiers.get(session_id)
+        if frontier is None:
+            return
+        if frontier.mark_visited(url, "browser"):
+            frontier.browsed.append(url)
+        elements = result.get("elements", {})
+        diff = result.get("diff", {})
+        links = elements.get("links", []) + diff.get("links", {}).get("added", [])
+        forms = elements.get("forms", []) + diff.get("forms", {}).get("added", [])
+        frontier.add_many([link["href"] for link in links if link.get("href")], "browser", url)
+        frontier.add_many([form["action"] for form in forms if form.get("action")], "browser", url)
+
+frontiers = FrontierRegistry()
@@ -0,0 +1,305 @@
+from services.executor_service import run_blocking
+from services.orchestrator_service import orchestrate_scan
+from services.progress_service import broker
+from services.zap_service import zap_registry
+from urllib.parse import urlparse
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from config.settings import settings
+import os
+
+logger = logging.getLogger(__name__)
+
+SCAN_DB_PATH = settings.get("SCAN_DB_PATH", os.path.join(".data", "scans.db"))
+SCAN_MAX_CONCURRENT = int(settings.get("SCAN_MAX_CONCURRENT", "0")) or zap_registry.capacity()  # Scans running at once (default: what the ZAP instances take)
+SCAN_MAX_PER_TARGET = int(settings.get("SCAN_MAX_PER_TARGET", "1"))  # Scans running at once against one host
+
+QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED, INTERRUPTED = "queued", "running", "completed", "failed", "cancelled", "interrupted"
+FINAL_STATUSES = {COMPLETED, FAILED, CANCELLED, INTERRUPTED}
+# Fields of the orchestrator's result that are stored. The Latitude runs are reduced to whether
+# they succeeded: their results hold the agents' conversations, including the submitted credentials.
+RESULT_FIELDS = ("success", "message", "zap_instance", "zap_context", "zap_results", "alerts_found", "frontier")
+AGENT_FIELDS = {"login_result": "logged_in", "ai_scrapper_result": "scraped"}
+
+class ScanJob:
+    """A scan request waiting in the queue or running. Credentials only live here, never on disk."""
+
+    def __init__(self, scan_id, url, username, password, priority, batch_id=None, block_resources=None, block_hosts=None):
+        self.scan_id = scan_id
+        self.url = url
+        self.username = username
+        self.password = password
+        self.priority = priority
+        self.batch_id = batch_id
+        self.block_resources = block_resources
+        self.block_hosts = block_hosts
+        self.target = urlparse(url).netloc.lower()
+        self.task = None
+
+def result_summary(result):
+    """The part of an orchestrator result that is safe to keep on disk."""
+    summary = {name: result[name] for name in RESULT_FIELDS if name in result}
+    for name, flag in AGENT_FIELDS.items():
+        if name in result:
+            summary[flag] = result[name] is not None
+    return summary
+
+class ScanStore:
+    """SQLite persistence of scan jobs and their results. Methods are blocking; call them through run_blocking."""
+
+    def __init__(self, db_path=SCAN_DB_PATH):
+        self.db_path = db_path
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def init(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS scans (
+                    scan_id TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    target TEXT NOT NULL,
+                    username TEXT,
+                    priority INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    result TEXT,
+                    error TEXT
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(scans)")}
+            if "batch_id" not in columns:
+                # Databases created before batches existed
+                conn.execute("ALTER TABLE scans ADD COLUMN batch_id TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS scans_status ON scans (status, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS scans_batch ON scans (batch_id)")
+            # Results stored in full by earlier versions, agent conversations included
+            for scan_id, result in conn.execute("SELECT scan_id, result FROM scans WHERE result LIKE '%\"login_result\"%'").fetchall():
+                conn.execute("UPDATE scans SET result = ? WHERE scan_id = ?", (json.dumps(result_summary(json.loads(result)), default=str), scan_id))
+            # Jobs left over by a previous process cannot resume: their credentials were never stored
+            conn.execute(
+                "UPDATE scans SET status = ?, finished_at = ? WHERE status IN (?, ?)",
+                (INTERRUPTED, time.time(), QUEUED, RUNNING)
+            )
+
+    def insert(self, job):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO scans (scan_id, url, target, username, priority, status, created_at, batch_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.scan_id, job.url, job.target, job.username, job.priority, QUEUED, time.time(), job.batch_id)
+            )
+
+    def update(self, scan_id, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE scans SET {columns} WHERE scan_id = ?", (*fields.values(), scan_id))
+
+    def get(self, scan_id):
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM scans WHERE scan_id = ?", (scan_id,)).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def list(self, status=None, limit=50, offset=0, batch_id=None):
+        query = "SELECT * FROM scans"
+        where = []
+        params = []
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        if batch_id:
+            where.append("batch_id = ?")
+            params.append(batch_id)
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(query, params).fetchall()
+        return [_row_to_dict(row) for row in rows]
+
+def _row_to_dict(row):
+    data = dict(row)
+    if data.get("result"):
+        data["result"] = json.loads(data["result"])
+    return data
+
+class ScanJobManager:
+    """
+    Queues scan requests and runs them with a global and a per-target concurrency limit.
+
+    Jobs wait in a priority queue (higher priority first, then submission
+    order). A queued job whose target already has `max_per_target` running
+    scans is skipped until one of them finishes, without blocking jobs for
+    other targets. All state is touched from the event loop only.
+    """
+
+    def __init__(self, runner, store=None, max_concurrent=SCAN_MAX_CONCURRENT, max_per_target=SCAN_MAX_PER_TARGET):
+        self.runner = runner
+        self.store = store or ScanStore()
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_per_target = max(1, max_per_target)
+        self._queue = []
+        self._queued = {}
+        self._running = {}
+        self._counter = itertools.count()
+        self._stopping = False
+
+    async def start(self):
+        await run_blocking(self.store.init)
+
+    async def stop(self):
+        """Cancels the running scans and drops the queued ones, all recorded as interrupted, and starts no more."""
+        self._stopping = True
+        tasks = [job.task for job in self._running.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for job in list(self._queued.values()):
+            self._queued.pop(job.scan_id)
+            await self._finish(job, INTERRUPTED)
+
+    async def submit(self, url, username, password, priority=0, batch_id=None, block_resources=None, block_hosts=None):
+        job = ScanJob(uuid.uuid4().hex, url, username, password, priority, batch_id, block_resources, block_hosts)
+        await run_blocking(self.store.insert, job)
+        heapq.heappush(self._queue, (-priority, next(self._counter), job.scan_id))
+        self._queued[job.scan_id] = job
+        broker.publish(job.scan_id, "phase", phase="queued", url=url)
+        self._dispatch()
+        return job.scan_id
+
+    async def cancel(self, scan_id):
+        """Cancels a queued or running scan. Returns False if it is not active."""
+        job = self._queued.pop(scan_id, None)
+        if job is not None:
+            # Lazily dropped from the heap by _dispatch
+            await self._finish(job, CANCELLED)
+            return True
+        job = self._running.get(scan_id)
+        if job is not None:
+            job.task.cancel()
+            return True
+        return False
+
+    async def get(self, scan_id):
+        data = await run_blocking(self.store.get, scan_id)
+        if data and data["status"] == QUEUED:
+            data["queue_position"] = self.queue_position(scan_id)
+        return data
+
+    async def list(self, status=None, limit=50, offset=0, batch_id=None):
+        return await run_blocking(self.store.list, status, limit, offset, batch_id)
+
+    async def submit_batch(self, targets, priority=0):
+        """
+        Queues one scan per (url, username, password, block_resources, block_hosts)
+        target under a new batch ID. Returns the batch ID and scan IDs.
+        """
+        batch_id = uuid.uuid4().hex
+        scan_ids = [
+            await self.submit(url, username, password, priority, batch_id, block_resources, block_hosts)
+            for url, username, password, block_resources, block_hosts in targets
+        ]
+        return batch_id, scan_ids
+
+    async def batch(self, batch_id):
+        """Status and result of every scan of a batch, with counts per status. None if the batch does not exist."""
+        scans = await run_blocking(self.store.list, None, -1, 0, batch_id)
+        if not scans:
+            return None
+        counts = {}
+        for scan in scans:
+            counts[scan["status"]] = counts.get(scan["status"], 0) + 1
+            if scan["status"] == QUEUED:
+                scan["queue_position"] = self.queue_position(scan["scan_id"])
+        return {
+            "batch_id": batch_id,
+            "total": len(scans),
+            "finished": sum(counts.get(status, 0) for status in FINAL_STATUSES),
+            "by_status": counts,
+            "scans": sorted(scans, key=lambda scan: scan["created_at"]),
+        }
+
+    def queue_position(self, scan_id):
+        order = [entry[2] for entry in sorted(self._queue) if entry[2] in self._queued]
+        return order.index(scan_id) + 1 if scan_id in order else None
+
+    def stats(self):
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_per_target": self.max_per_target,
+            "queued": len(self._queued),
+            "running": len(self._running),
+        }
+
+    def _running_for(self, target):
+        return sum(1 for job in self._running.values() if job.target == target)
+
+    def _dispatch(self):
+        """Starts queued jobs while there are free slots."""
+        if self._stopping or len(self._running) >= self.max_concurrent:
+            return
+        skipped = []
+        while self._queue and len(self._running) < self.max_concurrent:
+            entry = heapq.heappop(self._queue)
+            job = self._queued.get(entry[2])
+            if job is None:
+                continue  # Cancelled while queued
+            if self._running_for(job.target) >= self.max_per_target:
+                skipped.append(entry)
+                continue
+            del self._queued[job.scan_id]
+            self._running[job.scan_id] = job
+            job.task = asyncio.create_task(self._run(job))
+        for entry in skipped:
+            heapq.heappush(self._queue, entry)
+
+    async def _run(self, job):
+        status, result, error = FAILED, None, None
+        try:
+            await run_blocking(self.store.update, job.scan_id, status=RUNNING, started_at=time.time())
+            result = await self.runner(
+                job.url, job.username, job.password, job.scan_id,
+                block_resources=job.block_resources, block_hosts=job.block_hosts
+            )
+            status = COMPLETED if result.get("success") else FAILED
+            error = result.get("message")
+        except asyncio.CancelledError:
+            # Cancelled by the user, or by the server shutting down
+            status = INTERRUPTED if self._stopping else CANCELLED
+        except Exception as e:
+            logger.exception(f"[jobs] Scan {job.scan_id} crashed")
+            error = str(e)
+        finally:
+            self._running.pop(job.scan_id, None)
+            job.password = None
+            await self._finish(job, status, result, error)
+            self._dispatch()
+
+    async def _finish(self, job, status, result=None, error=None):
+        await run_blocking(
+            self.store.update, job.scan_id,
+            status=status, finished_at=time.time(),
+            result=json.dumps(result_summary(result), default=str) if result is not None else None,
+            error=error
+        )
+        if status == CANCELLED:
+            broker.publish(job.scan_id, "cancelled", url=job.url)
+        elif status == FAILED and result is None:
+            # The scan crashed before reporting its own failure
+            broker.publish(job.scan_id, "failed", url=job.url, message=error)
+
+job_manager = ScanJobManager(orchestrate_scan)
@@ -1,42 +1,275 @@
-from latitude_sdk import Latitude, LatitudeOptions, RunPromptOptions
-from dotenv import load_dotenv
-import os
+from services.frontier_service import frontiers
+from services.executor_service import run_blocking
+from collections import OrderedDict
+import asyncio
+import httpx
+import logging
+import random
+import threading
+import time
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
 
 last_message_count = 0
 
-# Load environment variables
-load_dotenv()
+LATITUDE_MAX_CONCURRENT = int(settings.get("LATITUDE_MAX_CONCURRENT", "4"))  # Prompt runs at once; the rest wait
+LATITUDE_TIMEOUT = float(settings.get("LATITUDE_TIMEOUT", "900"))  # Seconds before a run is cancelled (agents drive the browser meanwhile)
+LATITUDE_RETRIES = int(settings.get("LATITUDE_RETRIES", "2"))  # Retries of runs Latitude refused (429/503) or never received
+LATITUDE_BACKOFF = float(settings.get("LATITUDE_BACKOFF", "2"))  # Base seconds of the exponential backoff
+LATITUDE_SCRAPE_CACHE_TTL = float(settings.get("LATITUDE_SCRAPE_CACHE_TTL", "3600"))  # Seconds a ScrapingAgent result is reused; 0 disables
+LATITUDE_COST_PER_1K_TOKENS = float(settings.get("LATITUDE_COST_PER_1K_TOKENS", "0"))  # Price used to estimate the cost of the runs
+
+PROMPT_VERSION = 'b02c79f6-502a-4297-8318-3105c8757793'
+
+# Errors worth retrying: only those where the run never started. Agents drive the
+# browser (the LoginAgent submits the login form), so a run that may have started
+# is not run again. The SDK reports a broken stream, and any other failure without
+# a response, as a 500: those are not retried.
+RETRY_STATUS = {429, 503}
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)  # Causes of the SDK's error when the request never left
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 900)  # Seconds
+TOKEN_BUCKETS = (1000, 5000, 10000, 25000, 50000, 100000, 250000)
+
+_sdk = None
+_sdk_lock = threading.Lock()
+
+def get_sdk():
+    """
+    The Latitude client, built on first use: importing the SDK and building
+    the client take seconds, and it needs LATITUDE_API_KEY and
+    LATITUDE_PROJECT_ID, which nothing else does. Raises MissingSettingError
+    if they are not set. Blocking.
+    """
+    global _sdk
+    with _sdk_lock:
+        if _sdk is None:
+            _sdk = create_sdk(settings.require("LATITUDE_API_KEY"), int(settings.require("LATITUDE_PROJECT_ID")))
+        return _sdk
+
+def create_sdk(api_key, project_id, gateway=None):
+    """
+    A Latitude client making a single attempt per request: LatitudeRunner
+    decides what is retried, and the SDK's own retries (on 500 too) would
+    multiply its attempts. `gateway` overrides the API host, as a
+    latitude_sdk.GatewayOptions. Blocking.
+    """
+    from latitude_sdk import Latitude, LatitudeOptions, InternalOptions
+    internal = InternalOptions(retries=1, gateway=gateway) if gateway else InternalOptions(retries=1)
+    return Latitude(api_key, LatitudeOptions(project_id=project_id, internal=internal))
+
+class Histogram:
+    """Counts of observed values per bucket (upper bound inclusive), plus their count and sum."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last one: above every bound
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = next((i for i, bound in enumerate(self.bounds) if value <= bound), len(self.bounds))
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def stats(self):
+        buckets = {str(bound): count for bound, count in zip(self.bounds, self.counts)}
+        buckets["+Inf"] = self.counts[-1]
+        return {"count": self.count, "sum": round(self.sum, 3), "buckets": buckets}
+
+class PromptMetrics:
+    """Latency, token and outcome metrics of one prompt."""
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.tokens = Histogram(TOKEN_BUCKETS)
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.cache_hits = 0
+
+    def stats(self):
+        stats = {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "retries": self.retries,
+            "cache_hits": self.cache_hits,
+            "latency_seconds": self.latency.stats(),
+            "tokens": self.tokens.stats(),
+        }
+        if LATITUDE_COST_PER_1K_TOKENS:
+            stats["estimated_cost"] = round(self.tokens.sum / 1000 * LATITUDE_COST_PER_1K_TOKENS, 4)
+        return stats
+
+class ScrapeCache:
+    """
+    ScrapingAgent results by (prompt version, URL, username), with a TTL: the
+    agent scrapes the pages the user logged in as can see. Each entry
+    keeps the URLs the agent's browser loaded, so a scan answered from the
+    cache still hands them to its crawl frontier (and through it to ZAP).
+    """
 
-sdk = Latitude(os.getenv("LATITUDE_API_KEY"), LatitudeOptions(project_id=int(os.getenv("LATITUDE_PROJECT_ID"))))
+    def __init__(self, ttl=LATITUDE_SCRAPE_CACHE_TTL, max_entries=100):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry["created_at"] > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, result, urls):
+        if self.ttl <= 0:
+            return
+        self._entries[key] = {"result": result, "urls": urls, "created_at": time.monotonic()}
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+class LatitudeRunner:
+    """
+    Runs Latitude prompts with a concurrency limit, a timeout that cancels
+    the run, and retries with exponential backoff and jitter for transient
+    errors. Records per-prompt metrics. Like the plain SDK call with an
+    `on_error` callback, a run that finally fails logs the error and returns
+    None. The client is built by `client_factory` on the first run (or on
+    `warm`); a missing setting raises instead of failing the run. All state
+    is touched from the event loop only.
+    """
+
+    def __init__(self, client_factory, max_concurrent=LATITUDE_MAX_CONCURRENT, timeout=LATITUDE_TIMEOUT,
+                 retries=LATITUDE_RETRIES, backoff=LATITUDE_BACKOFF):
+        self._client_factory = client_factory
+        self._client = None
+        self.max_concurrent = max(1, max_concurrent)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.metrics = {}
+        self.waiting = 0
+        self.running = 0
+
+    async def client(self):
+        if self._client is None:
+            self._client = await run_blocking(self._client_factory)
+        return self._client
+
+    async def warm(self):
+        """Builds the client ahead of the first run. Logs instead of raising: scans report the error when they need it."""
+        try:
+            await self.client()
+        except Exception as e:
+            logger.warning(f"[latitude] Client not ready: {e}")
+
+    def prompt_metrics(self, prompt):
+        return self.metrics.setdefault(prompt, PromptMetrics())
+
+    def _retryable(self, error):
+        from latitude_sdk import ApiError
+        if not isinstance(error, ApiError):
+            return False
+        return error.status in RETRY_STATUS or isinstance(error.__cause__, NOT_SENT_ERRORS)
+
+    async def run(self, prompt, parameters, version_uuid=PROMPT_VERSION):
+        client = await self.client()
+        metrics = self.prompt_metrics(prompt)
+        metrics.calls += 1
+        self.waiting += 1
+        async with self._semaphore:
+            self.waiting -= 1
+            self.running += 1
+            try:
+                return await self._run_with_retries(client, prompt, parameters, version_uuid, metrics)
+            finally:
+                self.running -= 1
+
+    async def _run_with_retries(self, client, prompt, parameters, version_uuid, metrics):
+        from latitude_sdk import RunPromptOptions
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(client.prompts.run(prompt, RunPromptOptions(
+                    version_uuid=version_uuid,
+                    parameters=parameters,
+                    # Enable streaming
+                    stream=True,
+                    on_finished=lambda result: logger.info(f"[latitude] {prompt} run completed: {result.uuid}"),
+                )), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                metrics.timeouts += 1
+                metrics.errors += 1
+                logger.error(f"[latitude] {prompt} run cancelled after {self.timeout}s")
+                return None
+            except Exception as e:
+                if attempt < self.retries and self._retryable(e):
+                    metrics.retries += 1
+                    delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                    logger.warning(f"[latitude] {prompt} run failed ({e}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    continue
+                metrics.errors += 1
+                logger.error(f"[latitude] {prompt} run error: {e}")
+                return None
+
+            metrics.latency.observe(time.perf_counter() - started)
+            usage = getattr(getattr(result, "response", None), "usage", None)
+            if usage is not None:
+                metrics.tokens.observe(usage.total_tokens)
+            return result
+
+    def stats(self):
+        return {
+            "client_ready": self._client is not None,
+            "max_concurrent": self.max_concurrent,
+            "running": self.running,
+            "waiting": self.waiting,
+            "timeout": self.timeout,
+            "retries": self.retries,
+            "prompts": {prompt: metrics.stats() for prompt, metrics in self.metrics.items()},
+        }
+
+runner = LatitudeRunner(get_sdk)
+scrape_cache = ScrapeCache()
 
 # Function Log In
-async def start_latitude_login(url, username, password): 
-    result = await sdk.prompts.run('LoginAgent', RunPromptOptions(
-        version_uuid='b02c79f6-502a-4297-8318-3105c8757793',
-        parameters={
-            'url': url,
-            'username': username,
-            'password': password
-        },
-        # Enable streaming
-        stream=True,
-        # Provide callbacks for events
-        on_finished=lambda result: print('Run completed:', result.uuid),
-        on_error=lambda error: print('Run error:', error.message)
-    ))
-    return result
+# `session_id` tells the agent which pooled browser to drive through the MCP tools
+async def start_latitude_login(url, username, password, session_id):
+    return await runner.run('LoginAgent', {
+        'url': url,
+        'username': username,
+        'password': password,
+        'session_id': session_id
+    })
 
 # Function Scrapper
-async def start_latitude_scraping(url): 
-    result = await sdk.prompts.run('ScrapingAgent', RunPromptOptions(
-        version_uuid='b02c79f6-502a-4297-8318-3105c8757793',
-        parameters={
-            'url': url
-        },
-        # Enable streaming
-        stream=True,
-        # Provide callbacks for events
-        on_finished=lambda result: print('Run completed:', result.uuid),
-        on_error=lambda error: print('Run error:', error.message)
-    ))
+# Results are reused per URL, user and prompt version for LATITUDE_SCRAPE_CACHE_TTL seconds;
+# the URLs the agent loaded then go straight into the scan's crawl frontier
+async def start_latitude_scraping(url, username, session_id):
+    key = (PROMPT_VERSION, url, username)
+    frontier = frontiers.get(session_id)
+    cached = scrape_cache.get(key)
+    if cached is not None:
+        runner.prompt_metrics('ScrapingAgent').cache_hits += 1
+        if frontier is not None:
+            frontier.add_many(cached["urls"], "scraper_cache")
+        return cached["result"]
+
+    result = await runner.run('ScrapingAgent', {
+        'url': url,
+        'session_id': session_id
+    })
+    if result is not None:
+        scrape_cache.put(key, result, list(frontier.browsed) if frontier is not None else [])
     return result
@@ -0,0 +1,150 @@
+from services.executor_service import run_blocking
+import asyncio
+import json
+import os
+
+# Bytes returned by /logs when no offset is given: the end of the file, not all of it
+LOG_TAIL_BYTES = 64 * 1024
+# Bytes read per call at most
+LOG_READ_MAX_BYTES = 1024 * 1024
+
+def _parse(line):
+    try:
+        record = json.loads(line)
+        if isinstance(record, dict):
+            return record
+    except ValueError:
+        pass
+    # Lines written before logs were JSON
+    return {"message": line}
+
+def read_log(path, since=None, scan_id=None, max_bytes=LOG_READ_MAX_BYTES, file_id=None):
+    """
+    Reads the complete lines written to `path` from byte offset `since`
+    (default: the last LOG_TAIL_BYTES), at most `max_bytes`, seeking instead
+    of reading what came before. Returns the parsed records (only those of
+    `scan_id` if given), and `next_offset` and `file_id` for the next call.
+    A `file_id` other than the current file's, or an offset past its end,
+    means the log was rotated since: reading restarts at 0 and `rotated` is
+    set. Blocking; call it through run_blocking.
+    """
+    with open(path, "rb") as file:
+        stat = os.fstat(file.fileno())
+        size = stat.st_size
+        rotated = False
+        tail = since is None
+        if tail:
+            since = max(0, size - LOG_TAIL_BYTES)
+        elif since > size or (file_id is not None and file_id != stat.st_ino):
+            # The new file may already be longer than the old offset: only its inode tells
+            since, rotated = 0, True
+        file.seek(since)
+        chunk = file.read(max_bytes)
+
+    start = 0
+    if tail and since > 0:
+        # Started in the middle of a line
+        start = chunk.find(b"\n") + 1
+    end = chunk.rfind(b"\n") + 1
+    if end <= start:
+        # A line longer than max_bytes is returned cut rather than never
+        end = len(chunk) if len(chunk) == max_bytes else start
+    records = [_parse(line) for line in chunk[start:end].decode("utf-8", errors="replace").splitlines() if line]
+    if scan_id is not None:
+        records = [record for record in records if record.get("scan_id") == scan_id]
+    return {
+        "offset": since + start,
+        "next_offset": since + end,
+        "size": size,
+        "file_id": stat.st_ino,
+        "rotated": rotated,
+        "records": records,
+    }
+
+def _inode(path):
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+class LogTail:
+    """
+    Reads the lines appended to a log file, like `tail -F`. Keeps the file
+    open: when the path is rotated (new inode) the old file is read to its
+    end before switching to the new one, so no record is lost. Blocking;
+    call `read` through run_blocking.
+    """
+
+    def __init__(self, path, since=None):
+        self.path = path
+        self.since = since
+        self.file = None
+        self._buffer = b""
+        self._skip_partial = False
+
+    def _open(self, offset):
+        self.file = open(self.path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if offset is None:
+            offset = max(0, size - LOG_TAIL_BYTES)
+            self._skip_partial = offset > 0
+        elif offset > size:
+            offset = 0
+        self.file.seek(offset)
+
+    def read(self):
+        """Returns the complete new lines and whether more bytes are already waiting."""
+        if self.file is None:
+            if _inode(self.path) is None:
+                return [], False
+            self._open(self.since)
+        data = self.file.read(LOG_READ_MAX_BYTES)
+        if not data:
+            inode = _inode(self.path)
+            if inode is not None and inode != os.fstat(self.file.fileno()).st_ino:
+                # Rotated, and the old file is fully read
+                self.file.close()
+                self._open(0)
+                data = self.file.read(LOG_READ_MAX_BYTES)
+            elif inode is not None and os.path.getsize(self.path) < self.file.tell():
+                # Truncated in place
+                self.file.seek(0)
+        lines = (self._buffer + data).split(b"\n")
+        self._buffer = lines.pop()
+        if self._skip_partial and lines:
+            self._skip_partial = False
+            lines = lines[1:]
+        return [line.decode("utf-8", errors="replace") for line in lines if line], len(data) == LOG_READ_MAX_BYTES
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+async def follow_log(path, since=None, scan_id=None, interval=0.5, keepalive=15.0):
+    """
+    Newline-delimited JSON stream of the records written to `path` from
+    `since` on (default: the end of the file). Each poll reads only the new
+    bytes and the stream follows the file across rotations.
+    """
+    tail = LogTail(path, since)
+    idle = 0.0
+    try:
+        while True:
+            lines, more = await run_blocking(tail.read)
+            records = [_parse(line) for line in lines]
+            if scan_id is not None:
+                records = [record for record in records if record.get("scan_id") == scan_id]
+            for record in records:
+                yield json.dumps(record, ensure_ascii=False) + "\n"
+            if records:
+                idle = 0.0
+            if more:
+                continue
+            await asyncio.sleep(interval)
+            idle += interval
+            if idle >= keepalive:
+                # Blank line: keeps proxies from closing an idle stream
+                idle = 0.0
+                yield "\n"
+    finally:
+        await run_blocking(tail.close)
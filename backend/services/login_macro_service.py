@@ -0,0 +1,207 @@
+from services.executor_service import run_blocking, run_in_browser
+from services.auth_session_service import target_of
+from services import browser_actions
+import json
+import logging
+import sqlite3
+import time
+from config.settings import settings
+import os
+
+logger = logging.getLogger(__name__)
+
+LOGIN_MACRO_REPLAY = settings.get("LOGIN_MACRO_REPLAY", "1") == "1"  # 0: the LoginAgent logs in on every scan
+LOGIN_MACRO_DB_PATH = settings.get("LOGIN_MACRO_DB_PATH", os.path.join(".data", "login_macros.db"))
+LOGIN_MACRO_MAX_STEPS = int(settings.get("LOGIN_MACRO_MAX_STEPS", "20"))  # Longer logins are not recorded
+
+# Stored in place of the credentials typed during the recording
+USERNAME_PLACEHOLDER = "{username}"
+PASSWORD_PLACEHOLDER = "{password}"
+
+# Recorded actions; "extract" only reads the page
+RECORDED_ACTIONS = ("navigate", "input", "click", "wait")
+
+def fill_placeholders(steps, username, password):
+    """Copy of a macro's steps with the credentials typed back in."""
+    values = {USERNAME_PLACEHOLDER: username, PASSWORD_PLACEHOLDER: password}
+    return [
+        {**step, "content": values.get(step["content"], step["content"])} if step["action"] == "input" else dict(step)
+        for step in steps
+    ]
+
+class LoginMacroStore:
+    """
+    SQLite store of recorded login macros by target origin: the batch steps
+    (see browser_actions.run_batch) that logged in, with placeholders instead
+    of credentials. Methods are blocking; call them through run_blocking.
+    """
+
+    def __init__(self, db_path=LOGIN_MACRO_DB_PATH):
+        self.db_path = db_path
+        self._initialized = False
+
+    def _connect(self):
+        if not self._initialized:
+            self._init()
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS login_macros (
+                    target TEXT PRIMARY KEY,
+                    steps TEXT NOT NULL,
+                    recorded_at REAL NOT NULL,
+                    replays INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+        self._initialized = True
+
+    def get(self, target):
+        with self._connect() as conn:
+            row = conn.execute("SELECT steps FROM login_macros WHERE target = ?", (target,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, target, steps):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO login_macros (target, steps, recorded_at, replays) VALUES (?, ?, ?, 0)",
+                (target, json.dumps(steps), time.time())
+            )
+
+    def mark_replayed(self, target):
+        with self._connect() as conn:
+            conn.execute("UPDATE login_macros SET replays = replays + 1 WHERE target = ?", (target,))
+
+    def delete(self, target):
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM login_macros WHERE target = ?", (target,)).rowcount
+
+    def list(self):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT target, steps, recorded_at, replays FROM login_macros ORDER BY recorded_at DESC"
+            ).fetchall()
+        return [
+            {"target": target, "steps": json.loads(steps), "recorded_at": recorded_at, "replays": replays}
+            for target, steps, recorded_at, replays in rows
+        ]
+
+class LoginMacroManager:
+    """
+    Records the browser actions the LoginAgent used to log in and replays
+    them on later scans of the same target instead of calling the agent.
+
+    While a scan's agent logs in (`start`), every successful navigate,
+    input, click and wait of its browser session is recorded; the first
+    successful login click ends the recording and stores the macro, with the
+    username and password replaced by placeholders. `replay` runs the macro
+    as one batch and checks the login; a macro that fails is deleted so the
+    agent records a new one. All state is touched from the event loop only.
+    """
+
+    def __init__(self, store=None, enabled=LOGIN_MACRO_REPLAY, max_steps=LOGIN_MACRO_MAX_STEPS):
+        self.store = store or LoginMacroStore()
+        self.enabled = enabled
+        self.max_steps = max_steps
+        self._recordings = {}  # Scan ID -> recording in progress; credentials only live here
+        # Metrics
+        self.recorded = 0
+        self.replayed = 0
+        self.failed = 0
+
+    def start(self, scan_id, url, username, password):
+        """Starts recording the login of `scan_id`'s browser."""
+        if self.enabled:
+            self._recordings[scan_id] = {
+                "url": url, "username": username, "password": password, "steps": []
+            }
+
+    def stop(self, scan_id):
+        self._recordings.pop(scan_id, None)
+
+    def record(self, session_id, step):
+        """Records a browser action that succeeded in `session_id`'s browser, if its login is being recorded."""
+        recording = self._recordings.get(session_id)
+        if recording is None or step["action"] not in RECORDED_ACTIONS:
+            return
+        if len(recording["steps"]) >= self.max_steps:
+            logger.info(f"[macro] Login of scan {session_id} is longer than {self.max_steps} steps, not recording it")
+            self.stop(session_id)
+            return
+        step = {key: value for key, value in step.items() if value is not None}
+        if step["action"] == "navigate":
+            step["incremental"] = False
+        elif step["action"] == "input":
+            if step["content"] == recording["password"]:
+                step["content"] = PASSWORD_PLACEHOLDER
+            elif step["content"] == recording["username"]:
+                step["content"] = USERNAME_PLACEHOLDER
+        recording["steps"].append(step)
+
+    async def on_login(self, session_id):
+        """Called after a login click succeeded in `session_id`'s browser. Stores the recorded macro."""
+        recording = self._recordings.pop(session_id, None)
+        if recording is None:
+            return False
+        steps = recording["steps"]
+        if not steps or steps[0]["action"] != "navigate":
+            # The agent started on the page the scan opened
+            steps.insert(0, {"action": "navigate", "url": recording["url"], "incremental": False})
+        try:
+            await run_blocking(self.store.save, target_of(recording["url"]), steps)
+        except Exception as e:
+            logger.warning(f"[macro] Could not store login macro of scan {session_id}: {e}")
+            return False
+        self.recorded += 1
+        return True
+
+    async def replay(self, scan_id, url, username, password):
+        """
+        Logs the scan's browser in with the macro recorded for `url`. Returns
+        a login result if it worked, None if the agent has to log in.
+        """
+        if not self.enabled:
+            return None
+        target = target_of(url)
+        steps = await run_blocking(self.store.get, target)
+        if steps is None:
+            return None
+
+        started = time.perf_counter()
+        error = None
+        try:
+            results = await run_in_browser(
+                scan_id, browser_actions.run_batch, fill_placeholders(steps, username, password), scan_id, True
+            )
+            failed = next((result for result in results if not result["success"]), None)
+            if failed is not None:
+                error = f"step {failed['index']} ({failed['action']}): {failed['error']}"
+            elif not await run_in_browser(scan_id, browser_actions.is_logged_in):
+                error = "the page still shows a login form"
+        except Exception as e:
+            error = str(e)
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+
+        if error is not None:
+            self.failed += 1
+            logger.info(f"[macro] Login macro of {target} failed, falling back to the LoginAgent: {error}")
+            await run_blocking(self.store.delete, target)
+            return None
+        self.replayed += 1
+        await run_blocking(self.store.mark_replayed, target)
+        return {"macro_replayed": True, "steps": len(steps), "elapsed_ms": elapsed_ms}
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "recording": len(self._recordings),
+            "recorded": self.recorded,
+            "replayed": self.replayed,
+            "failed": self.failed,
+        }
+
+login_macros = LoginMacroManager()
@@ -1,39 +1,108 @@
 
 import asyncio
-from services.selenium_service import selenium_startup, selenium_shutdown
+from services.selenium_service import get_driver, release_driver
+from services.executor_service import run_blocking, browser_executor
 from services.latitude_service import start_latitude_login, start_latitude_scraping
-from services.zap_service import run_zap_spider, run_zap_scan
+from services.zap_service import run_zap_spider, run_zap_scan, feed_frontier_to_zap, zap_registry
+from services.frontier_service import frontiers
+from services.zap_context_service import scan_contexts
+from services.progress_service import broker
+from services.alert_service import alert_collector
+from services.pipeline_service import ScanPipeline, SCAN_PIPELINE
+from services.auth_session_service import auth_sessions
+from services.login_macro_service import login_macros
+from services.request_filter import request_filters
+from config.logs_config import scan_id_var
 
 # Funciton to orchestrate the scan
 # This function will call the login function, then run the spider and AI scrapper concurrently, and finally run the ZAP scan.
-async def orchestrate_scan(url: str, username: str, password: str):
+# With SCAN_PIPELINE (default) the active scan starts with the crawl and follows the URLs as they are discovered.
+# The scan runs on the least loaded ZAP instance and leases its own browser, proxied through that instance,
+# from the pool under `scan_id`, so the agents drive that browser only.
+# A login stored by a previous scan of the same target and username is reused when still valid; otherwise the
+# login macro recorded for the target is replayed, and only if that fails the LoginAgent logs in. The agent's
+# actions are recorded as the target's new macro and the session it gets is stored for the next scans.
+# Its ZAP traffic is kept in a context and HTTP session of its own, removed from ZAP when the scan ends.
+# Spiders and the AI scrapper share the scan's crawl frontier; URLs none of them visited are sent to ZAP before the active scan.
+# The scan's browser blocks the resource types and third-party hosts of its blocklists, so they never reach ZAP.
+async def orchestrate_scan(url: str, username: str, password: str, scan_id: str, block_resources=None, block_hosts=None):
+    scan_id_var.set(scan_id)  # Tags this scan's log records, including those of the tasks it starts
+    frontier = frontiers.create(scan_id, url)
+    pipeline = None
     try:
-        selenium_startup()  # Ensure the Selenium WebDriver is started
+        request_filters.configure(scan_id, url, block_resources, block_hosts)  # Applied when the browser is leased
+        instance = await zap_registry.assign(scan_id)
+        context = await scan_contexts.open(scan_id, url, instance)
+        await run_blocking(get_driver, scan_id, context.proxy_url, executor=browser_executor)  # Lease a browser for this scan
 
         # First call: Login
-        login_result = await start_latitude_login(url, username, password)
+        broker.publish(scan_id, "phase", phase="login", url=url, zap_instance=instance.name)
+        login_result = await auth_sessions.restore(scan_id, url, username, context)
+        if login_result is None:
+            auth_sessions.expect_login(scan_id, url, username, context)
+            login_result = await login_macros.replay(scan_id, url, username, password)
+            if login_result is not None:
+                await auth_sessions.on_login(scan_id)
+        if login_result is None:
+            login_macros.start(scan_id, url, username, password)
+            login_result = await start_latitude_login(url, username, password, scan_id)
+            login_macros.stop(scan_id)  # Nothing recorded if the agent never clicked a login button
+
+        # Collect alerts incrementally while the crawlers and the active scan run
+        alert_collector.start(scan_id, url, instance.client)
 
         # Launch the spider and AI scrapper concurrently
-        zap_task = asyncio.create_task(run_zap_spider(url))
-        ai_scrapper_task = asyncio.create_task(start_latitude_scraping(url))
+        broker.publish(scan_id, "phase", phase="crawl", url=url)
+        if SCAN_PIPELINE:
+            # Active-scan URLs as the crawlers find them instead of waiting for both
+            pipeline = ScanPipeline(scan_id, url, instance.client, context, frontier)
+            pipeline.start()
+            broker.publish(scan_id, "phase", phase="active_scan", url=url)
+        zap_task = asyncio.create_task(run_zap_spider(url, scan_id))
+        ai_scrapper_task = asyncio.create_task(start_latitude_scraping(url, username, scan_id))
 
         # Wait for both tasks to complete
         zap_spider_result, ai_scrapper_result = await asyncio.gather(zap_task, ai_scrapper_task)
 
-        selenium_shutdown()  # Ensure the Selenium WebDriver is shut down
+        await run_blocking(release_driver, scan_id, executor=browser_executor)  # Give the browser back to the pool
+        await feed_frontier_to_zap(scan_id)
 
         #Run active scan
-        zap_results = await asyncio.create_task(run_zap_scan(url))
+        if pipeline is not None:
+            zap_results = await pipeline.finish()
+        else:
+            broker.publish(scan_id, "phase", phase="active_scan", url=url)
+            zap_results = await asyncio.create_task(run_zap_scan(url, scan_id))
+        await alert_collector.stop(scan_id)
+
+        broker.publish(scan_id, "finished", url=url)
 
         # Return the results
         return {
             "success": True,
+            "scan_id": scan_id,
+            "zap_instance": instance.name,
+            "zap_context": context.stats(),
             "login_result": login_result,
             "ai_scrapper_result": ai_scrapper_result,
             "zap_spider_result": zap_spider_result,
-            "zap_results": zap_results
+            "zap_results": zap_results,
+            "alerts_found": len(alert_collector.get(scan_id)),
+            "frontier": frontier.stats()
 
         }
 
     except Exception as e:
-        return {"success": False, "message": str(e)}
+        broker.publish(scan_id, "failed", url=url, message=str(e))
+        return {"success": False, "scan_id": scan_id, "message": str(e)}
+    finally:
+        if pipeline is not None:
+            await pipeline.cancel()  # No-op once finished; stops ZAP's active scans otherwise
+        await run_blocking(release_driver, scan_id, executor=browser_executor)
+        await alert_collector.stop(scan_id)
+        frontiers.drop(scan_id)
+        request_filters.drop(scan_id)
+        await auth_sessions.release(scan_id)
+        login_macros.stop(scan_id)
+        await scan_contexts.close(scan_id)
+        zap_registry.release(scan_id)
@@ -0,0 +1,137 @@
+from services.frontier_service import canonicalize
+from services.progress_service import broker, poll_progress
+import asyncio
+import logging
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+SCAN_PIPELINE = settings.get("SCAN_PIPELINE", "1") == "1"  # 0: crawl first, then one active scan of the whole target
+SCAN_PIPELINE_WORKERS = int(settings.get("SCAN_PIPELINE_WORKERS", "2"))  # Active scans running at once per scan
+SCAN_PIPELINE_QUEUE = int(settings.get("SCAN_PIPELINE_QUEUE", "100"))  # Discovered URLs waiting for an active scan
+SCAN_PIPELINE_POLL = float(settings.get("SCAN_PIPELINE_POLL", "5"))  # Seconds between reads of ZAP's known URLs
+
+class ScanPipeline:
+    """
+    Active-scans URLs while the crawlers are still discovering them.
+
+    A discovery stage reads the URLs ZAP has seen under the target (every
+    crawler goes through ZAP, so this covers the spiders and the browser)
+    and puts the new in-scope ones on a bounded queue. Worker stages take
+    URLs from the queue and run a non-recursive ZAP active scan on each,
+    at most `workers` at a time. When the queue is full discovery waits,
+    so ZAP is never flooded with more scans than it can run.
+    """
+
+    def __init__(self, scan_id, target_url, zap, context=None, frontier=None,
+                 workers=SCAN_PIPELINE_WORKERS, queue_size=SCAN_PIPELINE_QUEUE, poll_interval=SCAN_PIPELINE_POLL):
+        self.scan_id = scan_id
+        self.target_url = target_url
+        self.zap = zap
+        self.context_id = context.context_id if context else None
+        self.frontier = frontier
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self._crawling_done = asyncio.Event()
+        self._seen = set()
+        self._running = {}  # URL -> ZAP active scan ID
+        self._tasks = []
+        self.discovered = 0
+        self.scanned = 0
+        self.failed = 0
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._discover())]
+        self._tasks += [asyncio.create_task(self._scan_worker()) for _ in range(self.workers)]
+
+    async def finish(self):
+        """Signals that crawling ended and waits until every discovered URL was scanned."""
+        self._crawling_done.set()
+        await asyncio.gather(*self._tasks)
+        return self.stats()
+
+    async def cancel(self):
+        running = list(self._running.values())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for active_scan_id in running:
+            try:
+                await self.zap.ascan_stop(active_scan_id)
+            except Exception as e:
+                logger.warning(f"[pipeline] Could not stop active scan {active_scan_id}: {e}")
+
+    def stats(self):
+        return {
+            "discovered": self.discovered,
+            "queued": self.queue.qsize(),
+            "scanning": len(self._running),
+            "scanned": self.scanned,
+            "failed": self.failed,
+        }
+
+    def _publish(self):
+        broker.publish(self.scan_id, "progress", phase="active_scan", done=False, **self.stats())
+
+    async def _poll_urls(self):
+        try:
+            urls = await self.zap.core_urls(baseurl=self.target_url)
+        except Exception as e:
+            logger.warning(f"[pipeline] Could not read URLs for scan {self.scan_id}: {e}")
+            return
+        for url in urls:
+            canonical = canonicalize(url)
+            if canonical is None or canonical in self._seen:
+                continue
+            if self.frontier is not None and not self.frontier.in_scope(canonical):
+                continue
+            self._seen.add(canonical)
+            self.discovered += 1
+            # Backpressure: waits while the workers are behind
+            await self.queue.put(url)
+
+    async def _discover(self):
+        try:
+            while not self._crawling_done.is_set():
+                await self._poll_urls()
+                self._publish()
+                try:
+                    await asyncio.wait_for(self._crawling_done.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+            # Last read once every crawler stopped
+            await self._poll_urls()
+        except Exception as e:
+            logger.warning(f"[pipeline] Discovery for scan {self.scan_id} stopped: {e}")
+        # Tell every worker there is nothing left (not reached when cancelled)
+        for _ in range(self.workers):
+            await self.queue.put(None)
+
+    async def _scan_worker(self):
+        while True:
+            url = await self.queue.get()
+            if url is None:
+                return
+            try:
+                await self._scan(url)
+                self.scanned += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"[pipeline] Active scan of {url} failed: {e}")
+            finally:
+                self._running.pop(url, None)
+            self._publish()
+
+    async def _scan(self, url):
+        active_scan_id = await self.zap.ascan_scan(url, recurse=False, context_id=self.context_id)
+        self._running[url] = active_scan_id
+
+        async def active_scan_state():
+            percent = await self.zap.ascan_status(active_scan_id)
+            return {"percent": percent, "done": percent >= 100}
+
+        # Progress is published for the whole pipeline, not per URL
+        await poll_progress(active_scan_state, None, "active_scan", max_interval=10.0)
@@ -0,0 +1,140 @@
+from collections import OrderedDict, defaultdict
+import asyncio
+import json
+import time
+
+# Event types that close a scan's event stream
+TERMINAL_EVENTS = {"finished", "failed", "cancelled"}
+# Event types that are only streamed, not kept as the latest state of the scan
+TRANSIENT_EVENTS = {"alert"}
+# Finished scans whose latest events are kept, like the alert indexes of alert_service
+MAX_FINISHED_SCANS = 20
+
+class ProgressBroker:
+    """
+    In-memory fan-out of scan progress events.
+
+    Every subscriber gets its own bounded queue; a slow subscriber loses its
+    oldest events instead of slowing the scan down. The last event of each
+    phase is kept so late subscribers start from the current state, and
+    forgotten once the scan is one of more than `max_finished` finished ones.
+    """
+
+    def __init__(self, queue_size=100, max_finished=MAX_FINISHED_SCANS):
+        self.queue_size = queue_size
+        self.max_finished = max_finished
+        self._subscribers = defaultdict(set)
+        self._latest = defaultdict(dict)
+        self._finished = OrderedDict()  # Finished scan IDs, oldest first
+
+    def publish(self, scan_id, event_type, **data):
+        event = {"scan_id": scan_id, "type": event_type, "time": time.time(), **data}
+        if scan_id is None:
+            # Calls made outside a scan have nobody to report to
+            return event
+        if event_type not in TRANSIENT_EVENTS:
+            self._latest[scan_id][f"{event_type}:{data.get('phase', '')}"] = event
+        if event_type in TERMINAL_EVENTS:
+            self._finish(scan_id)
+        for queue in list(self._subscribers.get(scan_id, ())) + list(self._subscribers.get(None, ())):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+        return event
+
+    def subscribe(self, scan_id=None):
+        """Returns a queue receiving the events of `scan_id` (all scans if None)."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        if scan_id is not None:
+            for event in self.snapshot(scan_id)[-self.queue_size:]:
+                queue.put_nowait(event)
+        self._subscribers[scan_id].add(queue)
+        return queue
+
+    def unsubscribe(self, queue, scan_id=None):
+        subscribers = self._subscribers.get(scan_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[scan_id]
+
+    def snapshot(self, scan_id):
+        """Latest event per type and phase for `scan_id`, oldest first."""
+        return sorted(self._latest.get(scan_id, {}).values(), key=lambda e: e["time"])
+
+    def known(self, scan_id):
+        return scan_id in self._latest
+
+    def forget(self, scan_id):
+        self._latest.pop(scan_id, None)
+        self._finished.pop(scan_id, None)
+
+    def _finish(self, scan_id):
+        self._finished[scan_id] = True
+        self._finished.move_to_end(scan_id)
+        while len(self._finished) > self.max_finished:
+            self.forget(next(iter(self._finished)))
+
+broker = ProgressBroker()
+
+def next_interval(interval, percent, last_percent, elapsed, min_interval, max_interval):
+    """
+    Adaptive poll interval. While progress moves, wait about half the estimated
+    time left, so polls get closer together near completion; while it stalls,
+    back off exponentially up to `max_interval`.
+    """
+    if percent is None or last_percent is None or percent <= last_percent or elapsed <= 0:
+        return min(max_interval, interval * 1.5)
+    rate = (percent - last_percent) / elapsed  # percent per second
+    remaining = (100 - percent) / rate
+    return max(min_interval, min(max_interval, remaining / 2))
+
+async def poll_progress(fetch, scan_id, phase, timeout=None, min_interval=0.5, max_interval=5.0):
+    """
+    Polls `fetch()` until it reports completion, publishing a progress event
+    whenever the reported state changes.
+
+    `fetch` is an async callable returning a dict with at least `done` (bool)
+    and optionally `percent`, `urls_found`, `alerts` or any other field to
+    include in the event. Returns the last state, with `timed_out` set if
+    `timeout` seconds passed first.
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    interval = min_interval
+    last_state = None
+    last_percent = None
+    last_time = time.monotonic()
+    while True:
+        state = await fetch()
+        now = time.monotonic()
+        if state != last_state:
+            broker.publish(scan_id, "progress", phase=phase, **state)
+        if state.get("done"):
+            return state
+        if deadline is not None and now >= deadline:
+            return {**state, "timed_out": True}
+
+        percent = state.get("percent")
+        interval = next_interval(interval, percent, last_percent, now - last_time, min_interval, max_interval)
+        if state != last_state:
+            last_percent, last_time = percent, now
+        last_state = state
+        if deadline is not None:
+            interval = min(interval, max(0.0, deadline - now))
+        await asyncio.sleep(interval)
+
+async def stream_events(scan_id, keepalive=15.0):
+    """Server-Sent Events stream of a scan's progress (all scans if None), closed after the scan's final event."""
+    queue = broker.subscribe(scan_id)
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+            if scan_id is not None and event["type"] in TERMINAL_EVENTS:
+                return
+    finally:
+        broker.unsubscribe(queue, scan_id)
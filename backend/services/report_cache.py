@@ -0,0 +1,165 @@
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+REPORT_CACHE_DIR = settings.get("REPORT_CACHE_DIR", os.path.join(".data", "report_cache"))
+REPORT_CACHE_MAX_ENTRIES = int(settings.get("REPORT_CACHE_MAX_ENTRIES", "200"))
+REPORT_CACHE_MAX_MB = int(settings.get("REPORT_CACHE_MAX_MB", "512"))
+
+class CacheEntry:
+    def __init__(self, key, path, size, media_type, headers):
+        self.key = key
+        self.path = path
+        self.size = size
+        self.media_type = media_type
+        self.headers = headers
+
+class ReportCache:
+    """
+    LRU cache of rendered reports persisted on disk.
+
+    Keys combine the scan ID, the report parameters and a fingerprint of the
+    alert set, so an entry stays valid exactly as long as ZAP has no new
+    alerts or messages. Each entry is a body file plus a small JSON sidecar;
+    the index is rebuilt from the sidecars on first use, ordered by last access.
+    """
+
+    def __init__(self, directory=REPORT_CACHE_DIR, max_entries=REPORT_CACHE_MAX_ENTRIES, max_bytes=REPORT_CACHE_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._loaded = False
+
+    @staticmethod
+    def make_key(scan_id, fingerprint, **params):
+        raw = json.dumps({"scan_id": scan_id, "fingerprint": fingerprint, "params": params}, sort_keys=True)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _load(self):
+        """Reads the index from disk the first time the cache is used. Called with the lock held."""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.isdir(self.directory):
+            return
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            meta_path = os.path.join(self.directory, name)
+            try:
+                with open(meta_path, encoding="utf-8") as file:
+                    meta = json.load(file)
+                body_path = os.path.join(self.directory, meta["key"] + ".body")
+                entries.append((os.path.getmtime(body_path), CacheEntry(
+                    meta["key"], body_path, os.path.getsize(body_path), meta["media_type"], meta["headers"]
+                )))
+            except (OSError, ValueError, KeyError):
+                # Half-written or orphaned entry
+                self._remove_files(name[:-len(".json")])
+        for _, entry in sorted(entries, key=lambda item: item[0]):
+            self._entries[entry.key] = entry
+            self._bytes += entry.size
+        self._evict()
+
+    def get(self, key):
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if entry is None or not os.path.exists(entry.path):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        try:
+            os.utime(entry.path)  # Keeps LRU order across restarts
+        except OSError:
+            pass
+        return entry
+
+    async def tee(self, key, media_type, headers, body):
+        """
+        Passes `body` through to the client while writing it to the cache.
+        The entry is only stored once the whole body was produced.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = os.path.join(self.directory, f"{key}.{uuid.uuid4().hex}.tmp")
+        complete = False
+        size = 0
+        try:
+            with open(tmp_path, "wb") as file:
+                async for chunk in body:
+                    file.write(chunk)
+                    size += len(chunk)
+                    yield chunk
+            complete = True
+        finally:
+            if complete:
+                self._store(key, tmp_path, size, media_type, headers)
+            else:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def _store(self, key, tmp_path, size, media_type, headers):
+        body_path = os.path.join(self.directory, key + ".body")
+        os.replace(tmp_path, body_path)
+        with open(os.path.join(self.directory, key + ".json"), "w", encoding="utf-8") as file:
+            json.dump({"key": key, "media_type": media_type, "headers": headers}, file)
+        with self._lock:
+            self._load()
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._entries[key] = CacheEntry(key, body_path, size, media_type, headers)
+            self._bytes += size
+            self._evict()
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self._remove_files(entry.key)
+
+    def _remove_files(self, key):
+        for suffix in (".body", ".json"):
+            try:
+                os.remove(os.path.join(self.directory, key + suffix))
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._load()
+            keys = list(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+        for key in keys:
+            self._remove_files(key)
+
+    def stats(self):
+        with self._lock:
+            self._load()
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+report_cache = ReportCache()
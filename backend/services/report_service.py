@@ -0,0 +1,189 @@
+from services.zap_service import zap
+from services.alert_service import RISK_LEVELS
+from xml.sax.saxutils import escape
+import base64
+import html
+import json
+
+REPORT_FORMATS = {
+    "html": "text/html; charset=utf-8",
+    "json": "application/json",
+    "sarif": "application/sarif+json",
+    "xml": "application/xml",
+}
+
+# Raw ZAP alerts read per API call while filling a page
+FETCH_SIZE = 500
+
+SARIF_LEVELS = {3: "error", 2: "warning", 1: "note", 0: "none"}
+
+def encode_cursor(offset):
+    return base64.urlsafe_b64encode(json.dumps({"o": offset}).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """Returns the raw ZAP alert offset stored in `cursor`. Raises ValueError if it is malformed."""
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset = json.loads(base64.urlsafe_b64decode(padded))["o"]
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return offset
+
+def _matches(alert, min_risk, plugin):
+    if RISK_LEVELS.get(alert.get("risk"), 0) < min_risk:
+        return False
+    return plugin is None or str(alert.get("pluginId")) == str(plugin)
+
+async def fetch_alert_page(site=None, min_risk=0, plugin=None, cursor=None, limit=100, client=None):
+    """
+    Reads ZAP alerts from the cursor position until `limit` alerts pass the
+    filters. Returns the page and the cursor of the next page (None when
+    there are no more alerts). `client` is the ZAP instance to read from
+    (the default one if None).
+    """
+    client = client or zap
+    offset = decode_cursor(cursor)
+    page = []
+    while len(page) < limit:
+        raw = await client.core_alerts(baseurl=site, start=offset, count=FETCH_SIZE)
+        for position, alert in enumerate(raw):
+            if _matches(alert, min_risk, plugin):
+                page.append(alert)
+                if len(page) == limit:
+                    return page, encode_cursor(offset + position + 1)
+        if len(raw) < FETCH_SIZE:
+            return page, None
+        offset += len(raw)
+    return page, encode_cursor(offset)
+
+async def report_fingerprint(site=None, client=None):
+    """
+    Cheap summary of ZAP's alert set: number of alerts and number of HTTP
+    messages (message IDs are sequential, so this tracks the last one). Any
+    new alert or request changes it.
+    """
+    client = client or zap
+    alerts = await client.core_number_of_alerts(baseurl=site)
+    messages = await client.core_number_of_messages(baseurl=site)
+    return {"alerts": alerts, "messages": messages}
+
+async def stream_native_report(report_format, client=None):
+    """Streams ZAP's own full report (html or xml) chunk by chunk."""
+    async for chunk in (client or zap).stream_other("core", f"{report_format}report"):
+        yield chunk
+
+async def render_json(alerts, next_cursor):
+    yield '{"alerts": ['
+    for i, alert in enumerate(alerts):
+        yield ("," if i else "") + json.dumps(alert)
+    yield f'], "count": {len(alerts)}, "next_cursor": {json.dumps(next_cursor)}}}'
+
+async def render_sarif(alerts, next_cursor):
+    rules = {}
+    for alert in alerts:
+        rules.setdefault(str(alert.get("pluginId")), alert)
+    yield '{"$schema": "https://json.schemastore.org/sarif-2.1.0.json", "version": "2.1.0", "runs": [{'
+    yield '"tool": {"driver": {"name": "ZAP", "informationUri": "https://www.zaproxy.org/", "rules": ['
+    for i, (rule_id, alert) in enumerate(rules.items()):
+        rule = {
+            "id": rule_id,
+            "name": alert.get("alert") or alert.get("name"),
+            "shortDescription": {"text": alert.get("alert") or alert.get("name") or rule_id},
+            "fullDescription": {"text": alert.get("description", "")},
+            "help": {"text": alert.get("solution", "")},
+            "properties": {"cweid": alert.get("cweid"), "wascid": alert.get("wascid")},
+        }
+        yield ("," if i else "") + json.dumps(rule)
+    yield ']}}, "results": ['
+    for i, alert in enumerate(alerts):
+        result = {
+            "ruleId": str(alert.get("pluginId")),
+            "level": SARIF_LEVELS[RISK_LEVELS.get(alert.get("risk"), 0)],
+            "message": {"text": alert.get("alert") or alert.get("name", "")},
+            "locations": [{"physicalLocation": {"artifactLocation": {"uri": alert.get("url", "")}}}],
+            "properties": {
+                "risk": alert.get("risk"),
+                "confidence": alert.get("confidence"),
+                "method": alert.get("method"),
+                "param": alert.get("param"),
+                "attack": alert.get("attack"),
+                "evidence": alert.get("evidence"),
+                "messageId": alert.get("messageId"),
+            },
+        }
+        yield ("," if i else "") + json.dumps(result)
+    yield f'], "properties": {{"next_cursor": {json.dumps(next_cursor)}}}}}]}}'
+
+async def render_xml(alerts, next_cursor):
+    yield '<?xml version="1.0"?>\n'
+    yield f'<OWASPZAPReport programName="ZAP" nextCursor="{escape(next_cursor or "")}">\n<alerts>\n'
+    for alert in alerts:
+        yield "<alertitem>"
+        yield f"<pluginid>{escape(str(alert.get('pluginId', '')))}</pluginid>"
+        yield f"<alert>{escape(alert.get('alert', ''))}</alert>"
+        yield f"<riskcode>{RISK_LEVELS.get(alert.get('risk'), 0)}</riskcode>"
+        yield f"<riskdesc>{escape(alert.get('risk', ''))} ({escape(alert.get('confidence', ''))})</riskdesc>"
+        yield f"<uri>{escape(alert.get('url', ''))}</uri><method>{escape(alert.get('method', ''))}</method>"
+        yield f"<param>{escape(alert.get('param', ''))}</param><evidence>{escape(alert.get('evidence', ''))}</evidence>"
+        yield f"<cweid>{escape(str(alert.get('cweid', '')))}</cweid><wascid>{escape(str(alert.get('wascid', '')))}</wascid>"
+        yield "</alertitem>\n"
+    yield "</alerts>\n</OWASPZAPReport>\n"
+
+async def render_html(alerts, next_cursor):
+    yield '<!DOCTYPE html><html><head><meta charset="utf-8"><title>ZAP alerts</title></head><body>'
+    yield f"<h1>ZAP alerts</h1><p>{len(alerts)} alerts"
+    if next_cursor:
+        yield f" &middot; next cursor: <code>{html.escape(next_cursor)}</code>"
+    yield "</p><table border=\"1\"><tr><th>Risk</th><th>Confidence</th><th>Alert</th><th>Method</th><th>URL</th><th>Param</th><th>Evidence</th></tr>"
+    for alert in alerts:
+        cells = (alert.get(field, "") for field in ("risk", "confidence", "alert", "method", "url", "param", "evidence"))
+        yield "<tr>" + "".join(f"<td>{html.escape(str(cell))}</td>" for cell in cells) + "</tr>"
+    yield "</table></body></html>"
+
+async def _empty():
+    return
+    yield
+
+RENDERERS = {"json": render_json, "sarif": render_sarif, "xml": render_xml, "html": render_html}
+
+async def _prime(chunks):
+    """Reads the first chunk up front so ZAP errors surface before the response starts."""
+    first = await chunks.__anext__()
+
+    async def body():
+        yield first
+        async for chunk in chunks:
+            yield chunk
+    return body()
+
+async def _encode(chunks):
+    async for chunk in chunks:
+        yield chunk.encode("utf-8")
+
+async def build_report(report_format="html", site=None, min_risk=0, plugin=None, cursor=None, limit=None, client=None):
+    """
+    Prepares a report response. Returns (media_type, headers, body) where body
+    is an async iterator of bytes.
+
+    Without filters, cursor or limit, `html` and `xml` stream ZAP's own full
+    report. Every other combination reads one page of matching alerts and
+    renders it; the next page's cursor is returned in the X-Next-Cursor
+    header (and inside the body).
+    """
+    media_type = REPORT_FORMATS[report_format]
+    paged = report_format in ("json", "sarif") or any(
+        value is not None for value in (site, plugin, cursor, limit)
+    ) or min_risk > 0
+    if not paged:
+        try:
+            return media_type, {}, await _prime(stream_native_report(report_format, client))
+        except StopAsyncIteration:
+            return media_type, {}, _encode(_empty())
+
+    alerts, next_cursor = await fetch_alert_page(site, min_risk, plugin, cursor, limit or 100, client)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return media_type, headers, _encode(RENDERERS[report_format](alerts, next_cursor))
@@ -0,0 +1,268 @@
+from xml.etree.ElementTree import iterparse
+import sqlite3
+import time
+import uuid
+from config.settings import settings
+import os
+
+REPORT_DB_PATH = settings.get("REPORT_DB_PATH", os.path.join(".data", "reports.db"))
+REPORT_IMPORT_DIR = settings.get("REPORT_IMPORT_DIR", os.path.join(".data", "reports"))  # Only XML reports under it can be imported by path
+
+# Rows written per transaction while ingesting
+BATCH_SIZE = 500
+# Marks the report IDs rows are written under until an import completes
+STAGING_MARK = "#importing-"
+
+# Long texts shared by every alert of a plugin; stored once per plugin
+PLUGIN_TEXT_FIELDS = ("name", "desc", "solution", "reference")
+ALERT_FIELDS = ("pluginid", "alertRef", "riskcode", "confidence", "cweid", "wascid", "sourceid", "otherinfo")
+INSTANCE_FIELDS = ("uri", "method", "param", "attack", "evidence", "otherinfo")
+
+def iter_report_alerts(source):
+    """
+    Streams the alerts of an OWASPZAPReport XML file (site -> alertitem ->
+    instances) as dicts, one per alertitem, with its site attributes and
+    instances. Parsed elements are dropped as soon as they are yielded, so
+    memory stays flat whatever the report size.
+    """
+    site = {}
+    parent = None
+    for event, elem in iterparse(source, events=("start", "end")):
+        if event == "start":
+            if elem.tag == "site":
+                site = dict(elem.attrib)
+            elif elem.tag == "alerts":
+                parent = elem
+            continue
+        if elem.tag == "alertitem":
+            alert = {child.tag: (child.text or "") for child in elem if child.tag != "instances"}
+            instances_elem = elem.find("instances")
+            alert["instances"] = [
+                {field: instance.findtext(field, default="") for field in INSTANCE_FIELDS}
+                for instance in (instances_elem if instances_elem is not None else [])
+            ]
+            alert["site"] = site.get("name", "")
+            alert["host"] = site.get("host", "")
+            alert["port"] = site.get("port", "")
+            yield alert
+            elem.clear()
+            if parent is not None:
+                parent.remove(elem)
+        elif elem.tag == "site":
+            elem.clear()
+
+def resolve_import_path(path, root=REPORT_IMPORT_DIR):
+    """
+    Absolute path of `path` taken relative to `root`. Raises ValueError if it
+    points outside `root` (absolute paths, "..", symlinks), so clients cannot
+    probe or read other files of the server.
+    """
+    root = os.path.realpath(root)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"Report path must be inside the reports directory (REPORT_IMPORT_DIR): {path}")
+    return resolved
+
+def _int(value, default=0):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+class ReportStore:
+    """
+    SQLite store of parsed ZAP reports, indexed for queries by risk,
+    confidence, plugin, host and URI prefix. Methods are blocking; call them
+    through run_blocking.
+    """
+
+    def __init__(self, db_path=REPORT_DB_PATH):
+        self.db_path = db_path
+        self._initialized = False
+
+    def _connect(self):
+        if not self._initialized:
+            self._init()
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS reports (
+                    report_id TEXT PRIMARY KEY,
+                    source TEXT,
+                    imported_at REAL NOT NULL,
+                    alerts INTEGER NOT NULL DEFAULT 0,
+                    instances INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS plugins (
+                    pluginid INTEGER NOT NULL,
+                    alert_ref TEXT NOT NULL,
+                    name TEXT, desc TEXT, solution TEXT, reference TEXT,
+                    PRIMARY KEY (pluginid, alert_ref)
+                );
+                CREATE TABLE IF NOT EXISTS alerts (
+                    alert_id INTEGER PRIMARY KEY,
+                    report_id TEXT NOT NULL,
+                    site TEXT, host TEXT, port TEXT,
+                    pluginid INTEGER, alert_ref TEXT,
+                    riskcode INTEGER, confidence INTEGER,
+                    cweid INTEGER, wascid INTEGER, sourceid INTEGER,
+                    otherinfo TEXT
+                );
+                CREATE TABLE IF NOT EXISTS instances (
+                    alert_id INTEGER NOT NULL,
+                    report_id TEXT NOT NULL,
+                    uri TEXT, method TEXT, param TEXT, attack TEXT, evidence TEXT, otherinfo TEXT
+                );
+                CREATE INDEX IF NOT EXISTS alerts_risk ON alerts (report_id, riskcode, confidence);
+                CREATE INDEX IF NOT EXISTS alerts_plugin ON alerts (report_id, pluginid);
+                CREATE INDEX IF NOT EXISTS alerts_host ON alerts (report_id, host);
+                CREATE INDEX IF NOT EXISTS instances_alert ON instances (alert_id);
+                CREATE INDEX IF NOT EXISTS instances_uri ON instances (report_id, uri);
+            """)
+            # Imports interrupted by a previous process
+            for table in ("instances", "alerts", "reports"):
+                conn.execute(f"DELETE FROM {table} WHERE instr(report_id, ?) > 0", (STAGING_MARK,))
+        self._initialized = True
+
+    def ingest(self, report_id, source, label=None):
+        """
+        Parses the XML report at `source` (path or file object) into the store
+        under `report_id`, replacing any previous report with that ID.
+        Returns the number of alerts and instances stored.
+
+        Rows are written under a staging ID, committed in batches, and swapped
+        in for the previous report in a single transaction once the whole file
+        parsed: a failed import leaves the previous report untouched.
+        """
+        staging_id = f"{report_id}{STAGING_MARK}{uuid.uuid4().hex}"
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO reports (report_id, source, imported_at) VALUES (?, ?, ?)",
+                (staging_id, label or (source if isinstance(source, str) else None), time.time())
+            )
+            alerts = instances = 0
+            pending = 0
+            for alert in iter_report_alerts(source):
+                pluginid = _int(alert.get("pluginid"))
+                alert_ref = alert.get("alertRef") or str(pluginid)
+                conn.execute(
+                    "INSERT OR IGNORE INTO plugins (pluginid, alert_ref, name, desc, solution, reference) VALUES (?, ?, ?, ?, ?, ?)",
+                    (pluginid, alert_ref, *(alert.get(field, "") for field in PLUGIN_TEXT_FIELDS))
+                )
+                cursor = conn.execute(
+                    "INSERT INTO alerts (report_id, site, host, port, pluginid, alert_ref, riskcode, confidence, cweid, wascid, sourceid, otherinfo)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (staging_id, alert["site"], alert["host"], alert["port"], pluginid, alert_ref,
+                     _int(alert.get("riskcode")), _int(alert.get("confidence")), _int(alert.get("cweid"), None),
+                     _int(alert.get("wascid"), None), _int(alert.get("sourceid"), None), alert.get("otherinfo", ""))
+                )
+                conn.executemany(
+                    "INSERT INTO instances (alert_id, report_id, uri, method, param, attack, evidence, otherinfo) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(cursor.lastrowid, staging_id, *(instance[field] for field in INSTANCE_FIELDS)) for instance in alert["instances"]]
+                )
+                alerts += 1
+                instances += len(alert["instances"])
+                pending += 1 + len(alert["instances"])
+                if pending >= BATCH_SIZE:
+                    conn.commit()
+                    pending = 0
+            conn.execute("UPDATE reports SET alerts = ?, instances = ? WHERE report_id = ?", (alerts, instances, staging_id))
+            conn.commit()
+            # Swap: the old report is only deleted together with the rename
+            self._delete(conn, report_id)
+            for table in ("reports", "alerts", "instances"):
+                conn.execute(f"UPDATE {table} SET report_id = ? WHERE report_id = ?", (report_id, staging_id))
+            conn.commit()
+            return {"report_id": report_id, "alerts": alerts, "instances": instances}
+        except Exception:
+            conn.rollback()
+            self._delete(conn, staging_id)
+            conn.commit()
+            raise
+        finally:
+            conn.close()
+
+    def delete(self, report_id):
+        conn = self._connect()
+        try:
+            self._delete(conn, report_id)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _delete(self, conn, report_id):
+        conn.execute("DELETE FROM instances WHERE report_id = ?", (report_id,))
+        conn.execute("DELETE FROM alerts WHERE report_id = ?", (report_id,))
+        conn.execute("DELETE FROM reports WHERE report_id = ?", (report_id,))
+
+    def get_report(self, report_id):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM reports WHERE report_id = ?", (report_id,)).fetchone()
+            if row is None:
+                return None
+            report = dict(row)
+            report["by_risk"] = {
+                r["riskcode"]: r["total"] for r in conn.execute(
+                    "SELECT riskcode, COUNT(*) AS total FROM alerts WHERE report_id = ? GROUP BY riskcode", (report_id,)
+                )
+            }
+            return report
+        finally:
+            conn.close()
+
+    def list_reports(self, limit=50, offset=0):
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT * FROM reports WHERE instr(report_id, ?) = 0 ORDER BY imported_at DESC LIMIT ? OFFSET ?",
+                (STAGING_MARK, limit, offset)
+            ).fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    def query(self, report_id, min_risk=0, min_confidence=0, plugin=None, host=None, uri_prefix=None,
+              limit=100, offset=0, with_details=False):
+        """
+        Returns one row per alert instance matching the filters, highest risk
+        first, plus the offset of the next page (None on the last page).
+        """
+        where = ["a.report_id = ?", "a.riskcode >= ?", "a.confidence >= ?"]
+        params = [report_id, min_risk, min_confidence]
+        if plugin is not None:
+            where.append("a.pluginid = ?")
+            params.append(plugin)
+        if host:
+            where.append("a.host = ?")
+            params.append(host)
+        if uri_prefix:
+            # Range scan instead of LIKE so the (report_id, uri) index is used
+            where.append("i.uri >= ? AND i.uri < ?")
+            params += [uri_prefix, uri_prefix + "\U0010ffff"]
+        details = ", p.desc, p.solution, p.reference" if with_details else ""
+        sql = (
+            "SELECT a.alert_id, a.site, a.host, a.pluginid, a.alert_ref, p.name, a.riskcode, a.confidence,"
+            " a.cweid, a.wascid, i.uri, i.method, i.param, i.attack, i.evidence" + details +
+            " FROM alerts a JOIN instances i ON i.alert_id = a.alert_id"
+            " LEFT JOIN plugins p ON p.pluginid = a.pluginid AND p.alert_ref = a.alert_ref"
+            " WHERE " + " AND ".join(where) +
+            " ORDER BY a.riskcode DESC, a.confidence DESC, a.alert_id, i.rowid LIMIT ? OFFSET ?"
+        )
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, params + [limit + 1, offset]).fetchall()
+        finally:
+            conn.close()
+        next_offset = offset + limit if len(rows) > limit else None
+        return [dict(row) for row in rows[:limit]], next_offset
+
+report_store = ReportStore()
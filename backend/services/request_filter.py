@@ -0,0 +1,138 @@
+import logging
+import threading
+from urllib.parse import urlparse
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Blocking is per scan: these are the defaults of a scan's blocklists, and browsers
+# leased outside a scan (such as the MCP tools' default session) block nothing
+BROWSER_BLOCK_FILE_TYPES = settings.get("BROWSER_BLOCK_FILE_TYPES", "")  # File types (by URL extension) scans never download
+BROWSER_BLOCK_TRACKERS = settings.get("BROWSER_BLOCK_TRACKERS", "0") == "1"  # Scans block the hosts of TRACKER_HOSTS
+BROWSER_BLOCK_HOSTS = settings.get("BROWSER_BLOCK_HOSTS", "")  # Comma-separated extra hosts scans block (subdomains included)
+
+# File extensions of each blockable file type. Network.setBlockedURLs matches URL
+# patterns only, so this is not blocking by resource type: an image served from an
+# extensionless URL still loads, and a page whose URL ends in .png is blocked.
+# (Blocking by resource type needs Fetch.requestPaused events, which Selenium's
+# execute_cdp_cmd cannot receive.)
+FILE_TYPE_EXTENSIONS = {
+    "image": ["png", "jpg", "jpeg", "gif", "webp", "avif", "bmp", "ico", "svg", "tif", "tiff"],
+    "font": ["woff", "woff2", "ttf", "otf", "eot"],
+    "media": ["mp4", "webm", "ogg", "ogv", "mp3", "wav", "m4a", "m4v", "mov", "avi", "flac", "m3u8", "mpd"],
+    "stylesheet": ["css"],
+}
+
+# Analytics, ads and session recording loaded by the pages themselves. Chrome's
+# own background requests (update.googleapis.com, passwordsleakcheck-pa...) are
+# not page requests; the launch profiles turn them off (see chrome_profiles).
+TRACKER_HOSTS = [
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "doubleclick.net",
+    "facebook.net",
+    "connect.facebook.com",
+    "hotjar.com",
+    "clarity.ms",
+    "segment.com",
+    "segment.io",
+    "mixpanel.com",
+    "amplitude.com",
+    "fullstory.com",
+    "plausible.io",
+    "nr-data.net",
+    "scorecardresearch.com",
+    "quantserve.com",
+    "adservice.google.com",
+]
+
+def _split(value):
+    return [item.strip().lower() for item in value.split(",") if item.strip()]
+
+def _within(host, parent):
+    return host == parent or host.endswith("." + parent)
+
+def block_patterns(file_types=None, hosts=None, target_url=None):
+    """
+    URL patterns for CDP Network.setBlockedURLs blocking the URLs ending in
+    the extensions of `file_types` (keys of FILE_TYPE_EXTENSIONS) and `hosts`
+    with their subdomains. A host containing the target's host, or contained
+    in it, is never blocked, so a blocklist cannot take the scanned
+    application out of its own scan.
+    """
+    unknown = set(file_types or ()) - set(FILE_TYPE_EXTENSIONS)
+    if unknown:
+        raise ValueError(f"Unknown file types {sorted(unknown)}, expected some of {', '.join(FILE_TYPE_EXTENSIONS)}")
+    patterns = []
+    for file_type in file_types or ():
+        for extension in FILE_TYPE_EXTENSIONS[file_type]:
+            patterns += [f"*.{extension}", f"*.{extension}?*"]
+    target = (urlparse(target_url).hostname or "") if target_url else ""
+    for host in dict.fromkeys(hosts or ()):
+        if target and (_within(target, host) or _within(host, target)):
+            logger.info(f"[blocking] Not blocking {host}: it is the scan target")
+            continue
+        patterns += [f"*://{host}/*", f"*://*.{host}/*", f"*://{host}:*", f"*://*.{host}:*"]
+    return patterns
+
+def default_hosts():
+    return (TRACKER_HOSTS if BROWSER_BLOCK_TRACKERS else []) + _split(BROWSER_BLOCK_HOSTS)
+
+def apply_blocking(driver, patterns):
+    """Makes the browser fail requests matching `patterns` before they reach the proxy. Blocking."""
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+
+class RequestFilters:
+    """
+    Blocked URL patterns of each scan's browser session.
+
+    A scan's blocklists are the defaults (BROWSER_BLOCK_FILE_TYPES plus the
+    tracker and BROWSER_BLOCK_HOSTS hosts, all empty unless configured) or
+    the file types and hosts it asks for, for as long as it runs. Sessions
+    not configured by a scan block nothing. The pool applies the patterns
+    when it leases a browser to the session. Thread-safe: read from the
+    browser executor.
+    """
+
+    def __init__(self, file_types=None, hosts=None):
+        self.file_types = _split(BROWSER_BLOCK_FILE_TYPES) if file_types is None else file_types
+        self.hosts = default_hosts() if hosts is None else hosts
+        self._lock = threading.Lock()
+        self._sessions = {}  # Session ID -> (file types, hosts, patterns)
+
+    def configure(self, session_id, target_url=None, file_types=None, hosts=None):
+        """
+        Sets the blocklists of a scan's session. None keeps the default of
+        that list; `hosts` are added to the default hosts. Raises ValueError
+        for an unknown file type.
+        """
+        file_types = self.file_types if file_types is None else [t.lower() for t in file_types]
+        hosts = self.hosts + [host.lower() for host in hosts or ()]
+        patterns = block_patterns(file_types, hosts, target_url)
+        with self._lock:
+            self._sessions[session_id] = (file_types, hosts, patterns)
+
+    def drop(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def patterns(self, session_id):
+        with self._lock:
+            config = self._sessions.get(session_id)
+        return config[2] if config is not None else []
+
+    def stats(self, session_id=None):
+        with self._lock:
+            sessions = dict(self._sessions)
+        if session_id is not None:
+            file_types, hosts, patterns = sessions.get(session_id, ([], [], []))
+            return {"file_types": file_types, "hosts": hosts, "patterns": len(patterns)}
+        return {
+            "scan_defaults": {"file_types": self.file_types, "hosts": len(self.hosts)},
+            "sessions": {session_id: {"file_types": config[0], "hosts": len(config[1])} for session_id, config in sessions.items()},
+        }
+
+request_filters = RequestFilters()
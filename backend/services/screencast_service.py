@@ -0,0 +1,227 @@
+from services.selenium_service import pool
+from services.executor_service import run_in_current_browser, SESSION_BUSY
+import asyncio
+import base64
+import hashlib
+import io
+import logging
+import time
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Pillow is optional: without it frames are compared by exact hash instead of perceptual hash
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+SCREENCAST_INTERVAL = float(settings.get("SCREENCAST_INTERVAL", "1"))  # Seconds between captures of a watched session
+SCREENCAST_QUALITY = int(settings.get("SCREENCAST_QUALITY", "70"))  # JPEG/WebP quality (1-100)
+SCREENCAST_CHANGE_THRESHOLD = int(settings.get("SCREENCAST_CHANGE_THRESHOLD", "2"))  # Differing dHash bits that count as a change
+
+FORMATS = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+# Width of the capture compared between ticks
+FINGERPRINT_WIDTH = 64
+
+def _viewport(driver):
+    metrics = driver.execute_cdp_cmd("Page.getLayoutMetrics", {})
+    viewport = metrics.get("cssVisualViewport") or metrics["layoutViewport"]
+    return viewport["clientWidth"], viewport["clientHeight"]
+
+def capture(driver, format="png", width=None, quality=SCREENCAST_QUALITY):
+    """
+    Captures the viewport with CDP Page.captureScreenshot, encoded and
+    downscaled to `width` pixels by Chrome itself. Blocking; run it on the
+    browser executor.
+    """
+    params = {"format": format, "optimizeForSpeed": True}
+    if format != "png":
+        params["quality"] = quality
+    if width:
+        viewport_width, viewport_height = _viewport(driver)
+        scale = min(1.0, width / viewport_width) if viewport_width else 1.0
+        params["clip"] = {"x": 0, "y": 0, "width": viewport_width, "height": viewport_height, "scale": scale}
+    return base64.b64decode(driver.execute_cdp_cmd("Page.captureScreenshot", params)["data"])
+
+def dhash(image_bytes):
+    """64-bit difference hash: gray 9x8 thumbnail, one bit per horizontally adjacent pixel pair."""
+    pixels = list(Image.open(io.BytesIO(image_bytes)).convert("L").resize((9, 8)).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits
+
+def fingerprint(driver):
+    """What is compared to decide whether the page changed: dHash of a small capture, or its digest without Pillow."""
+    thumbnail = capture(driver, "png", FINGERPRINT_WIDTH)
+    if Image is not None:
+        return dhash(thumbnail)
+    return hashlib.blake2b(thumbnail, digest_size=16).digest()
+
+def changed(old, new, threshold=SCREENCAST_CHANGE_THRESHOLD):
+    if old is None:
+        return True
+    if isinstance(new, int):
+        return bin(old ^ new).count("1") > threshold
+    return old != new
+
+def capture_changes(driver, previous, variants, missing):
+    """
+    One screencast tick: the page's fingerprint, whether it differs from
+    `previous`, and fresh captures of every variant if so, else only of the
+    `missing` ones. Blocking; run it with the session lock held.
+    """
+    current = fingerprint(driver)
+    is_changed = changed(previous, current)
+    targets = variants if is_changed else missing
+    return current, is_changed, {variant: capture(driver, *variant) for variant in targets}
+
+class Frame:
+    def __init__(self, data, format, seq):
+        self.data = data
+        self.media_type = FORMATS[format]
+        self.seq = seq
+        self.captured_at = time.time()
+
+class Screencast:
+    """
+    Captures one browser session on a single schedule for all its viewers.
+    Captures hold the session lock, so they never interleave with a
+    navigate or batch; a tick finding the session busy is skipped.
+
+    Each tick takes a small capture and compares its perceptual hash with
+    the previous one; only when the page changed are the variants (format,
+    width) the viewers asked for captured and pushed to them. Viewer queues
+    hold the latest frame only, so a slow viewer skips frames instead of
+    slowing the others. All state is touched from the event loop only.
+    """
+
+    def __init__(self, session_id, interval=SCREENCAST_INTERVAL):
+        self.session_id = session_id
+        self.interval = interval
+        self.viewers = {}  # Variant (format, width) -> viewer queues
+        self.latest = {}  # Variant -> last Frame
+        self.task = None
+        self._fingerprint = None
+        self._seq = 0
+        self.captures = 0
+        self.unchanged = 0
+        self.busy = 0  # Ticks skipped because another call was driving the browser
+
+    def subscribe(self, variant):
+        queue = asyncio.Queue(maxsize=1)
+        self.viewers.setdefault(variant, set()).add(queue)
+        if variant in self.latest:
+            queue.put_nowait(self.latest[variant])
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, variant, queue):
+        queues = self.viewers.get(variant, set())
+        queues.discard(queue)
+        if not queues:
+            self.viewers.pop(variant, None)
+            self.latest.pop(variant, None)
+
+    def _push(self, variant, frame):
+        self.latest[variant] = frame
+        for queue in self.viewers.get(variant, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(frame)
+
+    def _end(self):
+        # None tells viewers the session has no browser anymore
+        for queues in self.viewers.values():
+            for queue in queues:
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def _run(self):
+        while self.viewers:
+            if pool.get(self.session_id) is None:
+                self._end()
+                return
+            try:
+                # Under the session lock, like every WebDriver call, but a tick is
+                # skipped rather than waiting behind a slow navigate or batch
+                missing = [variant for variant in self.viewers if variant not in self.latest]
+                result = await run_in_current_browser(
+                    self.session_id, capture_changes, self._fingerprint, list(self.viewers), missing, wait=False
+                )
+                if result is None:
+                    self._end()
+                    return
+                if result is SESSION_BUSY:
+                    self.busy += 1
+                else:
+                    current, is_changed, frames = result
+                    self._fingerprint = current
+                    if not is_changed:
+                        self.unchanged += 1
+                    for variant, data in frames.items():
+                        self._seq += 1
+                        self.captures += 1
+                        self._push(variant, Frame(data, variant[0], self._seq))
+            except Exception as e:
+                logger.warning(f"[screencast] Capture of session {self.session_id} failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def frame(self, variant):
+        """Latest frame of `variant` while the screencast runs (it is replaced as soon as the page changes), else a fresh capture."""
+        frame = self.latest.get(variant)
+        if frame is not None and self.task is not None and not self.task.done():
+            return frame
+        data = await run_in_current_browser(self.session_id, capture, *variant)
+        if data is None:
+            return None
+        self._seq += 1
+        self.captures += 1
+        return Frame(data, variant[0], self._seq)
+
+    def stats(self):
+        return {
+            "viewers": sum(len(queues) for queues in self.viewers.values()),
+            "variants": [{"format": format, "width": width} for format, width in self.viewers],
+            "captures": self.captures,
+            "unchanged": self.unchanged,
+            "busy": self.busy,
+        }
+
+class ScreencastManager:
+    """The screencast of each watched browser session, by session ID."""
+
+    def __init__(self):
+        self._screencasts = {}
+
+    async def frame(self, session_id, format="png", width=None):
+        """One frame of the session, shared with its viewers if it is being streamed. None without browser."""
+        screencast = self._screencasts.get(session_id) or Screencast(session_id)
+        return await screencast.frame((format, width))
+
+    async def stream(self, session_id, format="jpeg", width=None):
+        """Yields frames of the session as they change, until its browser is released."""
+        screencast = self._screencasts.get(session_id)
+        if screencast is None:
+            screencast = self._screencasts[session_id] = Screencast(session_id)
+        variant = (format, width)
+        queue = screencast.subscribe(variant)
+        try:
+            while True:
+                frame = await queue.get()
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            screencast.unsubscribe(variant, queue)
+            if not screencast.viewers:
+                self._screencasts.pop(session_id, None)
+
+    def stats(self):
+        return {session_id: screencast.stats() for session_id, screencast in self._screencasts.items()}
+
+screencasts = ScreencastManager()
@@ -1,49 +1,337 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.proxy import Proxy, ProxyType
-import asyncio
+from services.snapshot_service import snapshot_cache
+from services.chrome_profiles import build_options, launch_dirs, SELENIUM_PROFILE
+from services.request_filter import request_filters, apply_blocking
+from collections import deque
+from urllib.parse import urlsplit
+import threading
 import logging
-from dotenv import load_dotenv
-import os
+import time
+from config.settings import settings
 
 logging.basicConfig(level=logging.INFO)
-
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 # Setup ZAP Proxy
-zap_proxy = os.getenv("ZAP_PROXY")  # ZAP proxy by default
-
-# Configure the proxy for the Selenium browser
-proxy = Proxy()
-proxy.proxy_type = ProxyType.MANUAL
-proxy.http_proxy = zap_proxy
-proxy.ssl_proxy = zap_proxy
-
-driver = None
-driver_lock = asyncio.Lock()
-
-def create_driver():
-    # Start Selenium WebDriver
-    options = Options()
-    options.headless = False  # Visual mode
-    options.proxy = proxy
+zap_proxy = settings.get("ZAP_PROXY")  # ZAP proxy by default
+
+# Pool configuration
+POOL_SIZE = int(settings.get("SELENIUM_POOL_SIZE", "3"))  # Max browsers alive at once
+POOL_WARM = int(settings.get("SELENIUM_POOL_WARM", "0"))  # Browsers started on app startup
+POOL_MAX_USES = int(settings.get("SELENIUM_POOL_MAX_USES", "20"))  # Leases before a browser is recycled
+POOL_ACQUIRE_TIMEOUT = float(settings.get("SELENIUM_POOL_ACQUIRE_TIMEOUT", "60"))  # Seconds to wait for a free browser
+
+# Session used by MCP clients that do not send a session_id
+DEFAULT_SESSION = "default"
+
+def create_proxy(proxy_url):
+    from selenium.webdriver.common.proxy import Proxy, ProxyType
+    # Configure the proxy for the Selenium browser
+    proxy = Proxy()
+    proxy.proxy_type = ProxyType.MANUAL
+    proxy.http_proxy = proxy_url
+    proxy.ssl_proxy = proxy_url
+    return proxy
+
+def _launch(proxy_url, profile, user_data_dir=None, cache_dir=None):
+    # Imported on the first launch, not at startup: loading Selenium's webdriver package is slow
+    from selenium import webdriver
+    options = build_options(profile, user_data_dir, cache_dir)
+    options.proxy = create_proxy(proxy_url)
     options.add_argument("--proxy-bypass-list=<-loopback>")  # Bypass localhost
     return webdriver.Chrome(options=options)
 
+def create_driver(proxy_url=zap_proxy, profile=SELENIUM_PROFILE):
+    # Start Selenium WebDriver with the launch profile (SELENIUM_PROFILE), from a copy
+    # of the profile template and with a reusable cache directory if configured
+    user_data_dir, cache_dir, slot = launch_dirs.allocate(
+        lambda user_data_dir: _launch(proxy_url, profile, user_data_dir)
+    )
+    try:
+        driver = _launch(proxy_url, profile, user_data_dir, cache_dir)
+    except Exception:
+        launch_dirs.release(user_data_dir, slot)
+        raise
+    launch_dirs.adopt(driver, user_data_dir, slot)
+    return driver
+
+def quit_driver(driver):
+    try:
+        driver.quit()
+    finally:
+        launch_dirs.release_driver(driver)
+
+def _origin(url):
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        return None
+    return f"{parts.scheme}://{parts.netloc}"
+
+def is_healthy(driver):
+    """Returns True if the browser session still answers commands."""
+    try:
+        driver.execute_script("return 1")
+        return True
+    except Exception:
+        return False
+
+class PoolExhaustedError(Exception):
+    """Raised when no browser becomes free before the acquire timeout."""
+
+class PooledDriver:
+    """A browser owned by the pool plus its usage bookkeeping."""
+
+    def __init__(self, driver, proxy_url):
+        self.driver = driver
+        self.proxy_url = proxy_url  # Chrome cannot change its proxy once started
+        self.uses = 0
+        self.created_at = time.monotonic()
+        self.blocked = None  # URL patterns the browser currently blocks
+
+class DriverPool:
+    """
+    Bounded pool of Chrome sessions leased per session/scan ID.
+
+    A session keeps the same browser between calls until it is released, so
+    navigate/input/click calls from one client share state while other
+    clients get their own browser. Browsers are health-checked before being
+    handed out and recycled after `max_uses` leases.
+
+    Each browser is bound to the proxy it was started with. A session asking
+    for another proxy (a scan running on another ZAP instance) gets an idle
+    browser with that proxy, or a new one, replacing an idle browser if the
+    pool is full.
+
+    On lease, the browser is set to block the URLs of the session's
+    blocklists (see request_filter), unless it already blocks those.
+    """
+
+    def __init__(self, size=POOL_SIZE, max_uses=POOL_MAX_USES, factory=create_driver, default_proxy=zap_proxy, filters=request_filters):
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self._factory = factory
+        self.default_proxy = default_proxy
+        self._filters = filters
+        self._idle = deque()
+        self._leases = {}
+        self._total = 0
+        self._cond = threading.Condition()
+        # Metrics
+        self._acquisitions = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._created = 0
+        self._recycled = 0
+        self._unhealthy = 0
+        self._timeouts = 0
+
+    def warm(self, count):
+        """Start browsers until `count` are idle (bounded by the pool size)."""
+        while True:
+            with self._cond:
+                if len(self._idle) >= count or self._total >= self.size:
+                    return
+                self._total += 1
+            pooled = self._create(self.default_proxy)
+            with self._cond:
+                self._idle.append(pooled)
+                self._cond.notify()
+
+    def acquire(self, session_id, timeout=POOL_ACQUIRE_TIMEOUT, proxy_url=None):
+        """
+        Returns the browser leased to `session_id`, leasing one going through
+        `proxy_url` (the pool's default proxy if None) if needed.
+        """
+        proxy_url = proxy_url or self.default_proxy
+        start = time.monotonic()
+        deadline = start + timeout
+        waited = False
+        while True:
+            replaced = None
+            with self._cond:
+                lease = self._leases.get(session_id)
+                if lease is not None:
+                    return lease.driver
+                pooled = self._take_idle(proxy_url)
+                create = pooled is None and self._total < self.size
+                if create:
+                    self._total += 1
+                elif pooled is None and self._idle:
+                    # Full pool, but an idle browser with another proxy can make room
+                    replaced = self._idle.popleft()
+                    create = True
+                elif pooled is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolExhaustedError(f"No browser available after {timeout}s (pool size {self.size})")
+                    waited = True
+                    self._cond.wait(remaining)
+                    continue
+
+            if replaced is not None:
+                self._quit(replaced)
+                with self._cond:
+                    self._recycled += 1
+            if create:
+                pooled = self._create(proxy_url)
+            elif not is_healthy(pooled.driver):
+                logger.warning("[pool] Discarding unhealthy browser")
+                self._discard(pooled, reason="unhealthy")
+                continue
+
+            with self._cond:
+                existing = self._leases.get(session_id)
+                if existing is not None:
+                    # Another call leased a browser for this session meanwhile
+                    self._idle.append(pooled)
+                    self._cond.notify()
+                    return existing.driver
+                self._leases[session_id] = pooled
+                elapsed = time.monotonic() - start
+                self._acquisitions += 1
+                self._wait_total += elapsed
+                self._wait_max = max(self._wait_max, elapsed)
+                if waited:
+                    self._waits += 1
+            self._apply_filters(pooled, session_id)
+            return pooled.driver
+
+    def _apply_filters(self, pooled, session_id):
+        patterns = self._filters.patterns(session_id)
+        if patterns == (pooled.blocked or []):
+            return  # Fresh browsers block nothing: no CDP call for unfiltered sessions
+        try:
+            apply_blocking(pooled.driver, patterns)
+            pooled.blocked = patterns
+        except Exception as e:
+            # A browser that cannot filter still works; the requests just reach ZAP
+            logger.warning(f"[pool] Could not set blocked URLs for session {session_id}: {e}")
+
+    def _take_idle(self, proxy_url):
+        # Called with the lock held
+        for pooled in self._idle:
+            if pooled.proxy_url == proxy_url:
+                self._idle.remove(pooled)
+                return pooled
+        return None
+
+    def get(self, session_id):
+        """Returns the browser leased to `session_id` without leasing a new one."""
+        with self._cond:
+            lease = self._leases.get(session_id)
+            return lease.driver if lease is not None else None
+
+    def release(self, session_id):
+        """Returns the session's browser to the pool, recycling it if worn out."""
+        with self._cond:
+            pooled = self._leases.pop(session_id, None)
+        if pooled is None:
+            return
+        pooled.uses += 1
+        if pooled.uses >= self.max_uses or not self._reset(pooled):
+            self._discard(pooled, reason="recycled")
+            return
+        with self._cond:
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    def shutdown(self):
+        """Quits every browser, leased or idle."""
+        with self._cond:
+            pooled_drivers = list(self._idle) + list(self._leases.values())
+            self._idle.clear()
+            self._leases.clear()
+        for pooled in pooled_drivers:
+            self._discard(pooled)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "max_uses": self.max_uses,
+                "alive": self._total,
+                "idle": len(self._idle),
+                "leased": len(self._leases),
+                "sessions": list(self._leases.keys()),
+                "acquisitions": self._acquisitions,
+                "waits": self._waits,
+                "avg_wait_ms": round(self._wait_total / self._acquisitions * 1000, 2) if self._acquisitions else 0.0,
+                "max_wait_ms": round(self._wait_max * 1000, 2),
+                "created": self._created,
+                "recycled": self._recycled,
+                "unhealthy": self._unhealthy,
+                "timeouts": self._timeouts,
+            }
+
+    def _create(self, proxy_url):
+        try:
+            pooled = PooledDriver(self._factory(proxy_url), proxy_url)
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._created += 1
+        return pooled
+
+    def _quit(self, pooled):
+        try:
+            quit_driver(pooled.driver)
+        except Exception as e:
+            logger.warning(f"[pool] Error quitting browser: {e}")
+
+    def _discard(self, pooled, reason=None):
+        self._quit(pooled)
+        with self._cond:
+            self._total -= 1
+            if reason == "unhealthy":
+                self._unhealthy += 1
+            elif reason == "recycled":
+                self._recycled += 1
+            self._cond.notify()
+
+    def _reset(self, pooled):
+        """
+        Clears browser state so the next session starts clean: cookies, cache,
+        the storage (localStorage, IndexedDB, service workers...) of every
+        origin the tab visited, and, by replacing the tabs with a new one,
+        sessionStorage and the navigation history. A browser that cannot be
+        reset is recycled.
+        """
+        driver = pooled.driver
+        try:
+            history = driver.execute_cdp_cmd("Page.getNavigationHistory", {})
+            origins = {_origin(entry["url"]) for entry in history.get("entries", [])} - {None}
+            for origin in origins:
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+            old_handles = driver.window_handles
+            driver.switch_to.new_window("tab")
+            fresh = driver.current_window_handle
+            for handle in old_handles:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(fresh)
+            pooled.blocked = None  # Blocked URLs were set on the closed tab
+            return True
+        except Exception as e:
+            logger.warning(f"[pool] Could not reset browser, recycling it: {e}")
+            return False
+
+pool = DriverPool()
+
 def selenium_startup():
-    global driver
-    if driver is None:
-        driver = create_driver()
-        
+    pool.warm(POOL_WARM)
+
 def selenium_shutdown():
-    global driver
-    if driver:
-            driver.quit()
-            driver = None
-    
-def get_driver():
-    global driver
-    if driver is None:
-        driver = create_driver()
-    return driver
+    pool.shutdown()
+
+def get_driver(session_id=DEFAULT_SESSION, proxy_url=None):
+    return pool.acquire(session_id or DEFAULT_SESSION, proxy_url=proxy_url)
+
+def release_driver(session_id=DEFAULT_SESSION):
+    pool.release(session_id or DEFAULT_SESSION)
+    snapshot_cache.forget(session_id or DEFAULT_SESSION)
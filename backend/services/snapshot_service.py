@@ -0,0 +1,127 @@
+from collections import OrderedDict
+import json
+import threading
+import time
+from config.settings import settings
+
+SNAPSHOT_CACHE_TTL = float(settings.get("SNAPSHOT_CACHE_TTL", "300"))  # Seconds a page snapshot stays valid
+SNAPSHOT_CACHE_MAX_ENTRIES = int(settings.get("SNAPSHOT_CACHE_MAX_ENTRIES", "500"))
+
+# Summary sections compared between two visits of the same page
+SUMMARY_SECTIONS = ("links", "inputs", "buttons", "forms")
+
+# 53-bit hash (cyrb53) of the serialized DOM, computed in the browser so the
+# page source never has to be transferred just to know whether it changed
+PAGE_HASH_SCRIPT = """
+const str = document.documentElement ? document.documentElement.outerHTML : '';
+let h1 = 0xdeadbeef, h2 = 0x41c6ce57;
+for (let i = 0; i < str.length; i++) {
+    const ch = str.charCodeAt(i);
+    h1 = Math.imul(h1 ^ ch, 2654435761);
+    h2 = Math.imul(h2 ^ ch, 1597334677);
+}
+h1 = Math.imul(h1 ^ (h1 >>> 16), 2246822507) ^ Math.imul(h2 ^ (h2 >>> 13), 3266489909);
+h2 = Math.imul(h2 ^ (h2 >>> 16), 2246822507) ^ Math.imul(h1 ^ (h1 >>> 13), 3266489909);
+return (4294967296 * (2097151 & h2) + (h1 >>> 0)).toString(16) + ':' + str.length;
+"""
+
+def page_hash(driver):
+    """Returns the content hash of the page currently loaded in `driver`."""
+    return driver.execute_script(PAGE_HASH_SCRIPT)
+
+def diff_summaries(old, new):
+    """
+    Compares two page summaries section by section. Returns the added and
+    removed entries of each section that changed (empty dict if none did).
+    """
+    diff = {}
+    for section in SUMMARY_SECTIONS:
+        before = {json.dumps(item, sort_keys=True): item for item in old.get(section, [])}
+        after = {json.dumps(item, sort_keys=True): item for item in new.get(section, [])}
+        added = [item for key, item in after.items() if key not in before]
+        removed = [item for key, item in before.items() if key not in after]
+        if added or removed:
+            diff[section] = {"added": added, "removed": removed}
+    return diff
+
+class PageSnapshot:
+    """Summary of a page as extracted on the last visit, plus the hashes used to validate it."""
+
+    def __init__(self, url, final_url, load_hash, settled_hash, summary):
+        self.url = url
+        self.final_url = final_url  # URL after redirects
+        self.load_hash = load_hash  # DOM right after the document was ready
+        self.settled_hash = settled_hash  # DOM after popups were closed
+        self.summary = summary
+        self.created_at = time.monotonic()
+
+class SnapshotCache:
+    """
+    Per-session LRU cache of page summaries keyed by (session_id, url), with a TTL.
+
+    Entries are only trusted while the live DOM hash matches, so a stale
+    entry costs a re-extraction, never a wrong answer. Thread-safe: it is
+    used from the browser executor.
+    """
+
+    def __init__(self, ttl=SNAPSHOT_CACHE_TTL, max_entries=SNAPSHOT_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Metrics
+        self.hits = 0  # Visits answered without reloading the page
+        self.unchanged = 0  # Reloads whose DOM matched the snapshot (extraction skipped)
+        self.misses = 0
+
+    def get(self, session_id, url):
+        with self._lock:
+            snapshot = self._entries.get((session_id, url))
+            if snapshot is None:
+                return None
+            if time.monotonic() - snapshot.created_at > self.ttl:
+                del self._entries[(session_id, url)]
+                return None
+            self._entries.move_to_end((session_id, url))
+            return snapshot
+
+    def put(self, session_id, snapshot):
+        with self._lock:
+            self._entries[(session_id, snapshot.url)] = snapshot
+            self._entries.move_to_end((session_id, snapshot.url))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record(self, outcome):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def mark_dirty(self, session_id):
+        """
+        Forces the next visit of each page of the session to reload it. Called
+        after typing or clicking: form values and JS state are not part of the
+        DOM hash. Snapshots are kept as the baseline for diffs.
+        """
+        with self._lock:
+            for key, snapshot in self._entries.items():
+                if key[0] == session_id:
+                    snapshot.settled_hash = None
+
+    def forget(self, session_id):
+        """Drops every snapshot of a session."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == session_id]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "unchanged": self.unchanged,
+                "misses": self.misses,
+            }
+
+snapshot_cache = SnapshotCache()
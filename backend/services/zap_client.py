@@ -0,0 +1,237 @@
+import asyncio
+import logging
+import random
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying: ZAP is busy or a proxy in front of it hiccuped
+RETRY_STATUS = {502, 503, 504}
+# Errors raised before the request was sent: the only ones an action (which may
+# start a scan or create a context) can be retried on without running it twice
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+class ZAPError(Exception):
+    """Raised when the ZAP API answers with an error or cannot be reached."""
+
+def _clean_params(params):
+    # ZAP expects booleans as "true"/"false" and ignores missing optional params
+    cleaned = {}
+    for key, value in params.items():
+        if value is None:
+            continue
+        cleaned[key] = str(value).lower() if isinstance(value, bool) else value
+    return cleaned
+
+class AsyncZAPClient:
+    """
+    Asyncio client for the ZAP JSON/OTHER API.
+
+    Uses one httpx.AsyncClient with a keep-alive connection pool, so polling
+    many scans reuses a handful of connections instead of opening one per call.
+    View and OTHER calls are retried on transport errors and 502/503/504
+    answers with exponential backoff and jitter. Actions are not idempotent,
+    so they are only retried when the request never reached ZAP: a timed-out
+    spider/scan may have started the scan anyway.
+    """
+
+    def __init__(self, api_url, api_key=None, timeout=30.0, retries=3, max_connections=50, backoff=0.5):
+        self.api_url = api_url.rstrip("/")
+        self.api_key = api_key
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self._timeout = httpx.Timeout(timeout, connect=min(timeout, 5.0))
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None or self._client.is_closed:
+            headers = {"X-ZAP-API-Key": self.api_key} if self.api_key else {}
+            self._client = httpx.AsyncClient(timeout=self._timeout, limits=self._limits, headers=headers)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _request(self, fmt, component, kind, name, params):
+        url = f"{self.api_url}/{fmt}/{component}/{kind}/{name}/"
+        params = _clean_params(params)
+        if self.api_key:
+            params["apikey"] = self.api_key
+        idempotent = kind != "action"
+        for attempt in range(self.retries + 1):
+            try:
+                response = await self._get_client().get(url, params=params)
+                if response.status_code not in RETRY_STATUS or not idempotent:
+                    break
+                error = ZAPError(f"ZAP answered {response.status_code} for {component}/{name}")
+            except httpx.TransportError as e:
+                error = ZAPError(f"ZAP request {component}/{name} failed: {e}")
+                if not idempotent and not isinstance(e, NOT_SENT_ERRORS):
+                    raise error
+            if attempt == self.retries:
+                raise error
+            delay = self.backoff * (2 ** attempt) * (0.5 + random.random())
+            logger.warning(f"[zap] {error} - retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("message", response.text)
+            except ValueError:
+                detail = response.text
+            raise ZAPError(f"ZAP API error on {component}/{name}: {detail}")
+        return response
+
+    async def view(self, component, name, **params):
+        return (await self._request("JSON", component, "view", name, params)).json()
+
+    async def action(self, component, name, **params):
+        return (await self._request("JSON", component, "action", name, params)).json()
+
+    async def other(self, component, name, **params):
+        return (await self._request("OTHER", component, "other", name, params)).text
+
+    async def stream_other(self, component, name, chunk_size=65536, **params):
+        """Streams an OTHER endpoint (e.g. a report) in chunks instead of loading it into memory."""
+        params = _clean_params(params)
+        if self.api_key:
+            params["apikey"] = self.api_key
+        url = f"{self.api_url}/OTHER/{component}/other/{name}/"
+        try:
+            async with self._get_client().stream("GET", url, params=params, timeout=None) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    raise ZAPError(f"ZAP API error on {component}/{name}: {response.text}")
+                async for chunk in response.aiter_bytes(chunk_size):
+                    yield chunk
+        except httpx.TransportError as e:
+            raise ZAPError(f"ZAP request {component}/{name} failed: {e}")
+
+    # Spider
+    async def spider_scan(self, url, max_children=None, recurse=None, context_name=None, subtree_only=None):
+        data = await self.action("spider", "scan", url=url, maxChildren=max_children, recurse=recurse,
+                                 contextName=context_name, subtreeOnly=subtree_only)
+        return data["scan"]
+
+    async def spider_status(self, scan_id):
+        return int((await self.view("spider", "status", scanId=scan_id))["status"])
+
+    async def spider_results(self, scan_id):
+        return (await self.view("spider", "results", scanId=scan_id))["results"]
+
+    async def spider_stop(self, scan_id):
+        return await self.action("spider", "stop", scanId=scan_id)
+
+    # AJAX Spider
+    async def ajax_spider_scan(self, url, in_scope=None, context_name=None, subtree_only=None):
+        return await self.action("ajaxSpider", "scan", url=url, inScope=in_scope,
+                                 contextName=context_name, subtreeOnly=subtree_only)
+
+    async def ajax_spider_status(self):
+        return (await self.view("ajaxSpider", "status"))["status"]
+
+    async def ajax_spider_number_of_results(self):
+        return int((await self.view("ajaxSpider", "numberOfResults"))["numberOfResults"])
+
+    async def ajax_spider_stop(self):
+        return await self.action("ajaxSpider", "stop")
+
+    # Active scan
+    async def ascan_scan(self, url, recurse=None, in_scope_only=None, scan_policy_name=None,
+                         method=None, post_data=None, context_id=None):
+        data = await self.action("ascan", "scan", url=url, recurse=recurse, inScopeOnly=in_scope_only,
+                                 scanPolicyName=scan_policy_name, method=method, postData=post_data,
+                                 contextId=context_id)
+        return data["scan"]
+
+    async def ascan_status(self, scan_id):
+        return int((await self.view("ascan", "status", scanId=scan_id))["status"])
+
+    async def ascan_stop(self, scan_id):
+        return await self.action("ascan", "stop", scanId=scan_id)
+
+    # Contexts
+    async def context_new_context(self, context_name):
+        return int((await self.action("context", "newContext", contextName=context_name))["contextId"])
+
+    async def context_include_in_context(self, context_name, regex):
+        return await self.action("context", "includeInContext", contextName=context_name, regex=regex)
+
+    async def context_remove_context(self, context_name):
+        return await self.action("context", "removeContext", contextName=context_name)
+
+    # HTTP sessions
+    async def http_sessions_create_empty_session(self, site, session=None):
+        return await self.action("httpSessions", "createEmptySession", site=site, session=session)
+
+    async def http_sessions_set_active_session(self, site, session):
+        return await self.action("httpSessions", "setActiveSession", site=site, session=session)
+
+    async def http_sessions_remove_session(self, site, session):
+        return await self.action("httpSessions", "removeSession", site=site, session=session)
+
+    async def http_sessions_add_session_token(self, site, session_token):
+        return await self.action("httpSessions", "addSessionToken", site=site, sessionToken=session_token)
+
+    async def http_sessions_set_session_token_value(self, site, session, session_token, token_value):
+        return await self.action("httpSessions", "setSessionTokenValue", site=site, session=session,
+                                 sessionToken=session_token, tokenValue=token_value)
+
+    # Replacer (rewrites requests going through ZAP, including its own)
+    async def replacer_add_rule(self, description, match_type, match_string, replacement, url=None, match_regex=False):
+        return await self.action("replacer", "addRule", description=description, enabled=True, matchType=match_type,
+                                 matchRegex=match_regex, matchString=match_string, replacement=replacement, url=url)
+
+    async def replacer_remove_rule(self, description):
+        return await self.action("replacer", "removeRule", description=description)
+
+    # Network (local proxies)
+    async def network_add_local_server(self, address, port, api=False, proxy=True):
+        return await self.action("network", "addLocalServer", address=address, port=port, api=api, proxy=proxy)
+
+    async def network_remove_local_server(self, address, port):
+        return await self.action("network", "removeLocalServer", address=address, port=port)
+
+    # Alerts
+    async def alert_delete_alerts(self, context_name=None, baseurl=None):
+        return await self.action("alert", "deleteAlerts", contextName=context_name, baseurl=baseurl)
+
+    # Core
+    async def core_version(self):
+        return (await self.view("core", "version"))["version"]
+
+    async def core_alerts(self, baseurl=None, start=None, count=None, risk_id=None):
+        data = await self.view("core", "alerts", baseurl=baseurl, start=start, count=count, riskId=risk_id)
+        return data["alerts"]
+
+    async def core_number_of_alerts(self, baseurl=None, risk_id=None):
+        data = await self.view("core", "numberOfAlerts", baseurl=baseurl, riskId=risk_id)
+        return int(data["numberOfAlerts"])
+
+    async def core_number_of_messages(self, baseurl=None):
+        return int((await self.view("core", "numberOfMessages", baseurl=baseurl))["numberOfMessages"])
+
+    async def core_messages(self, baseurl=None, start=None, count=None):
+        return (await self.view("core", "messages", baseurl=baseurl, start=start, count=count))["messages"]
+
+    async def core_urls(self, baseurl=None):
+        return (await self.view("core", "urls", baseurl=baseurl))["urls"]
+
+    async def core_access_url(self, url, follow_redirects=None):
+        return await self.action("core", "accessUrl", url=url, followRedirects=follow_redirects)
+
+    async def core_delete_site_node(self, url, method=None, post_data=None):
+        return await self.action("core", "deleteSiteNode", url=url, method=method, postData=post_data)
+
+    # Reports
+    async def core_htmlreport(self):
+        return await self.other("core", "htmlreport")
+
+    async def core_xmlreport(self):
+        return await self.other("core", "xmlreport")
+
+    async def core_jsonreport(self):
+        return await self.other("core", "jsonreport")
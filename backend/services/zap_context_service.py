@@ -0,0 +1,158 @@
+from urllib.parse import urlsplit
+import asyncio
+import logging
+import re
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# "context": remove the scan's context, HTTP session and proxy when it ends. The site tree
+# and alerts stay in ZAP, and they are most of its memory: this does not reclaim it.
+# "site": also delete its site tree and alerts from ZAP (they stay in /scans/{scan_id}/alerts while indexed).
+ZAP_SCAN_CLEANUP = settings.get("ZAP_SCAN_CLEANUP", "context")
+# Port range for per-scan ZAP proxies, e.g. "8090-8099". Empty: scans share the instance's proxy.
+ZAP_SCAN_PROXY_PORTS = settings.get("ZAP_SCAN_PROXY_PORTS", "")
+
+def _port_range(value):
+    if not value:
+        return []
+    first, _, last = value.partition("-")
+    return list(range(int(first), int(last or first) + 1))
+
+def site_of(url):
+    """ZAP's site key (host:port) of `url`."""
+    parts = urlsplit(url)
+    return f"{parts.hostname}:{parts.port or (443 if parts.scheme == 'https' else 80)}"
+
+class ScanContext:
+    """The ZAP objects that belong to one scan: context, HTTP session and optional dedicated proxy."""
+
+    def __init__(self, scan_id, target_url, instance):
+        self.scan_id = scan_id
+        self.target_url = target_url
+        self.instance = instance
+        self.name = f"scan-{scan_id}"
+        self.context_id = None
+        self.site = site_of(target_url)
+        self.session = None
+        self.proxy_port = None
+        self.proxy_url = instance.proxy_url
+        self.site_lock = None
+
+    def stats(self):
+        return {
+            "context": self.name,
+            "context_id": self.context_id,
+            "session": self.session,
+            "proxy_url": self.proxy_url,
+        }
+
+class ScanContextManager:
+    """
+    Creates and cleans up the per-scan ZAP context (scoped to the target's
+    origin), HTTP session and, if ZAP_SCAN_PROXY_PORTS is set, a dedicated
+    proxy port for the scan's browser. All state is touched from the event
+    loop only.
+
+    ZAP keeps one active HTTP session per site, not per context, so scans of
+    the same site on the same instance would switch each other's session:
+    they run one after the other, each holding its site from open to close.
+    """
+
+    def __init__(self, cleanup=ZAP_SCAN_CLEANUP, proxy_ports=_port_range(ZAP_SCAN_PROXY_PORTS)):
+        self.cleanup = cleanup
+        self.proxy_ports = proxy_ports
+        self._contexts = {}
+        self._ports_in_use = {}  # Instance name -> ports taken
+        self._sites = {}  # (instance name, site) -> [lock, scans holding or waiting for it]
+
+    def get(self, scan_id):
+        return self._contexts.get(scan_id)
+
+    async def open(self, scan_id, target_url, instance):
+        context = ScanContext(scan_id, target_url, instance)
+        self._contexts[scan_id] = context
+        await self._take_site(context)
+        zap = instance.client
+        parts = urlsplit(target_url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+
+        context.context_id = await zap.context_new_context(context.name)
+        await zap.context_include_in_context(context.name, re.escape(origin) + ".*")
+
+        await self._open_proxy(context)
+
+        try:
+            # The site must be in the tree before it can have sessions
+            await zap.core_access_url(target_url, follow_redirects=True)
+            await zap.http_sessions_create_empty_session(context.site, context.name)
+            context.session = context.name
+            await zap.http_sessions_set_active_session(context.site, context.name)
+        except Exception as e:
+            logger.warning(f"[zap] Could not create HTTP session for scan {scan_id}: {e}")
+        return context
+
+    async def _take_site(self, context):
+        key = (context.instance.name, context.site)
+        entry = self._sites.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        if entry[0].locked():
+            logger.info(f"[zap] Scan {context.scan_id} waits for the running scan of {context.site} on {context.instance.name}")
+        try:
+            await entry[0].acquire()
+        except BaseException:
+            self._leave_site(key)
+            raise
+        context.site_lock = entry[0]
+
+    def _leave_site(self, key):
+        entry = self._sites[key]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._sites[key]
+
+    async def _open_proxy(self, context):
+        in_use = self._ports_in_use.setdefault(context.instance.name, set())
+        free = [port for port in self.proxy_ports if port not in in_use]
+        if not free or not context.instance.proxy_url:
+            return
+        host = urlsplit(context.instance.proxy_url).hostname
+        in_use.add(free[0])  # Taken before awaiting so concurrent scans pick other ports
+        try:
+            await context.instance.client.network_add_local_server(host, free[0])
+        except Exception as e:
+            in_use.discard(free[0])
+            logger.warning(f"[zap] Could not open proxy port {free[0]} for scan {context.scan_id}: {e}")
+            return
+        context.proxy_port = free[0]
+        context.proxy_url = f"{urlsplit(context.instance.proxy_url).scheme}://{host}:{free[0]}"
+
+    async def close(self, scan_id):
+        """Removes what the scan created in ZAP. Errors are logged, never raised."""
+        context = self._contexts.pop(scan_id, None)
+        if context is None:
+            return
+        zap = context.instance.client
+        steps = []
+        if context.proxy_port is not None:
+            host = urlsplit(context.instance.proxy_url).hostname
+            steps.append(("proxy", zap.network_remove_local_server(host, context.proxy_port)))
+            self._ports_in_use[context.instance.name].discard(context.proxy_port)
+        if context.session:
+            steps.append(("session", zap.http_sessions_remove_session(context.site, context.session)))
+        if self.cleanup == "site":
+            parts = urlsplit(context.target_url)
+            steps.append(("alerts", zap.alert_delete_alerts(context_name=context.name)))
+            steps.append(("site tree", zap.core_delete_site_node(f"{parts.scheme}://{parts.netloc}")))
+        if context.context_id is not None:
+            steps.append(("context", zap.context_remove_context(context.name)))
+        for label, step in steps:
+            try:
+                await step
+            except Exception as e:
+                logger.warning(f"[zap] Could not remove {label} of scan {scan_id}: {e}")
+        if context.site_lock is not None:
+            context.site_lock.release()
+            self._leave_site((context.instance.name, context.site))
+
+scan_contexts = ScanContextManager()
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from services.zap_client import ZAPError
+
+logger = logging.getLogger(__name__)
+
+def parse_instances(value):
+    """
+    Parses ZAP_INSTANCES: comma-separated `url` or `name=url` entries, e.g.
+    "http://127.0.0.1:8080,zap2=http://127.0.0.1:8081". ZAP serves its API on
+    its proxy port, so each URL is used for both. Returns (name, url) pairs.
+    """
+    instances = []
+    for i, entry in enumerate(part.strip() for part in value.split(",")):
+        if not entry:
+            continue
+        name, separator, url = entry.partition("=")
+        if not separator or "://" in name:
+            name, url = f"zap{i + 1}", entry
+        instances.append((name.strip(), url.strip()))
+    return instances
+
+class ZapInstance:
+    """A ZAP daemon: its API client, the proxy browsers go through and the scans assigned to it."""
+
+    def __init__(self, name, client, proxy_url, max_scans=2):
+        self.name = name
+        self.client = client
+        self.proxy_url = proxy_url
+        self.max_scans = max(1, max_scans)
+        self.scans = set()
+        self.healthy = True
+        # ZAP runs a single AJAX spider per daemon: scans sharing the instance take turns
+        self.ajax_spider_lock = asyncio.Lock()
+
+    @property
+    def load(self):
+        return len(self.scans) / self.max_scans
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "api_url": self.client.api_url,
+            "proxy_url": self.proxy_url,
+            "max_scans": self.max_scans,
+            "scans": sorted(self.scans),
+            "load": round(self.load, 2),
+            "healthy": self.healthy,
+            "ajax_spider_busy": self.ajax_spider_lock.locked(),
+        }
+
+class ZapRegistry:
+    """
+    The ZAP daemons available for scans, and which scan runs on which.
+
+    `assign` picks the healthy instance with the lowest load (assigned scans
+    over capacity); every ZAP call of the scan then goes through
+    `client_for(scan_id)` and its browser proxies through the instance's
+    `proxy_url`. All state is touched from the event loop only.
+    """
+
+    def __init__(self, instances, health_timeout=5.0):
+        if not instances:
+            raise ValueError("At least one ZAP instance is required")
+        self.instances = {instance.name: instance for instance in instances}
+        self.default = instances[0]
+        self.health_timeout = health_timeout
+        self._assignments = {}
+
+    def capacity(self):
+        return sum(instance.max_scans for instance in self.instances.values())
+
+    async def check(self, instance):
+        try:
+            await asyncio.wait_for(instance.client.core_version(), timeout=self.health_timeout)
+            instance.healthy = True
+        except Exception as e:
+            if instance.healthy:
+                logger.warning(f"[zap] Instance {instance.name} is not answering: {e}")
+            instance.healthy = False
+        return instance.healthy
+
+    async def assign(self, scan_id):
+        """Assigns `scan_id` to the least loaded healthy instance and returns it."""
+        if scan_id in self._assignments:
+            return self._assignments[scan_id]
+        # Free slots first, then least loaded; ties go to the instance listed first
+        for instance in sorted(self.instances.values(), key=lambda i: (i.load >= 1, i.load)):
+            if len(self.instances) == 1 or await self.check(instance):
+                instance.scans.add(scan_id)
+                self._assignments[scan_id] = instance
+                return instance
+        raise ZAPError("No ZAP instance is available")
+
+    def release(self, scan_id):
+        instance = self._assignments.pop(scan_id, None)
+        if instance is not None:
+            instance.scans.discard(scan_id)
+        return instance
+
+    def get(self, name):
+        return self.instances.get(name)
+
+    def assigned(self, scan_id):
+        """The instance running `scan_id`, or None if it is not running."""
+        return self._assignments.get(scan_id)
+
+    def for_scan(self, scan_id):
+        """The instance running `scan_id`, or the default one for calls outside a scan."""
+        return self._assignments.get(scan_id, self.default)
+
+    def client_for(self, scan_id):
+        return self.for_scan(scan_id).client
+
+    def stats(self):
+        return {"capacity": self.capacity(), "instances": [instance.stats() for instance in self.instances.values()]}
+
+    async def aclose(self):
+        await asyncio.gather(*(instance.client.aclose() for instance in self.instances.values()), return_exceptions=True)
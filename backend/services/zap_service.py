@@ -1,59 +1,153 @@
-from zapv2 import ZAPv2
 from config.logs_config import setup_logger
+from services.zap_client import AsyncZAPClient
+from services.zap_registry import ZapRegistry, ZapInstance, parse_instances
+from services.progress_service import broker, poll_progress
+from services.frontier_service import frontiers
+from services.zap_context_service import scan_contexts
 import asyncio
-import time
-from dotenv import load_dotenv
-import os
+from config.settings import settings
 
 # Setup logger
 logger = setup_logger()
 
-# Load environment variables
-load_dotenv()
+apiKey = settings.get("ZAP_API_KEY")
+apiUrl = settings.get("ZAP_API_URL") or settings.get("ZAP_PROXY") or "http://127.0.0.1:8080"
 
-apiKey = os.getenv("ZAP_API_KEY")
+ZAP_MAX_SCANS_PER_INSTANCE = int(settings.get("ZAP_MAX_SCANS_PER_INSTANCE", "2"))  # Scans running at once on one ZAP daemon
 
-# Initialize ZAP API
-zap = ZAPv2(apikey=apiKey)
+def create_zap_client(api_url):
+    # Asyncio client with a keep-alive connection pool
+    return AsyncZAPClient(
+        api_url,
+        apiKey,
+        timeout=float(settings.get("ZAP_API_TIMEOUT", "30")),
+        retries=int(settings.get("ZAP_API_RETRIES", "3")),
+        max_connections=int(settings.get("ZAP_API_MAX_CONNECTIONS", "50")),
+    )
 
-async def run_zap_spider(target_url):
+# ZAP daemons scans are spread across. Without ZAP_INSTANCES there is a single one: ZAP_API_URL, proxied at ZAP_PROXY
+zap_registry = ZapRegistry(
+    [ZapInstance(name, create_zap_client(url), url, ZAP_MAX_SCANS_PER_INSTANCE)
+     for name, url in parse_instances(settings.get("ZAP_INSTANCES", ""))]
+    or [ZapInstance("default", create_zap_client(apiUrl), settings.get("ZAP_PROXY"), ZAP_MAX_SCANS_PER_INSTANCE)]
+)
+
+# Initialize ZAP API: client of the default instance, for calls made outside a scan
+zap = zap_registry.default.client
+
+async def run_zap_spider(target_url, scan_id=None):
+    zap = zap_registry.client_for(scan_id)
     logger.info("[*] Starting traditional Spider...")
 
-    spider_id = zap.spider.scan(target_url)
-    timeout = time.time() + 60  # 1 minuto de timeout
-    while int(zap.spider.status(spider_id)) < 100:
-        if time.time() > timeout:
-            logger.warning("[!] Traditional Spider timeout reached (1 min).")
-            break
-        await asyncio.sleep(2)
-    logger.info("[*] Spider completed or timed out.")
+    context = scan_contexts.get(scan_id)
+    context_name = context.name if context else None
+    spider_id = await zap.spider_scan(target_url, context_name=context_name)
 
-    logger.info("[*] Starting AJAX Spider...")
-    zap.ajaxSpider.scan(target_url)
-    timeout = time.time() + 60  # 1 minuto de timeout
-    while True:
-        status = zap.ajaxSpider.status
-        if status == 'stopped':
+    async def spider_state():
+        percent = await zap.spider_status(spider_id)
+        return {"percent": percent, "done": percent >= 100}
+
+    state = await poll_progress(spider_state, scan_id, "spider", timeout=60)  # 1 minuto de timeout
+    if state.get("timed_out"):
+        logger.warning("[!] Traditional Spider timeout reached (1 min).")
+    spider_urls = await zap.spider_results(spider_id)
+    urls_found = len(spider_urls)
+    frontier = frontiers.get(scan_id)
+    if frontier is not None:
+        for spider_url in spider_urls:
+            frontier.mark_visited(spider_url, "spider")
+    broker.publish(scan_id, "progress", phase="spider", percent=state["percent"], done=True, urls_found=urls_found)
+    logger.info(f"[*] Spider completed or timed out. {urls_found} URLs found.")
+
+    # The AJAX spider is global to the ZAP daemon: another scan on the same instance
+    # would overwrite it, and status/stop would act on its crawl, so wait for our turn
+    instance = zap_registry.for_scan(scan_id)
+    async with instance.ajax_spider_lock:
+        logger.info("[*] Starting AJAX Spider...")
+        await zap.ajax_spider_scan(target_url, context_name=context_name)
+
+        async def ajax_spider_state():
+            status = await zap.ajax_spider_status()
+            return {"status": status, "urls_found": await zap.ajax_spider_number_of_results(), "done": status == 'stopped'}
+
+        finished = False
+        try:
+            state = await poll_progress(ajax_spider_state, scan_id, "ajax_spider", timeout=60)  # 1 minuto de timeout
+            finished = not state.get("timed_out")
+        finally:
+            if not finished:
+                # Do not hand the instance over with the crawl still running
+                await zap.ajax_spider_stop()
+        if finished:
             logger.info("[*] AJAX Spider completed!")
-            break
-        if time.time() > timeout:
+        else:
             logger.warning("[!] AJAX Spider timeout reached (1 min).")
+    if frontier is not None:
+        # Everything ZAP has seen so far, which includes the AJAX spider's requests
+        for known_url in await zap.core_urls(baseurl=target_url):
+            frontier.mark_visited(known_url, "ajax_spider")
+
+async def feed_frontier_to_zap(scan_id, concurrency=4):
+    """
+    Requests through ZAP every in-scope URL of the scan's frontier that no
+    crawler visited, respecting the per-host rate limit, so the active scan
+    covers them. Returns how many URLs were sent.
+    """
+    frontier = frontiers.get(scan_id)
+    if frontier is None:
+        return 0
+    zap = zap_registry.client_for(scan_id)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def access(url):
+        async with semaphore:
+            await frontier.throttle(url)
+            try:
+                await zap.core_access_url(url, follow_redirects=True)
+                frontier.mark_visited(url)
+                return True
+            except Exception as e:
+                logger.warning(f"[!] ZAP could not access {url}: {e}")
+                return False
+
+    sent = 0
+    while True:
+        urls = frontier.take(100)
+        if not urls:
             break
-        await asyncio.sleep(2)
+        sent += sum(await asyncio.gather(*(access(url) for url in urls)))
+    broker.publish(scan_id, "progress", phase="frontier", urls_sent=sent, **frontier.stats())
+    logger.info(f"[*] {sent} pending frontier URLs sent to ZAP.")
+    return sent
 
-async def run_zap_scan(target_url):
+async def run_zap_scan(target_url, scan_id=None):
+    zap = zap_registry.client_for(scan_id)
     logger.info("[*] Starting Active Scan...")
-    active_scan_id = zap.ascan.scan(target_url)
-    while int(zap.ascan.status(active_scan_id)) < 100:
-        await asyncio.sleep(5)
+    context = scan_contexts.get(scan_id)
+    active_scan_id = await zap.ascan_scan(target_url, context_id=context.context_id if context else None)
+
+    async def active_scan_state():
+        percent = await zap.ascan_status(active_scan_id)
+        alerts = await zap.core_number_of_alerts(baseurl=target_url)
+        return {"percent": percent, "alerts": alerts, "done": percent >= 100}
+
+    await poll_progress(active_scan_state, scan_id, "active_scan", max_interval=10.0)
     logger.info("[*] Active Scan completed!")
 
     logger.info("[*] Full scan completed successfully!")
 
-    
-
-async def create_zap_report(target_url):
+async def create_zap_report(target_url=None, client=None):
+    """ZAP's HTML report, from `client` (default: the default instance)."""
     logger.info("[*] Creating report")
-    report_html = zap.core.htmlreport()
+    report_html = await (client or zap).core_htmlreport()
+    logger.info("[*] Report saved!")
+    return report_html
+
+async def download_zap_report(path, report_format="xml", client=None):
+    """Streams ZAP's `xml`, `html` or `json` report from `client` (default: the default instance) straight to `path`."""
+    logger.info(f"[*] Downloading {report_format} report")
+    with open(path, "wb") as file:
+        async for chunk in (client or zap).stream_other("core", f"{report_format}report"):
+            file.write(chunk)
     logger.info("[*] Report saved!")
-    return report_html
\ No newline at end of file
+    return path
@@ -1,75 +1,227 @@
-from bs4 import BeautifulSoup
+from html.parser import HTMLParser
 from urllib.parse import urljoin
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-
-def get_html(soup, base_url):
-    links = []
-    inputs = []
-    buttons = []
-    forms = []
-
-    for el in soup.find_all(["a", "input", "button", "form"]):
-        if el.name == "a":
-            href = el.get("href")
-            text = el.get_text().strip()
+from config.settings import settings
+import json
+
+# lxml is optional: when it is missing the stdlib streaming parser below is used
+try:
+    from lxml import etree as lxml_etree
+    from lxml import html as lxml_html
+except ImportError:
+    lxml_etree = lxml_html = None
+
+# Elements whose text is not page text (BeautifulSoup's get_text skips it too)
+NON_TEXT_TAGS = ("script", "style")
+
+class _PageStructure:
+    """
+    Accumulates the links/inputs/buttons/forms summary while tags are visited
+    once, in document order. Links and buttons take their place when they
+    open, so nested ones keep that order; their text is filled in when they
+    close.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.links = []
+        self.inputs = []
+        self.buttons = []
+        self.forms = []
+        self._forms = []  # Forms still open at the current position
+
+    def start(self, tag, attrs):
+        """Handles an opening tag. Returns the entry whose text must be collected, if any."""
+        if tag == "a":
+            href = attrs.get("href")
             # Ensure the href is absolute
             if href:
-                href = urljoin(base_url, href)  # Convert to absolute URL
-            # Guardamos solo si tiene href y texto
-            if href or text:
-                links.append({
-                    "href": href,
-                    "text": text
-                })
-
-        elif el.name == "input":
-            input_type = el.get("type")
-            input_name = el.get("name")
-            input_id = el.get("id")
-            input_value = el.get("value")
+                href = urljoin(self.base_url, href)
+            entry = {"href": href, "text": ""}
+            self.links.append(entry)
+            return entry
+        if tag == "input":
+            if attrs.get("name"):
+                for form in self._forms:
+                    form["fields"].append(attrs.get("name"))
             # Guardamos solo si tiene ID o NAME
-            if input_id or input_name:
-                inputs.append({
-                    "type": input_type,
-                    "name": input_name,
-                    "id": input_id,
-                    "value": input_value
+            if attrs.get("id") or attrs.get("name"):
+                self.inputs.append({
+                    "type": attrs.get("type"),
+                    "name": attrs.get("name"),
+                    "id": attrs.get("id"),
+                    "value": attrs.get("value")
                 })
+            return None
+        if tag == "button":
+            entry = {"type": attrs.get("type"), "name": attrs.get("name"), "text": ""}
+            self.buttons.append(entry)
+            return entry
+        if tag == "form":
+            action = attrs.get("action")
+            if action:
+                action = urljoin(self.base_url, action)
+            form = {"action": action, "method": attrs.get("method"), "fields": []}
+            # Guardamos aunque no haya fields (algunos forms no tienen inputs directos)
+            self.forms.append(form)
+            self._forms.append(form)
+        return None
 
-        elif el.name == "button":
-            button_type = el.get("type")
-            button_name = el.get("name")
-            button_text = el.get_text().strip()
+    def end(self, tag, entry):
+        """Handles a closing tag with the entry returned by start() and its collected text."""
+        if tag == "form":
+            if self._forms:
+                self._forms.pop()
+        elif tag in ("a", "button"):
+            entry["text"] = entry["text"].strip()
+
+    def summary(self):
+        return {
+            # Guardamos solo si tiene href y texto
+            "links": [link for link in self.links if link["href"] or link["text"]],
+            "inputs": self.inputs,
             # Guardamos solo si tiene texto o nombre
-            if button_text or button_name:
-                buttons.append({
-                    "type": button_type,
-                    "name": button_name,
-                    "text": button_text
-                })
+            "buttons": [button for button in self.buttons if button["text"] or button["name"]],
+            "forms": self.forms,
+        }
 
-        elif el.name == "form":
-            form_action = el.get("action")
-            form_method = el.get("method")
-            form_fields = [input_el.get("name") for input_el in el.find_all("input") if input_el.get("name")]
-            # Ensure the action is absolute
-            if form_action:
-                form_action = urljoin(base_url, form_action)  # Convert to absolute URL
-            # Guardamos aunque no haya fields (algunos forms no tienen inputs directos)
-            forms.append({
-                "action": form_action,
-                "method": form_method,
-                "fields": form_fields
-            })
-
-    summary = {
-        "links": links,
-        "inputs": inputs,
-        "buttons": buttons,
-        "forms": forms
+class _StreamingExtractor(HTMLParser):
+    """Stdlib fallback: one streaming pass over the HTML without building a tree."""
+
+    TEXT_TAGS = ("a", "button")
+
+    def __init__(self, base_url):
+        super().__init__(convert_charrefs=True)
+        self.page = _PageStructure(base_url)
+        self._open = []  # (tag, entry) for open a/button/form elements
+        self._non_text = 0  # Open script/style elements
+
+    def handle_starttag(self, tag, attrs):
+        if tag in NON_TEXT_TAGS:
+            self._non_text += 1
+            return
+        entry = self.page.start(tag, dict(attrs))
+        if tag in self.TEXT_TAGS or tag == "form":
+            self._open.append((tag, entry))
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in NON_TEXT_TAGS:
+            return
+        self.handle_starttag(tag, attrs)
+        if tag in self.TEXT_TAGS or tag == "form":
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in NON_TEXT_TAGS:
+            self._non_text = max(0, self._non_text - 1)
+            return
+        # Close the innermost matching element, and anything left open inside it
+        for i in range(len(self._open) - 1, -1, -1):
+            if self._open[i][0] == tag:
+                while len(self._open) > i:
+                    open_tag, entry = self._open.pop()
+                    self.page.end(open_tag, entry)
+                return
+
+    def handle_data(self, data):
+        if self._non_text:
+            return
+        for tag, entry in self._open:
+            if tag in self.TEXT_TAGS:
+                entry["text"] += data
+
+    def close(self):
+        super().close()
+        while self._open:
+            tag, entry = self._open.pop()
+            self.page.end(tag, entry)
+
+def _extract_lxml(page_source, base_url):
+    page = _PageStructure(base_url)
+    try:
+        document = lxml_html.document_fromstring(page_source)
+    except ValueError:
+        # lxml refuses str input carrying an XML encoding declaration
+        document = lxml_html.document_fromstring(page_source.encode("utf-8"))
+    lxml_etree.strip_elements(document, *NON_TEXT_TAGS, with_tail=False)
+    entries = {}
+    for event, el in lxml_etree.iterwalk(document, events=("start", "end"), tag=("a", "input", "button", "form")):
+        if event == "start":
+            entries[el] = page.start(el.tag, el.attrib)
+        else:
+            entry = entries.pop(el)
+            if el.tag in ("a", "button"):
+                entry["text"] = el.text_content()
+            page.end(el.tag, entry)
+    return page.summary()
+
+def extract_page_structure(page_source, base_url):
+    """
+    Summary of the links, inputs, buttons and forms of the raw page source,
+    in one pass and without BeautifulSoup. It follows the rules of the former
+    BeautifulSoup extraction (kept in benchmarks/bench_page_extraction.py),
+    but parsers repair broken HTML differently, so malformed pages may give
+    slightly different results. Uses lxml when installed and a streaming
+    stdlib parser otherwise.
+    """
+    if not page_source or not page_source.strip():
+        return {"links": [], "inputs": [], "buttons": [], "forms": []}
+    if lxml_html is not None:
+        try:
+            return _extract_lxml(page_source, base_url)
+        except lxml_etree.ParserError:
+            # Nothing but comments or whitespace: a blank or aborted page
+            return {"links": [], "inputs": [], "buttons": [], "forms": []}
+    extractor = _StreamingExtractor(base_url)
+    extractor.feed(page_source)
+    extractor.close()
+    return extractor.page.summary()
+
+# Runs the extraction inside the browser, so page_source is never serialized and sent over the wire.
+# URLs are resolved in Python with urljoin, as extract_page_structure does.
+EXTRACT_PAGE_SCRIPT = """
+const summary = {links: [], inputs: [], buttons: [], forms: []};
+const attr = (el, name) => el.getAttribute(name);
+// Text of the element without the script and style contents, like the parsers
+const textOf = el => {
+    let result = '';
+    const walker = document.createTreeWalker(el, NodeFilter.SHOW_TEXT);
+    while (walker.nextNode()) {
+        if (!walker.currentNode.parentElement.closest('script, style')) result += walker.currentNode.nodeValue;
+    }
+    return result.trim();
+};
+for (const el of document.querySelectorAll('a, input, button, form')) {
+    const tag = el.tagName.toLowerCase();
+    if (tag === 'a') {
+        const text = textOf(el);
+        if (attr(el, 'href') || text) summary.links.push({href: attr(el, 'href'), text: text});
+    } else if (tag === 'input') {
+        if (attr(el, 'id') || attr(el, 'name')) {
+            summary.inputs.push({type: attr(el, 'type'), name: attr(el, 'name'), id: attr(el, 'id'), value: attr(el, 'value')});
+        }
+    } else if (tag === 'button') {
+        const text = textOf(el);
+        if (text || attr(el, 'name')) summary.buttons.push({type: attr(el, 'type'), name: attr(el, 'name'), text: text});
+    } else {
+        const fields = [];
+        for (const input of el.querySelectorAll('input')) {
+            if (attr(input, 'name')) fields.push(attr(input, 'name'));
+        }
+        summary.forms.push({action: attr(el, 'action'), method: attr(el, 'method'), fields: fields});
     }
+}
+return summary;
+"""
+
+def extract_page_structure_js(driver, base_url):
+    """Same summary as extract_page_structure, computed in the browser with one execute_script."""
+    summary = driver.execute_script(EXTRACT_PAGE_SCRIPT)
+    for link in summary["links"]:
+        if link["href"]:
+            link["href"] = urljoin(base_url, link["href"])
+    for form in summary["forms"]:
+        if form["action"]:
+            form["action"] = urljoin(base_url, form["action"])
     return summary
 
 def cookies_changed(before, after):
@@ -80,27 +232,94 @@ def cookies_changed(before, after):
     
     return before_set != after_set
 
-def close_all_popups(driver, timeout=2):
-    selectors = [
-        "//button[contains(@aria-label, 'Close')]",  
-        "//button[contains(text(), 'Close')]",
-        "//button[contains(text(), 'Dismiss')]",
-        "//button[contains(text(), '×')]",
-        "//div[contains(@class, 'popup')]//button",
-        "//div[contains(@class, 'modal')]//button[contains(text(), '×')]",
-        "//button[contains(@class, 'close-dialog')]",
-        "//button[.//mat-icon[text()=' visibility_off ']]"
-    ]
-
-    for xpath in selectors:
-        try:
-            elements = driver.find_elements(By.XPATH, xpath)
-            for el in elements:
-                try:
-                    WebDriverWait(driver, timeout).until(EC.element_to_be_clickable((By.XPATH, xpath)))
-                    el.click()
-                    print(f"Closed popup with selector: {xpath}")
-                except Exception as inner_error:
-                    print(f"Couldn't click popup button (selector: {xpath}): {inner_error}")
-        except Exception as e:
-            print(f"Error searching popups with {xpath}: {e}")
+# Popup dismissal rules, tried in order. Each one has a name and either an
+# `xpath` or a `css` selector; every visible, enabled match is clicked.
+POPUP_RULES = [
+    {"name": "aria-close", "xpath": "//button[contains(@aria-label, 'Close')]"},
+    {"name": "close-text", "xpath": "//button[contains(text(), 'Close')]"},
+    {"name": "dismiss-text", "xpath": "//button[contains(text(), 'Dismiss')]"},
+    {"name": "times-text", "xpath": "//button[contains(text(), '×')]"},
+    {"name": "popup-button", "xpath": "//div[contains(@class, 'popup')]//button"},
+    {"name": "modal-times", "xpath": "//div[contains(@class, 'modal')]//button[contains(text(), '×')]"},
+    {"name": "close-dialog", "xpath": "//button[contains(@class, 'close-dialog')]"},
+    {"name": "visibility-off", "xpath": "//button[.//mat-icon[text()=' visibility_off ']]"},
+]
+
+def load_popup_rules(path=None):
+    """Returns the default rules plus the ones in the JSON file at `path` (a list of rule objects), if any."""
+    rules = list(POPUP_RULES)
+    if not path:
+        return rules
+    try:
+        with open(path, encoding="utf-8") as file:
+            extra = json.load(file)
+    except (OSError, ValueError) as e:
+        print(f"Couldn't load popup rules from {path}: {e}")
+        return rules
+    for rule in extra:
+        if isinstance(rule, dict) and (rule.get("xpath") or rule.get("css")):
+            rules.append({"name": rule.get("name") or rule.get("xpath") or rule.get("css"), **rule})
+        else:
+            print(f"Ignoring invalid popup rule: {rule}")
+    return rules
+
+popup_rules = load_popup_rules(settings.get("POPUP_RULES_FILE"))
+
+# Finds and clicks every candidate of every rule in one round trip. Stops when
+# the time budget is spent; each element is clicked at most once.
+CLOSE_POPUPS_SCRIPT = """
+const rules = arguments[0], deadline = performance.now() + arguments[1];
+const closed = [], clicked = new Set();
+const visible = el => {
+    const rect = el.getBoundingClientRect();
+    const style = window.getComputedStyle(el);
+    return rect.width > 0 && rect.height > 0 && style.visibility !== 'hidden' && style.display !== 'none' && !el.disabled;
+};
+const find = rule => {
+    if (rule.css) return Array.from(document.querySelectorAll(rule.css));
+    const found = [], result = document.evaluate(rule.xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    for (let i = 0; i < result.snapshotLength; i++) found.push(result.snapshotItem(i));
+    return found;
+};
+for (const rule of rules) {
+    if (performance.now() > deadline) return {closed: closed, timed_out: true};
+    let candidates;
+    try {
+        candidates = find(rule);
+    } catch (e) {
+        closed.push({rule: rule.name, error: String(e)});
+        continue;
+    }
+    for (const el of candidates) {
+        if (clicked.has(el) || !el.isConnected || !visible(el)) continue;
+        clicked.add(el);
+        try {
+            el.click();
+            closed.push({rule: rule.name, tag: el.tagName.toLowerCase(), text: (el.textContent || el.getAttribute('aria-label') || '').trim().slice(0, 80)});
+        } catch (e) {
+            closed.push({rule: rule.name, error: String(e)});
+        }
+    }
+}
+return {closed: closed, timed_out: false};
+"""
+
+def close_all_popups(driver, timeout=2, rules=None):
+    """
+    Dismisses popups with a single in-page script. `timeout` is the total
+    time budget in seconds. Returns the report of the clicked elements
+    (rule, tag and text, or the error).
+    """
+    try:
+        report = driver.execute_script(CLOSE_POPUPS_SCRIPT, rules or popup_rules, int(timeout * 1000))
+    except Exception as e:
+        print(f"Error closing popups: {e}")
+        return []
+    for entry in report["closed"]:
+        if "error" in entry:
+            print(f"Couldn't click popup button (rule: {entry['rule']}): {entry['error']}")
+        else:
+            print(f"Closed popup with rule: {entry['rule']}")
+    if report["timed_out"]:
+        print(f"Popup dismissal stopped after its {timeout}s budget")
+    return report["closed"]